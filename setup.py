@@ -10,6 +10,7 @@ setup(
     license="MIT",
     author_email="",
     install_requires=[],
+    extras_require={"fast": ["orjson"]},
     keywords="binance exchange rest api bitcoin ethereum btc eth neo",
     classifiers=[
         "Intended Audience :: Developers",
@@ -0,0 +1,84 @@
+import asyncio
+from types import SimpleNamespace
+
+from u_exchanges.base import BaseExchange
+
+
+def test_client_order_ids_differ_across_instances():
+    first, second = BaseExchange("key", "secret"), BaseExchange("key", "secret")
+    ids = [first.client_order_id("BTCUSDT", "buy") for _ in range(100)]
+    others = [second.client_order_id("BTCUSDT", "buy") for _ in range(100)]
+    assert len(set(ids)) == 100
+    assert not set(ids) & set(others)
+    assert all(len(x) == 32 and x.isalnum() for x in ids)
+
+
+def account(symbol, total):
+    return SimpleNamespace(symbol=symbol, base_asset_balance=SimpleNamespace(total=total), quote_asset_balance=SimpleNamespace(total=0.0))
+
+
+def test_kill_targets_narrows_symbols_to_active_accounts():
+    exchange = BaseExchange("key", "secret")
+
+    async def get_margin_accounts():
+        return [account("BTCUSDT", 1.0), account("ETHUSDT", 0.0)]
+
+    async def get_futures_position():
+        return [SimpleNamespace(symbol="ETHUSDT", size=2), SimpleNamespace(symbol="BTCUSDT", size=0)]
+
+    exchange.get_margin_accounts = get_margin_accounts
+    exchange.get_futures_position = get_futures_position
+    margin, futures, positions = asyncio.run(exchange.kill_targets(["btcusdt", "ETHUSDT", "LTCUSDT"], True))
+    assert margin == {"BTCUSDT"}
+    assert futures == {"ETHUSDT"}
+    assert [x.symbol for x in positions] == ["ETHUSDT"]
+
+
+def test_refresh_metadata_skips_backends_without_futures(tmp_path, caplog):
+    class Exchange(BaseExchange):
+        async def load_instruments(self):
+            pass
+
+    exchange = Exchange("key", "secret", snapshot_path=str(tmp_path / "metadata.pickle"))
+    exchange.settings.update({"leverage": {"BTCUSDT": 3.0}, "position_mode": "net"})
+    asyncio.run(exchange.refresh_metadata())
+    assert not [x for x in caplog.records if x.levelname == "ERROR"]
+    assert "future_contracts" not in exchange.settings
+
+    restored = Exchange("key", "secret", snapshot_path=str(tmp_path / "metadata.pickle"))
+    assert restored.warm_start()
+    # leverage can be changed outside the process, so it is never restored
+    assert restored.settings == {"position_mode": "net"}
+
+
+def test_kill_all_without_futures_clears_margin():
+    class Exchange(BaseExchange):
+        async def get_margin_accounts(self, symbol=None):
+            return [account("BTCUSDT", 1.0)]
+
+        async def cancel_open_orders(self, symbol):
+            cancelled.append(symbol)
+
+    cancelled = []
+    result = asyncio.run(Exchange("key", "secret").kill_all(close_positions=True))
+    assert cancelled == ["BTCUSDT"]
+    assert list(result) == [("margin", "BTCUSDT")] and result[("margin", "BTCUSDT")]["error"] is None
+
+
+def test_forced_leverage_bypasses_the_cache():
+    class Exchange(BaseExchange):
+        async def fetch_leverage_settings(self, symbols=None):
+            return {"BTCUSDT": 5}
+
+        async def set_futures_leverage(self, symbol, value, force=False):
+            if self.leverage_unchanged(symbol, value, force):
+                return None
+            sent.append((symbol, value))
+            self.store_leverage(symbol, value)
+            return True
+
+    sent = []
+    exchange = Exchange("key", "secret")
+    assert asyncio.run(exchange.set_futures_leverages({"BTCUSDT": 5})) == {"BTCUSDT": None}
+    assert asyncio.run(exchange.set_futures_leverages({"BTCUSDT": 5}, force=True)) == {"BTCUSDT": True}
+    assert sent == [("BTCUSDT", 5)]
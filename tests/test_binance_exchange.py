@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+binance_exchange = pytest.importorskip("u_exchanges.binance_exchange")
+
+
+def test_closed_orders_page_through_the_history_and_resume(tmp_path):
+    exchange = binance_exchange.BinanceExchange(api_key="key", api_secret="secret")
+    trades = [{"id": 312269865356374016 + x, "orderId": x, "symbol": "BTCUSDT", "price": "1", "qty": "1", "time": 1600000000000 + x}
+              for x in range(2500)]
+    calls = []
+
+    async def client_helper(function_name, **kwargs):
+        calls.append(kwargs["fromId"])
+        return [x for x in trades if x["id"] >= kwargs["fromId"]][:kwargs["limit"]]
+
+    exchange.client_helper = client_helper
+    path = str(tmp_path / "BTCUSDT")
+    assert asyncio.run(exchange.export_closed_orders("BTCUSDT", path)) == 2500
+    assert calls == [0, trades[1000]["id"], trades[2000]["id"]]
+
+    trades.append({**trades[-1], "id": trades[-1]["id"] + 1})
+    assert asyncio.run(exchange.export_closed_orders("BTCUSDT", path)) == 1
+    assert calls[-1] == trades[-1]["id"]
+    assert len(exchange.read_closed_orders(path)["id"]) == 2501
+
+
+def test_futures_account_balance_reads_the_settlement_asset():
+    exchange = binance_exchange.BinanceExchange(api_key="key", api_secret="secret")
+    accounts = {
+        "futures_account": {"assets": [{"asset": "USDT", "walletBalance": "120", "availableBalance": "80", "initialMargin": "40"}]},
+        "futures_coin_account": {"assets": []},
+    }
+
+    async def client_helper(function_name, **kwargs):
+        return accounts[function_name]
+
+    exchange.client_helper = client_helper
+    balance = asyncio.run(exchange.get_futures_account_balance("BTCUSDT"))
+    assert (balance.asset, balance.available) == ("USDT", 80.0)
+    balance = asyncio.run(exchange.get_futures_account_balance("BTCUSD_PERP"))
+    assert (balance.asset, balance.available) == ("BTC", 0.0)
@@ -0,0 +1,35 @@
+import gzip
+import json
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from u_exchanges import cassette
+
+SECRET = "Kx9secretMaterial"
+
+
+def respond(adapter, request, **kwargs):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = b'{"ok":true}'
+    response.request = request
+    return response
+
+
+def test_recorded_cassette_holds_no_key_material(tmp_path, monkeypatch):
+    path = str(tmp_path / "private.jsonl.gz")
+    monkeypatch.setattr(HTTPAdapter, "send", respond)
+    with cassette.Recorder(path):
+        requests.get(f"https://www.okcoin.com/api/v1/userinfo.do?api_key={SECRET}&symbol=btc_usd")
+        requests.post("https://www.okcoin.com/api/v1/trade.do", data={"api_key": SECRET, "secretKey": SECRET, "price": "1"})
+        requests.post("https://www.okcoin.com/api/v1/batch", json={"orders": [{"apiKey": SECRET, "size": "1"}]})
+    with gzip.open(path, "rt") as f:
+        text = f.read()
+    assert SECRET not in text
+    entries = [json.loads(x) for x in text.splitlines()]
+    assert all("price" in x["key"] or "symbol" in x["key"] or "size" in x["key"] for x in entries)
+
+    with cassette.Replayer(path):
+        response = requests.get("https://www.okcoin.com/api/v1/userinfo.do?api_key=other&symbol=btc_usd")
+    assert response.json() == {"ok": True}
@@ -0,0 +1,12 @@
+from u_exchanges import history
+
+SCHEMA = [("id", "int64", "order_id"), ("price", "float64", "price")]
+
+
+def test_round_trips_18_digit_ids(tmp_path):
+    store = history.ColumnStore(str(tmp_path / "orders"), SCHEMA, backend="numpy")
+    ids = ["312269865356374016", "312269865356374017"]
+    assert store.append([{"order_id": x, "price": "1.5"} for x in ids]) == 2
+    assert store.append([{"order_id": "312269865356374018", "price": "2"}]) == 1
+    assert store.append([{"order_id": "312269865356374018", "price": "2"}]) == 0
+    assert [int(x) for x in store.read()["id"]] == [312269865356374016, 312269865356374017, 312269865356374018]
@@ -0,0 +1,77 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+okcoin_exchange = pytest.importorskip("u_exchanges.okcoin_exchange")
+
+INFO = {"instrument_id": "BTC-USDT", "tick_size": "0.1", "size_increment": "0.0001", "min_size": "0.0001"}
+
+
+def test_create_single_order_returns_order_found_after_ambiguous_error():
+    exchange = okcoin_exchange.OKCoinExchange(api_key="key", api_secret="secret", passphrase="passphrase", retry_backoff=0)
+    exchange.instruments.load([okcoin_exchange.instruments.Instrument("BTC-USDT", okcoin_exchange.instruments.MARGIN, "BTC", "USDT", info=INFO)])
+
+    async def send_order(path, order, callback):
+        raise requests.exceptions.ReadTimeout()
+
+    async def get_order_by_client_id(symbol, client_id):
+        # the order info endpoint, unlike the order endpoint, has no 'result' key
+        return {"order_id": "4021", "client_oid": client_id, "state": "0"}
+
+    exchange.send_order = send_order
+    exchange.get_order_by_client_id = get_order_by_client_id
+    assert asyncio.run(exchange.create_single_order("BTC-USDT", "buy", 0.01, 35000)) == "4021"
+
+
+def test_close_position_sends_a_market_order():
+    exchange = okcoin_exchange.OkexExchange(api_key="key", api_secret="secret", passphrase="passphrase")
+    sent = []
+
+    async def send_order(path, order, callback):
+        sent.append((path, order))
+        return {"order_id": "1", "result": True}
+
+    exchange.send_order = send_order
+    position = SimpleNamespace(symbol="BTC-USDT-SWAP", kind="long", size=2, mark_price=35000.0)
+    asyncio.run(exchange.close_position(position))
+    assert sent[0][0] == '/api/swap/v3/order'
+    assert sent[0][1]['order_type'] == '4' and sent[0][1]['type'] == '3'
+
+
+def test_kill_targets_finds_swaps_with_pending_orders():
+    exchange = okcoin_exchange.OkexExchange(api_key="key", api_secret="secret", passphrase="passphrase")
+    client = SimpleNamespace(swap_api=SimpleNamespace(get_accounts=lambda: {"info": [
+        {"instrument_id": "BTC-USDT-SWAP", "margin_frozen": "12.5"}, {"instrument_id": "ETH-USDT-SWAP", "margin_frozen": "0"},
+    ]}))
+
+    async def client_call(callback, priority=None):
+        return callback(client)
+
+    async def get_margin_accounts(symbol=None):
+        return []
+
+    async def get_futures_position(symbol=None):
+        return [SimpleNamespace(symbol="LTC-USDT-SWAP", size=1.0)]
+
+    exchange.client_call = client_call
+    exchange.get_margin_accounts = get_margin_accounts
+    exchange.get_futures_position = get_futures_position
+    margin, futures, positions = asyncio.run(exchange.kill_targets())
+    assert margin == set()
+    assert futures == {"BTC-USDT-SWAP", "LTC-USDT-SWAP"}
+
+
+def test_bulk_create_orders_returns_the_order_results_per_batch():
+    exchange = okcoin_exchange.OKCoinExchange(api_key="key", api_secret="secret", passphrase="passphrase")
+    exchange.instruments.load([okcoin_exchange.instruments.Instrument("BTC-USDT", okcoin_exchange.instruments.MARGIN, "BTC", "USDT", info=INFO)])
+
+    async def client_helper(function_name, batch):
+        return {"btc-usdt": [{"order_id": str(i), "client_oid": x["client_oid"], "result": True} for i, x in enumerate(batch)], "result": True}
+
+    exchange.client_helper = client_helper
+    orders = [{"side": "buy", "quantity": 0.01, "price": 35000 - x} for x in range(12)]
+    result = asyncio.run(exchange.bulk_create_orders("BTC-USDT", orders))
+    assert [len(x) for x in result] == [10, 2]
+    assert all(x["result"] is True and "order_id" in x for y in result for x in y)
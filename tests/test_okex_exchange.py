@@ -0,0 +1,65 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+okex_exchange = pytest.importorskip("u_exchanges.okex_exchange")
+
+
+def exchange_with(client):
+    exchange = okex_exchange.OkexV5Exchange(api_key="key", api_secret="secret", passphrase="passphrase")
+
+    async def client_call(callback, priority=None):
+        return callback(client)
+
+    exchange.client_call = client_call
+    return exchange
+
+
+def test_pending_orders_are_paged_until_empty():
+    orders = [{"ordId": str(1000 - x), "instId": f"COIN{x}-USDT"} for x in range(250)]
+
+    def get_order_list(after=""):
+        start = next((i + 1 for i, x in enumerate(orders) if x["ordId"] == after), 0)
+        return {"data": orders[start:start + 100]}
+
+    exchange = exchange_with(SimpleNamespace(trading_api=SimpleNamespace(get_order_list=get_order_list)))
+    assert asyncio.run(exchange.get_pending_orders()) == orders
+
+
+def test_derivative_metadata_comes_from_the_registry():
+    swap = {"instType": "SWAP", "instId": "BTC-USDT-SWAP", "uly": "BTC-USDT", "ctType": "linear", "settleCcy": "USDT",
+            "ctVal": "0.01", "tickSz": "0.1", "lotSz": "1", "minSz": "1"}
+    margin = {"instType": "MARGIN", "instId": "BTC-USDT", "baseCcy": "BTC", "quoteCcy": "USDT", "tickSz": "0.1", "lotSz": "0.0001", "minSz": "0.0001"}
+    calls = []
+
+    def get_instruments(inst_type, **kwargs):
+        calls.append((inst_type, kwargs))
+        return {"data": [x for x in (swap, margin) if x["instType"] == inst_type]}
+
+    exchange = exchange_with(SimpleNamespace(public_api=SimpleNamespace(get_instruments=get_instruments)))
+    asyncio.run(exchange.load_instruments())
+    loaded = len(calls)
+    assert exchange.instrument("BTC-USDT-SWAP").info is swap
+    assert exchange.instrument_type("BTC-USDT-SWAP") == "SWAP"
+    assert exchange.instrument_type("BTC-USDT") == "MARGIN"
+    asyncio.run(exchange.update_price_and_decimal_places("BTC-USDT-SWAP"))
+    assert len(calls) == loaded
+
+
+def test_missing_balances_are_zero():
+    client = SimpleNamespace(
+        funding_api=SimpleNamespace(get_balances=lambda ccy: {"data": []}),
+        account_api=SimpleNamespace(get_account=lambda ccy: {"data": [{"details": []}]}),
+    )
+    exchange = exchange_with(client)
+    for balance in (asyncio.run(exchange.get_funding_account_balance("usdt")), asyncio.run(exchange.get_spot_account_balance("usdt"))):
+        assert (balance.asset, balance.balance, balance.available) == ("USDT", 0.0, 0.0)
+
+
+def test_isolated_margin_transfers_are_refused():
+    exchange = exchange_with(SimpleNamespace())
+    assert asyncio.run(exchange.transfer_from_spot_to_margin("USDT", 10, "BTC-USDT")) is None
+    exchange.margin_mode = "isolated"
+    with pytest.raises(NotImplementedError):
+        asyncio.run(exchange.transfer_from_spot_to_margin("USDT", 10, "BTC-USDT"))
@@ -0,0 +1,70 @@
+import zlib
+
+import pytest
+
+from u_exchanges import orderbook
+
+
+def event(first, last, previous=None, bids=(), asks=()):
+    result = {"U": first, "u": last, "b": list(bids), "a": list(asks)}
+    if previous is not None:
+        result["pu"] = previous
+    return result
+
+
+def test_binance_spot_book_replays_buffer_and_detects_gaps():
+    book = orderbook.BinanceOrderBook("BTCUSDT")
+    book.feed(event(95, 99, bids=[["1.0", "1"]]))
+    book.feed(event(100, 102, bids=[["2.0", "1"]]))
+    book.apply_snapshot([["1.5", "3"]], [["3.0", "1"]], update_id=100)
+    # the first buffered event is older than the snapshot, the second straddles it
+    assert book.bids.levels() == [(2.0, 1.0), (1.5, 3.0)]
+    assert book.update_id == 102
+    assert book.feed(event(103, 104, asks=[["3.0", "0"]]))
+    assert book.best_ask() is None
+    with pytest.raises(orderbook.OutOfSync):
+        book.feed(event(106, 107))
+    assert not book.synced and len(book.bids) == 0
+
+
+def test_binance_futures_book_chains_through_pu():
+    book = orderbook.BinanceOrderBook("BTCUSDT", derivative=True)
+    book.apply_snapshot([["1.0", "1"]], [["2.0", "1"]], update_id=10)
+    assert book.feed(event(8, 12, previous=7))
+    assert book.feed(event(15, 20, previous=12))
+    with pytest.raises(orderbook.OutOfSync):
+        book.feed(event(25, 30, previous=21))
+
+
+def okex_checksum(bids, asks):
+    values = []
+    for i in range(25):
+        if i < len(bids):
+            values.extend(bids[i][:2])
+        if i < len(asks):
+            values.extend(asks[i][:2])
+    crc = zlib.crc32(":".join(values).encode())
+    return crc - (1 << 32) if crc >= (1 << 31) else crc
+
+
+def okex_message(action, bids, asks, checksum):
+    return {"action": action, "data": [{"bids": bids, "asks": asks, "checksum": checksum}]}
+
+
+def test_okex_book_validates_checksums():
+    bids = [[f"{100 - x}.5", str(x + 1), "0", "1"] for x in range(30)]
+    asks = [[f"{101 + x}.5", "2", "0", "1"] for x in range(30)]
+    book = orderbook.OkexOrderBook("BTC-USDT")
+    assert book.feed(okex_message("snapshot", bids, asks, okex_checksum(bids, asks)))
+    update = [["100.5", "0", "0", "0"]]
+    assert book.feed(okex_message("update", update, [], okex_checksum(bids[1:], asks)))
+    assert book.best_bid() == 99.5
+    with pytest.raises(orderbook.OutOfSync):
+        book.feed(okex_message("update", [["99.5", "4", "0", "1"]], [], okex_checksum(bids[1:], asks)))
+    assert not book.synced
+
+
+def test_okex_book_refuses_depth_below_the_checksum():
+    with pytest.raises(ValueError):
+        orderbook.OkexOrderBook("BTC-USDT", depth=10)
+    assert orderbook.OkexOrderBook("BTC-USDT", depth=50).bids.depth == 50
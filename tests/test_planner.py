@@ -0,0 +1,44 @@
+import asyncio
+from types import SimpleNamespace
+
+from u_exchanges.planner import TRANSFER_ROUTES, TransferPlanner
+
+
+class Exchange:
+    account_aliases = {}
+    transfer_routes = frozenset([('funding', 'margin'), ('margin', 'funding')])
+
+    def __init__(self, balances: dict) -> None:
+        self.balances = balances
+        self.calls = []
+
+    async def get_balances(self, assets, account_types):
+        listed = {}
+        for (account, symbol), amount in self.balances.items():
+            if account == 'margin':
+                listed.setdefault('USDT', {}).setdefault('margin', {})[symbol] = SimpleNamespace(free=amount)
+            else:
+                listed.setdefault('USDT', {})[account] = SimpleNamespace(available=amount)
+        return listed
+
+    async def transfer_between(self, asset, amount, source, target, source_symbol=None, target_symbol=None):
+        assert (source, target) in TRANSFER_ROUTES
+        await asyncio.sleep(0)
+        assert self.balances[(source, source_symbol)] >= amount
+        self.balances[(source, source_symbol)] -= amount
+        self.balances[(target, target_symbol)] = self.balances.get((target, target_symbol), 0) + amount
+        self.calls.append((source, source_symbol, target, target_symbol, amount))
+
+
+def test_relays_between_margin_pairs_through_funding():
+    exchange = Exchange({('funding', None): 30.0, ('margin', 'ETHUSDT'): 50.0, ('margin', 'BTCUSDT'): 0.0})
+    planner = TransferPlanner(exchange)
+    allocations = [
+        {'asset': 'USDT', 'account': 'margin', 'symbol': 'BTCUSDT', 'amount': 80},
+        {'asset': 'USDT', 'account': 'margin', 'symbol': 'ETHUSDT', 'amount': 0},
+    ]
+    transfers = asyncio.run(planner.plan(allocations))
+    assert [(x['source'], x['target'], x['amount']) for x in transfers] == [('funding', 'margin', 80.0), ('margin', 'funding', 50.0)]
+    asyncio.run(planner.execute(transfers))
+    assert exchange.balances == {('funding', None): 0.0, ('margin', 'ETHUSDT'): 0.0, ('margin', 'BTCUSDT'): 80.0}
+    assert exchange.calls[0][:4] == ('margin', 'ETHUSDT', 'funding', None)
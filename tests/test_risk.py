@@ -0,0 +1,49 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from u_exchanges import risk
+
+
+def position(symbol, kind, liquidation, mark, size=1.0):
+    return SimpleNamespace(symbol=symbol, kind=kind, size=size, liquidation_price=liquidation, mark_price=mark)
+
+
+def account(symbol, liquidation, ratio):
+    return SimpleNamespace(symbol=symbol, liquidation_price=liquidation, margin_ratio=ratio)
+
+
+def monitor():
+    result = risk.RiskMonitor(threshold=0.05, margin_ratio_threshold=1.2)
+    result.load(
+        [account("BTCUSDT", 0.0, 1.5), account("ETHUSDT", 0.0, 3.0)],
+        [position("BTCUSDT", "long", 96.0, 100.0), position("ETHUSDT", "short", 110.0, 100.0), position("LTCUSDT", "long", 50.0, 60.0, size=0)],
+    )
+    return result
+
+
+def test_evaluate_measures_distance_by_position_side():
+    result = monitor().evaluate({"ETHUSDT": 105.0})
+    # margin pairs without a liquidation price are never close to it; zero sized positions are left out
+    assert np.isinf(result["distance"][:2]).all()
+    assert result["distance"][2:] == pytest.approx([0.04, 5 / 105])
+    assert result["breach"].tolist() == [False, False, True, True]
+
+
+def test_check_reports_new_breaches_once_with_the_ratio_trend():
+    reported = []
+    checker = monitor()
+
+    @checker.on_breach
+    async def record(breaches):
+        reported.append(breaches)
+
+    assert [x["symbol"] for x in asyncio.run(checker.check({}))] == ["BTCUSDT"]
+    breaches = asyncio.run(checker.check({}, np.array([1.1, 2.9, np.nan, np.nan])))
+    assert [(x["account"], x["symbol"]) for x in breaches] == [("margin", "BTCUSDT")]
+    assert breaches[0]["margin_ratio"] == pytest.approx(1.1)
+    assert breaches[0]["trend"] == pytest.approx(-0.4)
+    assert asyncio.run(checker.check({}, np.array([1.0, 2.8, np.nan, np.nan]))) == []
+    assert len(reported) == 2
@@ -0,0 +1,47 @@
+import asyncio
+import threading
+
+from u_exchanges import scheduler
+
+
+def test_queued_calls_run_by_priority_class():
+    async def main():
+        calls = []
+        released = threading.Event()
+        requests = scheduler.RequestScheduler(concurrency=1)
+        blocker = requests.run(scheduler.ACCOUNT, released.wait)
+        futures = [
+            requests.run(x, lambda x=x: calls.append(x))
+            for x in (scheduler.METADATA, scheduler.ACCOUNT, scheduler.ORDER, scheduler.CANCEL, scheduler.ORDER)
+        ]
+        assert requests.pending() == 5
+        released.set()
+        await asyncio.gather(blocker, *futures)
+        return calls
+
+    calls = asyncio.run(main())
+    assert calls == [scheduler.CANCEL, scheduler.ORDER, scheduler.ORDER, scheduler.ACCOUNT, scheduler.METADATA]
+
+
+def test_exhausted_budget_does_not_hold_back_other_classes():
+    async def main():
+        calls = []
+        requests = scheduler.RequestScheduler(concurrency=4, budgets={scheduler.METADATA: (20, 1)})
+        futures = [requests.run(scheduler.METADATA, lambda i=i: calls.append(("metadata", i))) for i in range(3)]
+        await asyncio.sleep(0.01)
+        await requests.run(scheduler.CANCEL, lambda: calls.append(("cancel", 0)))
+        await asyncio.gather(*futures)
+        return calls
+
+    calls = asyncio.run(main())
+    # one metadata call fits the burst, the cancel goes ahead of the two waiting for tokens
+    assert calls.index(("cancel", 0)) < calls.index(("metadata", 1))
+    assert sorted(calls) == [("cancel", 0), ("metadata", 0), ("metadata", 1), ("metadata", 2)]
+
+
+def test_classify_sdk_method_names():
+    assert scheduler.classify("revoke_order") == scheduler.CANCEL
+    assert scheduler.classify("futures_cancel_all_open_orders") == scheduler.CANCEL
+    assert scheduler.classify("create_margin_order") == scheduler.ORDER
+    assert scheduler.classify("get_margin_account") == scheduler.ACCOUNT
+    assert scheduler.classify("get_exchange_info") == scheduler.METADATA
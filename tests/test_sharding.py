@@ -0,0 +1,83 @@
+import asyncio
+import os
+import sys
+import zlib
+
+import pytest
+
+from u_exchanges import sharding
+
+
+class Unpicklable(Exception):
+    def __init__(self, message, callback) -> None:
+        super().__init__(message)
+        self.callback = callback
+        self.code = -2010
+
+
+class FakeExchange:
+    async def create_single_order(self, symbol, side):
+        return symbol, side, os.getpid()
+
+    async def get_account(self):
+        return os.getpid()
+
+    async def cancel_open_orders(self, symbol):
+        raise Unpicklable("rejected", lambda: None)
+
+    async def kill_all(self, symbols, close_positions):
+        return {x: close_positions for x in symbols or ["ALL"]}
+
+
+def test_shard_of_is_a_stable_case_insensitive_crc32():
+    assert sharding.shard_of("btcusdt", 7) == sharding.shard_of("BTCUSDT", 7) == zlib.crc32(b"BTCUSDT") % 7
+
+
+def test_routed_methods_and_groups_follow_shard_of():
+    exchange = sharding.ShardedExchange(FakeExchange, workers=3)
+    exchange.shards = ["a", "b", "c"]
+    sent = []
+
+    async def send(shard, method, *args, **kwargs):
+        sent.append((shard, method, args))
+        return {x: True for x in args[0]} if method == "kill_all" else None
+    exchange.send = send
+
+    symbols = ["BTCUSDT", "ETHUSDT", "LTCUSDT", "XRPUSDT", "ADAUSDT"]
+    for symbol in symbols:
+        asyncio.run(exchange.create_single_order(symbol, "BUY"))
+    assert sent == [("abc"[sharding.shard_of(x, 3)], "create_single_order", (x, "BUY")) for x in symbols]
+
+    groups = exchange.group(symbols)
+    assert sorted(x for y in groups.values() for x in y) == sorted(symbols)
+    assert all(sharding.shard_of(x, 3) == shard for shard, group in groups.items() for x in group)
+    sent.clear()
+    assert asyncio.run(exchange.kill_all(symbols, True)) == {x: True for x in symbols}
+    assert sorted((x[0], x[2]) for x in sent) == sorted(("abc"[x], (y, True)) for x, y in groups.items())
+
+
+def test_portable_error_keeps_codes_of_unpicklable_exceptions():
+    error = sharding.portable_error(Unpicklable("rejected", lambda: None))
+    assert isinstance(error, sharding.ShardError) and error.code == -2010
+    plain = ValueError("x")
+    assert sharding.portable_error(plain) is plain
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="forks the workers")
+def test_workers_serve_their_own_symbols():
+    async def main():
+        exchange = sharding.ShardedExchange(FakeExchange, workers=2, context="fork")
+        await exchange.start()
+        try:
+            pids = [x.process.pid for x in exchange.shards]
+            for symbol in ["BTCUSDT", "ETHUSDT", "LTCUSDT"]:
+                _, side, pid = await exchange.create_single_order(symbol, "SELL")
+                assert side == "SELL" and pid == pids[sharding.shard_of(symbol, 2)]
+            assert await exchange.primary("get_account") == pids[0]
+            assert sorted(await exchange.broadcast("get_account")) == sorted(pids)
+            with pytest.raises(sharding.ShardError) as error:
+                await exchange.cancel_open_orders("BTCUSDT")
+            assert error.value.code == -2010
+        finally:
+            await exchange.close()
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+import asyncio
+from multiprocessing import resource_tracker, shared_memory
+
+import pytest
+
+from u_exchanges import shared
+
+
+def test_attach_leaves_the_owner_registration_alone(monkeypatch):
+    state = shared.SharedState.create(capacity=4)
+    calls = []
+    monkeypatch.setattr(resource_tracker, "register", lambda name, rtype: calls.append(("register", name, rtype)))
+    monkeypatch.setattr(resource_tracker, "unregister", lambda name, rtype: calls.append(("unregister", name, rtype)))
+    try:
+        reader = shared.SharedStateExchange(state.name)
+        reader.close()
+        assert [x for x in calls if x[2] == "shared_memory"] == []
+        assert shared_memory.resource_tracker is resource_tracker
+    finally:
+        monkeypatch.undo()
+        state.close()
+
+
+def test_prices_round_trip():
+    state = shared.SharedState.create(capacity=4)
+    try:
+        state.write(prices=[("BTCUSDT", 35000.5)])
+        reader = shared.SharedStateExchange(state.name)
+        assert asyncio.run(reader.get_price("btcusdt")) == 35000.5
+        assert asyncio.run(reader.get_prices()) == {"BTCUSDT": 35000.5}
+        reader.close()
+    finally:
+        state.close()
+
+
+def test_read_backs_off_while_a_write_is_in_progress(monkeypatch):
+    state = shared.SharedState.create(capacity=4)
+    sleeps = []
+    monkeypatch.setattr(shared.time, "sleep", lambda x: sleeps.append(x))
+    try:
+        state.data["seq"] += 1
+        with pytest.raises(RuntimeError):
+            state.read("prices", retries=5)
+        assert sleeps == [0] * 5
+    finally:
+        state.data["seq"] += 1
+        state.close()
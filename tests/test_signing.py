@@ -0,0 +1,43 @@
+import base64
+import hashlib
+import hmac
+import json
+from types import SimpleNamespace
+from urllib.parse import parse_qsl, urlencode
+
+from u_exchanges import signing
+
+SECRET = "s" * 64
+CLOCK = SimpleNamespace(time=lambda: 1622548800.123, time_ms=lambda: 1622548800123)
+
+
+def sdk_hmac(payload):
+    return hmac.new(SECRET.encode(), payload.encode(), hashlib.sha256)
+
+
+def test_binance_body_matches_the_sdk_signed_query():
+    order = {"symbol": "BTCUSDT", "side": "BUY", "type": "LIMIT", "timeInForce": "GTC", "quantity": 0.001, "price": 35000.1, "newClientOrderId": "u1"}
+    sender = signing.BinanceOrderSender("key", SECRET, clock=CLOCK)
+    for _ in range(2):  # the second order is rendered from the cached template
+        body = sender.prepare(order)
+        query, signature = body.rsplit("&signature=", 1)
+        expected = {**order, "timestamp": 1622548800123}
+        assert dict(parse_qsl(query)) == dict(parse_qsl(urlencode(expected)))
+        assert signature == sdk_hmac(query).hexdigest()
+    assert sender.prepare(dict(order, side="SELL")).startswith("symbol=BTCUSDT&type=LIMIT&timeInForce=GTC&side=SELL&")
+
+
+def test_okex_headers_match_the_sdk_signature():
+    order = {"instId": "BTC-USDT", "tdMode": "cross", "side": "buy", "ordType": "limit", "px": "35000.1", "sz": "0.001", "clOrdId": "u1"}
+    sender = signing.OkexOrderSender("key", SECRET, "passphrase", lambda: "", clock=CLOCK)
+    headers, body = sender.prepare("/api/v5/trade/order", order)
+    assert json.loads(body) == order
+    assert headers["OK-ACCESS-TIMESTAMP"] == "2021-06-01T12:00:00.123Z"
+    message = "2021-06-01T12:00:00.123Z" + "POST" + "/api/v5/trade/order" + body
+    assert headers["OK-ACCESS-SIGN"] == base64.b64encode(sdk_hmac(message).digest()).decode()
+    assert sender.session.headers["OK-ACCESS-PASSPHRASE"] == "passphrase"
+
+
+def test_okex_json_template_without_static_fields():
+    sender = signing.OkexOrderSender("key", SECRET, None, lambda: "", clock=CLOCK)
+    assert json.loads(sender.prepare("/api/spot/v3/orders", {"side": "buy", "size": 1.5})[1]) == {"side": "buy", "size": 1.5}
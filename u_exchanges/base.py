@@ -1,7 +1,13 @@
 import asyncio
+import secrets
+import time
 import typing
-from .types import AssetBalance, MarginAccount, LoanInfo, FuturePosition
+from .types import BalanceType, MarginAccount, LoanInfo, FuturePosition
+from . import instruments, orderbook, scheduler, snapshot, utils
 from .utils import logger
+from .planner import TRANSFER_ROUTES, TransferPlanner
+
+ACCOUNT_TYPES = ('funding', 'spot', 'margin', 'futures')
 
 
 async def loop_helper(callback):
@@ -10,26 +16,227 @@ async def loop_helper(callback):
     return await future
 
 
+def active_margin_symbols(accounts: typing.List[MarginAccount]) -> typing.Set[str]:
+    """Margin pairs holding any funds, the only ones that can have open orders."""
+    return {x.symbol for x in accounts if x.base_asset_balance.total or x.quote_asset_balance.total}
+
+
 class BaseExchange:
+    account_aliases: typing.Dict[str, str] = {}
+    transfer_routes: typing.FrozenSet[typing.Tuple[str, str]] = frozenset()
+    history_schema: typing.List[typing.Tuple[str, str, str]] = []
+
     def __init__(self, api_key: str, api_secret: str, **kwargs) -> None:
         self.api_key = api_key
         self.api_secret = api_secret
+        self.order_retries = kwargs.get("order_retries", 3)
+        self.retry_backoff = kwargs.get("retry_backoff", 0.2)
+        self.order_sequence = 0
+        # the sequence restarts with every instance, the nonce keeps ids unique across them
+        self.order_nonce = secrets.token_hex(4)
+        self.instruments = instruments.InstrumentRegistry(self.parse_instrument)
+        self.parse_threshold = kwargs.get("parse_threshold", 500)
+        self.parse_executor = kwargs.get("parse_executor")
+        self.daily_cache = utils.TTLCache(24 * 60 * 60)
+        self.loan_cache = utils.TTLCache(kwargs.get("loan_ttl", 5))
+        self.order_books = {}
+        self.snapshot_path = kwargs.get("snapshot_path")
+        self.settings = {}
+        self.refresh_task = None
+        self.scheduler = scheduler.RequestScheduler(kwargs.get("concurrency", 8), kwargs.get("rate_budgets"))
+        self.clock = None
 
     async def get_client(self) -> typing.Any:
         return await loop_helper(lambda: self.client)
 
     async def client_helper(self, function_name, *args, **kwargs):
         client = await self.get_client()
-        return await loop_helper(
+        return await self.scheduler.run(
+            scheduler.classify(function_name),
             lambda: getattr(client, function_name)(*args, **kwargs)
         )
 
+    async def client_call(self, callback, priority=scheduler.ACCOUNT):
+        client = await self.get_client()
+        return await self.scheduler.run(priority, lambda: callback(client))
+
+    async def parse_helper(self, callback, payload, *args):
+        """Build models from a decoded payload, off the event loop once it has more than
+        `parse_threshold` entries. `parse_executor` may be a process pool, in which case
+        `callback` has to be a module level function."""
+        if len(payload) < self.parse_threshold:
+            return callback(payload, *args)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.parse_executor, callback, payload, *args)
+
+    def parse_instrument(self, symbol: str, derivative=False) -> instruments.Instrument:
+        raise NotImplemented
+
+    def instrument(self, symbol: str, derivative=False) -> instruments.Instrument:
+        return self.instruments.get(symbol, derivative)
+
+    async def load_instruments(self):
+        raise NotImplemented
+
+    def warm_start(self) -> bool:
+        """Restore instruments and account settings from `snapshot_path`."""
+        data = self.snapshot_path and snapshot.load(self.snapshot_path, snapshot.snapshot_key(self))
+        if not data:
+            return False
+        self.instruments.load(data["instruments"])
+        self.settings.update({x: y for x, y in data["settings"].items() if x not in snapshot.UNSAVED_SETTINGS})
+        return True
+
+    async def save_snapshot(self):
+        # copied on the loop, so that the settings can't change while they are pickled off it
+        settings = {
+            x: y.copy() if isinstance(y, (dict, list)) else y for x, y in self.settings.items() if x not in snapshot.UNSAVED_SETTINGS
+        }
+        data = {"instruments": list(self.instruments.by_symbol.values()), "settings": settings}
+        key = snapshot.snapshot_key(self)
+        await loop_helper(lambda: snapshot.save(self.snapshot_path, key, data))
+
+    async def refresh_metadata(self):
+        await self.load_instruments()
+        try:
+            self.settings["future_contracts"] = await self.get_future_contracts()
+        except NotImplementedError:
+            pass
+        except Exception as e:
+            logger.exception(e)
+        if self.snapshot_path:
+            await self.save_snapshot()
+
+    async def start(self):
+        """Load metadata before the first order: from the snapshot when there is one, in which
+        case it is revalidated in the background, otherwise from the exchange."""
+        if self.clock:
+            await self.clock.start()
+        if self.warm_start():
+            self.refresh_task = asyncio.ensure_future(self.refresh_metadata())
+        else:
+            await self.refresh_metadata()
+
+    async def future_contracts(self):
+        if "future_contracts" not in self.settings:
+            self.settings["future_contracts"] = await self.get_future_contracts()
+        return self.settings["future_contracts"]
+
+    def create_order_book(self, symbol: str, derivative=False, depth: int = None) -> orderbook.OrderBook:
+        raise NotImplemented
+
+    async def order_book_snapshot(self, symbol: str, derivative=False):
+        raise NotImplemented
+
+    def order_book(self, symbol: str, derivative=False) -> typing.Optional[orderbook.OrderBook]:
+        book = self.order_books.get((symbol.upper(), derivative))
+        if book and book.synced:
+            return book
+        return None
+
+    async def sync_order_book(self, symbol: str, events: typing.AsyncIterator[dict], derivative=False, depth: int = None):
+        """Maintain a local book for `symbol` from an async iterator of decoded depth stream
+        messages until the iterator is exhausted. Books that need a REST snapshot fetch one
+        whenever they are out of sync."""
+        key = (symbol.upper(), derivative)
+        book = self.order_books[key] = self.create_order_book(symbol, derivative, depth)
+        fetch = None
+        try:
+            async for event in events:
+                try:
+                    book.feed(event)
+                except orderbook.OutOfSync as e:
+                    logger.warning(e)
+                if book.synced or not book.needs_snapshot:
+                    continue
+                if fetch is None:
+                    fetch = asyncio.ensure_future(self.order_book_snapshot(symbol, derivative))
+                elif fetch.done():
+                    task, fetch = fetch, None
+                    try:
+                        book.apply_snapshot(*task.result())
+                    except Exception as e:
+                        logger.exception(e)
+        finally:
+            if fetch:
+                fetch.cancel()
+            if self.order_books.get(key) is book:
+                del self.order_books[key]
+
+    def limit_price(self, symbol: str, side: str, quantity: float = None, price: float = None, derivative=False):
+        """`price` when given, otherwise the price that fills `quantity` against the local
+        book, or the top of the opposite side without a quantity."""
+        book = self.order_book(symbol, derivative)
+        if price is not None or book is None:
+            return price
+        if quantity:
+            return book.price_for(side, quantity)
+        best = book.side(side).best()
+        return best and best[0]
+
+    def client_order_id(self, *params) -> str:
+        self.order_sequence += 1
+        return utils.client_order_id(self.api_key, self.order_nonce, self.order_sequence, *params)
+
+    async def lookup_order(self, lookup):
+        try:
+            return await lookup()
+        except Exception:
+            return None
+
+    async def recover_clock(self, e: Exception):
+        if self.clock and utils.is_timestamp_error(e):
+            try:
+                await self.clock.resync()
+            except Exception as error:
+                logger.exception(error)
+
+    async def submit_order(self, send, lookup):
+        for attempt in range(self.order_retries + 1):
+            try:
+                return await send()
+            except Exception as e:
+                if attempt == self.order_retries or not utils.is_transient_error(e):
+                    raise
+                logger.info(f"Retrying order after {e!r}")
+                await self.recover_clock(e)
+                if utils.is_ambiguous_error(e):
+                    existing = await self.lookup_order(lookup)
+                    if existing:
+                        return existing
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+
+    async def submit_orders(self, orders: typing.List[typing.Any], send, lookup):
+        """Like `submit_order` for batch endpoints: after an ambiguous failure only the
+        orders that can't be found by client order id are sent again."""
+        placed = []
+        pending = orders
+        for attempt in range(self.order_retries + 1):
+            try:
+                return placed + list(await send(pending))
+            except Exception as e:
+                if attempt == self.order_retries or not utils.is_transient_error(e):
+                    raise
+                logger.info(f"Retrying {len(pending)} orders after {e!r}")
+                await self.recover_clock(e)
+                if utils.is_ambiguous_error(e):
+                    found = await asyncio.gather(*[self.lookup_order(lambda x=x: lookup(x)) for x in pending])
+                    placed.extend([x for x in found if x])
+                    pending = [x for x, y in zip(pending, found) if not y]
+                    if not pending:
+                        return placed
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+
     async def get_margin_accounts(self, symbol=None) -> typing.List[MarginAccount]:
         raise NotImplemented
 
     async def get_loanable_amount(self, symbol: str) -> typing.List[LoanInfo]:
         raise NotImplemented
 
+    async def get_loanable_amounts(self, symbols: typing.List[str]) -> typing.Dict[str, typing.List[LoanInfo]]:
+        results = await asyncio.gather(*[self.get_loanable_amount(x) for x in symbols])
+        return dict(zip(symbols, results))
+
     async def borrow_loan(self, asset: str, symbol: str, amount: float) -> bool:
         raise NotImplemented
 
@@ -42,6 +249,9 @@ class BaseExchange:
     async def bulk_create_orders(self, symbol: str, orders: typing.List[typing.Any]):
         raise NotImplemented
 
+    async def bulk_amend_orders(self, symbol: str, orders: typing.List[typing.Any]):
+        raise NotImplemented
+
     async def cancel_single_order(self, symbol: str, order_id):
         raise NotImplemented
 
@@ -57,6 +267,19 @@ class BaseExchange:
     async def get_closed_orders(self, symbol: str):
         raise NotImplemented
 
+    def history_store(self, path: str):
+        # imported here so that numpy is only needed for the history exports
+        from . import history
+        return history.ColumnStore(path, self.history_schema)
+
+    async def export_closed_orders(self, symbol: str, path: str) -> int:
+        records = await self.get_closed_orders(symbol)
+        store = self.history_store(path)
+        return await loop_helper(lambda: store.append(records))
+
+    def read_closed_orders(self, path: str):
+        return self.history_store(path).read()
+
     async def transfer_funds_to_trading_account(self, asset: str, amount: float = None, symbol: str = None):
         _amount = amount
         if not _amount:
@@ -71,7 +294,7 @@ class BaseExchange:
             _amount = account.balance[asset.upper()].free
         return await self.transfer_from_margin_to_spot(asset, _amount, symbol)
 
-    async def get_funding_account_balance(self, asset=None):
+    async def get_funding_account_balance(self, asset=None, **filters):
         raise NotImplemented
 
     async def transfer_funds_to_spot_account(self, asset: str, amount: float, symbol: str):
@@ -85,12 +308,33 @@ class BaseExchange:
 
     async def purchase_from_spot_and_transfer_to_margin(self, asset: str, amount: float, spot_symbol: str, side: str, margin_symbol: str):
         spot_instance = await self.get_spot_account_balance(asset)
-        if spot_instance.available < amount:
-            await self.spot_market_order(spot_symbol, amount, side)
-            spot_instance = await self.get_spot_account_balance(asset)
-        await self.transfer_from_spot_to_margin(asset, spot_instance.available, margin_symbol)
-
-    async def get_spot_account_balance(self, asset: str = None):
+        available = spot_instance.available
+        if available < amount:
+            order = await self.spot_market_order(spot_symbol, amount, side)
+            filled = self.filled_amount(order, asset)
+            if filled is None:
+                spot_instance = await self.get_spot_account_balance(asset)
+                available = spot_instance.available
+            else:
+                available += filled
+        await self.transfer_from_spot_to_margin(asset, available, margin_symbol)
+
+    def filled_amount(self, order, asset: str) -> typing.Optional[float]:
+        return None
+
+    async def transfer_between(self, asset: str, amount: float, source: str, target: str, source_symbol: str = None, target_symbol: str = None):
+        func = getattr(self, TRANSFER_ROUTES[(source, target)])
+        return await func(asset, amount, target_symbol or source_symbol)
+
+    async def rebalance(self, allocations: typing.List[dict], dry_run=False):
+        planner = TransferPlanner(self)
+        transfers = await planner.plan(allocations)
+        if dry_run:
+            return transfers
+        await planner.execute(transfers)
+        return transfers
+
+    async def get_spot_account_balance(self, asset: str = None, **filters):
         raise NotImplemented
 
     async def get_futures_account_balance(self, symbol: str = None):
@@ -99,6 +343,43 @@ class BaseExchange:
     async def get_margin_account_balance(self, asset: str = None, symbol: str = None):
         raise NotImplemented
 
+    async def get_futures_account_balances(self, assets: typing.Set[str] = None) -> typing.List[typing.Tuple[str, str, BalanceType]]:
+        return []
+
+    async def list_balances(self, account_type: str, assets: typing.Set[str] = None) -> typing.List[typing.Tuple[str, typing.Optional[str], typing.Any]]:
+        if account_type == 'funding':
+            return [(x.asset, None, x) for x in await self.get_funding_account_balance(assets=assets)]
+        if account_type == 'spot':
+            return [(x.asset, None, x) for x in await self.get_spot_account_balance(assets=assets)]
+        if account_type == 'margin':
+            accounts = await self.get_margin_accounts()
+            return [(asset, x.symbol, balance) for x in accounts for asset, balance in x.balance.items()]
+        return await self.get_futures_account_balances(assets)
+
+    async def get_balances(self, assets: typing.List[str] = None, account_types: typing.List[str] = ACCOUNT_TYPES) -> typing.Dict[str, dict]:
+        """Balances for many assets with one list request per account type, indexed as
+        `{asset: {account_type: balance}}`. Margin and futures balances are nested by symbol."""
+        assets = set(x.upper() for x in assets) if assets else None
+        kinds = list(dict.fromkeys(self.account_aliases.get(x, x) for x in account_types))
+        results = await asyncio.gather(*[self.list_balances(x, assets) for x in kinds])
+        balances = {}
+        for kind, entries in zip(kinds, results):
+            for asset, symbol, balance in entries:
+                asset = asset.upper()
+                if assets and asset not in assets:
+                    continue
+                if symbol:
+                    balances.setdefault(asset, {}).setdefault(kind, {})[symbol] = balance
+                else:
+                    balances.setdefault(asset, {})[kind] = balance
+        for kind in account_types:
+            alias = self.account_aliases.get(kind)
+            if alias:
+                for value in balances.values():
+                    if alias in value:
+                        value[kind] = value[alias]
+        return balances
+
     async def transfer_from_spot_to_future(self, asset: str, amount: float, symbol: str):
         raise NotImplemented
 
@@ -110,23 +391,112 @@ class BaseExchange:
 
     # Futures api implementation
     async def get_futures_position(self) -> FuturePosition:
-        raise NotImplemented
+        # a real exception, the kill switch skips backends without futures on it
+        raise NotImplementedError
+
+    async def open_positions(self) -> typing.List[FuturePosition]:
+        """Futures positions with a size, none for backends without futures."""
+        try:
+            positions = await self.get_futures_position()
+        except NotImplementedError:
+            return []
+        return [x for x in positions if x.size]
+
+    async def kill_targets(self, symbols: typing.List[str] = None, close_positions=False):
+        """Margin symbols, futures symbols and open futures positions to clear."""
+        if symbols:
+            # the same lookups as for every symbol, narrowed to the ones asked for
+            wanted = {x.upper() for x in symbols}
+            margin, futures, positions = await self.kill_targets(None, close_positions)
+            return (
+                {x for x in margin if x.upper() in wanted}, {x for x in futures if x.upper() in wanted},
+                [x for x in positions if x.symbol.upper() in wanted],
+            )
+        accounts, positions = await asyncio.gather(self.get_margin_accounts(), self.open_positions())
+        return active_margin_symbols(accounts), {x.symbol for x in positions}, positions
+
+    async def close_position(self, position: FuturePosition):
+        side = 'sell' if position.kind == 'long' else 'buy'
+        return await self.create_future_order(
+            position.symbol, side, position.size, position.mark_price, kind=position.kind, force_market=True, is_market=True
+        )
+
+    async def kill_all(self, symbols: typing.List[str] = None, close_positions=False) -> typing.Dict[typing.Tuple[str, str], dict]:
+        """Cancel every open margin and futures order, optionally closing futures positions at
+        market, concurrently for all symbols. Returns `{(account, symbol): {"latency", "error"}}`
+        with the seconds from the call until that symbol was cleared."""
+        started = time.monotonic()
+        margin, futures, positions = await self.kill_targets(symbols, close_positions)
+
+        async def clear_futures(symbol):
+            await self.cancel_future_open_orders(symbol)
+            if close_positions:
+                await asyncio.gather(*[self.close_position(x) for x in positions if x.symbol == symbol])
+
+        async def run(key, coroutine):
+            error = None
+            try:
+                await coroutine
+            except Exception as e:
+                logger.exception(e)
+                error = e
+            return key, {"latency": time.monotonic() - started, "error": error}
+        results = await asyncio.gather(
+            *[run(('margin', x), self.cancel_open_orders(x)) for x in margin],
+            *[run(('futures', x), clear_futures(x)) for x in futures],
+        )
+        return dict(results)
 
     async def get_future_contracts(self):
-        raise NotImplemented
+        # a real exception, refresh_metadata skips backends without futures on it
+        raise NotImplementedError
 
     async def get_futures_leverage(self, symbol: str):
         raise NotImplemented
 
-    async def set_futures_leverage(self, symbol: str, value: float):
+    async def set_futures_leverage(self, symbol: str, value: float, force=False):
+        raise NotImplemented
+
+    async def fetch_leverage_settings(self, symbols: typing.List[str] = None) -> typing.Dict[str, float]:
         raise NotImplemented
 
+    async def load_leverage_settings(self, symbols: typing.List[str] = None) -> typing.Dict[str, float]:
+        """Fill the leverage cache, with a single account request where the venue allows it."""
+        leverage = await self.fetch_leverage_settings(symbols)
+        self.settings.setdefault("leverage", {}).update({x.upper(): float(y) for x, y in leverage.items()})
+        return self.settings["leverage"]
+
+    def leverage_unchanged(self, symbol: str, value: float, force=False) -> bool:
+        """Whether the cached leverage already matches. It is only filled from this process,
+        but can still miss a change made elsewhere since; `force` always sends the request."""
+        return not force and self.settings.get("leverage", {}).get(symbol.upper()) == float(value)
+
+    def store_leverage(self, symbol: str, value: float):
+        self.settings.setdefault("leverage", {})[symbol.upper()] = float(value)
+
+    async def cached_futures_leverage(self, symbol: str) -> typing.Optional[float]:
+        if symbol.upper() not in self.settings.get("leverage", {}):
+            await self.load_leverage_settings([symbol])
+        return self.settings["leverage"].get(symbol.upper())
+
+    async def set_futures_leverages(self, values: typing.Dict[str, float], force=False) -> typing.Dict[str, typing.Any]:
+        """Apply many leverage settings concurrently. Symbols already at the requested
+        leverage are skipped unless `force`; failures are returned in place of the result."""
+        missing = [x for x in values if x.upper() not in self.settings.get("leverage", {})]
+        if missing and not force:
+            await self.load_leverage_settings(missing)
+        results = await asyncio.gather(*[self.set_futures_leverage(x, y, force) for x, y in values.items()], return_exceptions=True)
+        return dict(zip(values, results))
+
     async def create_future_order(self, symbol: str, side: str, quantity: float = None, price: float = None, notional: float = None, **kwargs):
         raise NotImplemented
 
     async def bulk_create_future_orders(self, symbol: str, orders: typing.List[typing.Any]):
         raise NotImplemented
 
+    async def bulk_amend_future_orders(self, symbol: str, orders: typing.List[typing.Any]):
+        raise NotImplemented
+
     async def cancel_future_order(self, symbol: str, order_id):
         raise NotImplemented
 
@@ -1,10 +1,29 @@
+import operator
+import time
 import typing
 import asyncio
 from binance.client import Client
-from binance.exceptions import BinanceAPIException
-
-from . import types, utils
-from .base import BaseExchange, logger
+from binance.exceptions import BinanceAPIException, BinanceRequestException
+
+from . import instruments, orderbook, scheduler, signing, timesync, transport, types, utils
+from .base import BaseExchange, active_margin_symbols, logger, loop_helper
+
+BINANCE_HOSTS = {
+    'https://api.binance.com': [
+        'https://api.binance.com', 'https://api1.binance.com',
+        'https://api2.binance.com', 'https://api3.binance.com',
+    ],
+    'https://fapi.binance.com': ['https://fapi.binance.com'],
+    'https://dapi.binance.com': ['https://dapi.binance.com'],
+}
+PING_PATHS = {
+    'https://api.binance.com': '/api/v3/ping',
+    'https://fapi.binance.com': '/fapi/v1/ping',
+    'https://dapi.binance.com': '/dapi/v1/ping',
+}
+MARGIN_ORDER = ('https://api.binance.com', '/sapi/v1/margin/order')
+FUTURES_ORDER = ('https://fapi.binance.com', '/fapi/v1/order')
+COIN_FUTURES_ORDER = ('https://dapi.binance.com', '/dapi/v1/order')
 
 
 class BinanceAssetBalance(types.AssetBalance):
@@ -44,6 +63,14 @@ class BinanceBalanceType(types.BalanceType):
         self.locked = float(x['locked'])
 
 
+class BinanceFutureBalanceType(types.BalanceType):
+    def __init__(self, x) -> None:
+        self.asset = x['asset']
+        self.balance = float(x['walletBalance'])
+        self.available = float(x['availableBalance'])
+        self.locked = float(x['initialMargin'])
+
+
 class BinanceFuturePosition(types.FuturePosition):
     def __init__(self, x, coin_type) -> None:
         self.symbol = x['symbol']
@@ -59,6 +86,52 @@ class BinanceFuturePosition(types.FuturePosition):
 
 
 class BinanceClient(Client):
+    def __init__(self, *args, selectors: typing.Dict[str, transport.HostSelector] = None, clock: timesync.ClockSync = None, **kwargs):
+        self.selectors = selectors or {}
+        self.clock = clock
+        self.local_offset = 0
+        super().__init__(*args, **kwargs)
+
+    @property
+    def timestamp_offset(self):
+        # signed requests are stamped with time.time() * 1000 + timestamp_offset
+        if self.clock:
+            return self.clock.offset * 1000
+        return self.local_offset
+
+    @timestamp_offset.setter
+    def timestamp_offset(self, value):
+        self.local_offset = value
+
+    def _request(self, method, uri, signed, force_params=False, **kwargs):
+        origin = '/'.join(uri.split('/', 3)[:3])
+        selector = self.selectors.get(origin)
+        if not selector:
+            return super()._request(method, uri, signed, force_params, **kwargs)
+        host = selector.best()
+        endpoint = uri[len(origin):]
+        self.REQUEST_TIMEOUT = selector.timeout(endpoint)
+        start = time.monotonic()
+        try:
+            result = super()._request(method, host + endpoint, signed, force_params, **kwargs)
+        except BinanceAPIException as e:
+            selector.record(host, endpoint, time.monotonic() - start, ok=e.status_code < 500)
+            raise
+        except Exception:
+            selector.record(host, endpoint, time.monotonic() - start, ok=False)
+            raise
+        selector.record(host, endpoint, time.monotonic() - start)
+        return result
+
+    def _handle_response(self, response=None):
+        response = self.response if response is None else response
+        if not (200 <= response.status_code < 300):
+            raise BinanceAPIException(response, response.status_code, response.text)
+        try:
+            return utils.json_loads(response.content)
+        except ValueError:
+            raise BinanceRequestException('Invalid Response: %s' % response.text)
+
     def _create_futures_api_uri(self, path, version=1):
         options = {1: self.FUTURES_API_VERSION, 2: self.FUTURES_API_VERSION2}
         return self.FUTURES_URL + '/' + options[version] + '/' + path
@@ -106,6 +179,37 @@ class BinanceClient(Client):
         return self._request_futures_api('delete', 'batchOrders', True, data=kwargs)
 
 
+def binance_balance_amount(x) -> float:
+    return float(x['free']) + float(x['locked'])
+
+
+def build_balances(balances, **filters) -> types.BalanceList:
+    return types.BalanceList.filtered(balances, BinanceBalanceType, operator.itemgetter('asset'), binance_balance_amount, **filters)
+
+
+def build_margin_accounts(assets):
+    return [BinanceMarginAccount(**x) for x in assets]
+
+
+def build_future_positions(positions, coin_type):
+    return [BinanceFuturePosition(x, coin_type) for x in positions]
+
+
+def build_instruments(spot, usdt, coin):
+    def future(x, product_type):
+        expiry = x['symbol'].partition('_')[2] if x.get('contractType') != 'PERPETUAL' else None
+        return instruments.Instrument(
+            x['symbol'], product_type, x['baseAsset'], x['quoteAsset'], x['marginAsset'],
+            x.get('contractSize') or 1, expiry or None, x
+        )
+    return [
+        instruments.Instrument(
+            x['symbol'], instruments.MARGIN if x.get('isMarginTradingAllowed') else instruments.SPOT,
+            x['baseAsset'], x['quoteAsset'], info=x
+        ) for x in spot
+    ] + [future(x, instruments.LINEAR) for x in usdt] + [future(x, instruments.INVERSE) for x in coin]
+
+
 def process_places(exchange_info, symbol):
     results = [
         x for x in exchange_info["symbols"] if x["symbol"].lower() == symbol.lower()
@@ -143,22 +247,77 @@ def process_places(exchange_info, symbol):
         }
 
 
+def process_symbol_places(symbols, symbol):
+    return process_places({'symbols': symbols}, symbol)
+
+
 class BinanceExchange(BaseExchange):
+    account_aliases = {'spot': 'funding'}
+    transfer_routes = frozenset([('funding', 'margin'), ('margin', 'funding')])
+    history_schema = [
+        ('id', 'int64', 'id'), ('order_id', 'int64', 'orderId'), ('symbol', 'str', 'symbol'),
+        ('price', 'float64', 'price'), ('qty', 'float64', 'qty'), ('quote_qty', 'float64', 'quoteQty'),
+        ('commission', 'float64', 'commission'), ('commission_asset', 'str', 'commissionAsset'),
+        ('time', 'timestamp', 'time'), ('is_buyer', 'bool', 'isBuyer'), ('is_maker', 'bool', 'isMaker'),
+    ]
+
     def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
+        hosts = {**BINANCE_HOSTS, **kwargs.get('hosts', {})}
+        self.selectors = {origin: transport.HostSelector(x) for origin, x in hosts.items()}
+        self.clock = timesync.shared_clock(
+            ('binance', tuple(hosts['https://api.binance.com'])),
+            lambda: timesync.binance_time(self.selectors['https://api.binance.com'].best() + '/api/v3/time')
+        )
+        self.order_sender = None
+        if kwargs.get('fast_orders', True):
+            self.order_sender = signing.BinanceOrderSender(
+                self.api_key, self.api_secret, self.selectors, self.clock, error=lambda x: BinanceAPIException(x, x.status_code, x.text)
+            )
 
     @property
     def client(self) -> BinanceClient:
-        return BinanceClient(api_key=self.api_key, api_secret=self.api_secret)
+        return BinanceClient(api_key=self.api_key, api_secret=self.api_secret, selectors=self.selectors, clock=self.clock)
+
+    async def probe_hosts(self):
+        await asyncio.gather(*[
+            asyncio.get_event_loop().run_in_executor(None, selector.probe, PING_PATHS[origin])
+            for origin, selector in self.selectors.items() if origin in PING_PATHS
+        ])
+
+    def parse_instrument(self, symbol: str, derivative=False) -> instruments.Instrument:
+        return instruments.parse_binance(symbol, derivative)
+
+    async def load_instruments(self):
+        spot, usdt, coin = await asyncio.gather(
+            self.client_helper('get_exchange_info'),
+            self.client_helper('futures_exchange_info'),
+            self.client_helper('futures_coin_exchange_info'),
+        )
+        self.instruments.load(await self.parse_helper(build_instruments, spot['symbols'], usdt['symbols'], coin['symbols']))
+
+    def create_order_book(self, symbol: str, derivative=False, depth: int = None) -> orderbook.OrderBook:
+        return orderbook.BinanceOrderBook(symbol.upper(), depth, derivative)
+
+    async def order_book_snapshot(self, symbol: str, derivative=False):
+        function_name = 'get_order_book'
+        if derivative:
+            function_name = 'futures_coin_order_book' if self.instrument(symbol, True).is_inverse else 'futures_order_book'
+        result = await self.client_helper(function_name, symbol=symbol.upper(), limit=1000)
+        return result['bids'], result['asks'], result['lastUpdateId']
 
     async def update_price_and_decimal_places(self, symbol: str, raw=False, _type='margin', coin_type=False):
         if not raw:
-            if _type == 'margin':
-                func = self.client.get_exchange_info
+            instrument = self.instrument(symbol, _type != 'margin')
+            if instrument.info:
+                result = process_places({'symbols': [instrument.info]}, symbol)
             else:
-                func = self.client.futures_coin_exchange_info if coin_type else self.client.futures_exchange_info
-            exchange_info = func()
-            result = process_places(exchange_info, symbol)
+                if _type == 'margin':
+                    func = 'get_exchange_info'
+                else:
+                    func = 'futures_coin_exchange_info' if coin_type else 'futures_exchange_info'
+                exchange_info = await self.client_helper(func)
+                result = await self.parse_helper(process_symbol_places, exchange_info['symbols'], symbol)
             if result:
                 self.price_places = result["price_places"]
                 self.decimal_places = result["places"]
@@ -173,26 +332,48 @@ class BinanceExchange(BaseExchange):
             account = self.client.get_isolated_margin_account(symbols=symbol)
             return BinanceMarginAccount(**account['assets'][0])
         else:
-            account = self.client.get_isolated_margin_account()
-            return [BinanceMarginAccount(**x) for x in account['assets']]
+            account = await self.client_helper('get_isolated_margin_account')
+            return await self.parse_helper(build_margin_accounts, account['assets'])
 
     async def get_loanable_amount(self, symbol: str) -> typing.List[types.LoanInfo]:
-        symbol_info = self.client.get_isolated_margin_symbol(symbol=symbol)
-        max_loan_helper = lambda **x: self.client_helper('get_max_margin_loan', **x)
-
-        def interest_rate_helper(x):
-            return self.client_helper('interest_rate_history', asset=x, limit=1)
-        base_loan, quote_loan, base_rate, quote_rate = await asyncio.gather(
-            max_loan_helper(asset=symbol_info['base'], isolatedSymbol=symbol),
-            max_loan_helper(asset=symbol_info['quote'], isolatedSymbol=symbol),
-            interest_rate_helper(symbol_info['base']),
-            interest_rate_helper(symbol_info['quote'])
+        result = await self.get_loanable_amounts([symbol])
+        return result[symbol]
+
+    async def get_isolated_margin_symbols(self) -> typing.Dict[str, dict]:
+        async def fetch():
+            result = await self.client_helper('get_all_isolated_margin_symbols')
+            return {x['symbol']: x for x in result}
+        return await self.daily_cache.fetch('isolated_margin_symbols', fetch)
+
+    async def get_loanable_amounts(self, symbols: typing.List[str]) -> typing.Dict[str, typing.List[types.LoanInfo]]:
+        symbol_infos = await self.get_isolated_margin_symbols()
+        pairs = {x: symbol_infos[x.upper()] for x in symbols}
+        assets = list(set(y for x in pairs.values() for y in (x['base'], x['quote'])))
+        legs = [(x, y) for x, info in pairs.items() for y in (info['base'], info['quote'])]
+
+        def interest_rate_helper(asset):
+            # rates are published once a day, so they are kept until the next UTC midnight
+            return self.daily_cache.fetch(
+                ('interest_rate', asset),
+                lambda: self.client_helper('interest_rate_history', asset=asset, limit=1),
+                utils.next_utc_midnight()
+            )
+
+        def max_loan_helper(symbol, asset):
+            return self.loan_cache.fetch(
+                ('max_loan', symbol, asset),
+                lambda: self.client_helper('get_max_margin_loan', asset=asset, isolatedSymbol=symbol.upper())
+            )
+        rates, loans = await asyncio.gather(
+            asyncio.gather(*[interest_rate_helper(x) for x in assets]),
+            asyncio.gather(*[max_loan_helper(*x) for x in legs]),
         )
-
-        return [
-            BinanceLoanInfo(symbol_info['base'], base_loan, base_rate[0]),
-            BinanceLoanInfo(symbol_info['quote'], quote_loan, quote_rate[0])
-        ]
+        rates = dict(zip(assets, rates))
+        loans = dict(zip(legs, loans))
+        return {
+            x: [BinanceLoanInfo(y, loans[(x, y)], rates[y][0]) for y in (info['base'], info['quote'])]
+            for x, info in pairs.items()
+        }
 
     async def borrow_loan(self, asset: str, symbol: str, amount: float) -> bool:
         try:
@@ -211,7 +392,14 @@ class BinanceExchange(BaseExchange):
             return False
 
     async def create_single_order(self, symbol: str, side: str, quantity: float, price: float, notional: float = None, raw=False, **kwargs):
-        _, current_price = await asyncio.gather(self.update_price_and_decimal_places(symbol, raw=raw), self.client_helper('get_price', symbol))
+        price = self.limit_price(symbol, side, quantity, price)
+        client_id = kwargs.get("client_id") or self.client_order_id(symbol, side, quantity, price, notional)
+        book = self.order_book(symbol)
+        if book and book.mid_price():
+            await self.update_price_and_decimal_places(symbol, raw=raw)
+            current_price = book.mid_price()
+        else:
+            _, current_price = await asyncio.gather(self.update_price_and_decimal_places(symbol, raw=raw), self.client_helper('get_price', symbol))
 
         def get_type(params):
             if params["side"]:
@@ -248,6 +436,7 @@ class BinanceExchange(BaseExchange):
             "type": "LIMIT",
             "timeInForce": "GTC",
             "sideEffectType": "MARGIN_BUY",
+            "newClientOrderId": client_id,
         }
         if kwargs.get("repay"):
             v["sideEffectType"] = "AUTO_REPAY"
@@ -262,30 +451,55 @@ class BinanceExchange(BaseExchange):
             del v["price"]
         if raw:
             return v
-        result = self.client.create_margin_order(isIsolated="TRUE", **v)
+        result = await self.submit_margin_order(v)
         return result['orderId']
 
+    async def send_order(self, endpoint: typing.Tuple[str, str], function_name: str, order: dict):
+        if self.order_sender:
+            return await self.scheduler.run(scheduler.ORDER, lambda: self.order_sender.post(*endpoint, order))
+        return await self.client_helper(function_name, **order)
+
+    async def submit_margin_order(self, order):
+        return await self.submit_order(
+            lambda: self.send_order(MARGIN_ORDER, 'create_margin_order', {**order, 'isIsolated': 'TRUE'}),
+            lambda: self.client_helper('get_margin_order', symbol=order['symbol'], origClientOrderId=order['newClientOrderId'], isIsolated='TRUE')
+        )
+
     async def bulk_create_orders(self, symbol: str, orders: typing.List[typing.Any]):
         await self.update_price_and_decimal_places(symbol)
         _orders = await asyncio.gather(*[self.create_single_order(**{'raw': True, 'symbol': symbol, **x}) for x in orders])
-        results = await asyncio.gather(*[self.client_helper('create_margin_order', isIsolated='TRUE', **x) for x in _orders])
+        results = await asyncio.gather(*[self.submit_margin_order(x) for x in _orders])
         return results
 
     async def cancel_single_order(self, symbol: str, order_id):
-        self.client.cancel_margin_order(symbol=symbol.upper(), orderId=order_id, isolated=True)
+        await self.client_helper('cancel_margin_order', symbol=symbol.upper(), orderId=order_id, isolated=True)
 
     async def bulk_cancel_orders(self, symbol: str, order_ids: typing.List[typing.Any]):
-        await asyncio.gather(*[self.client_helper('cancel_margin_orders', symbol=symbol, orderId=x, isolated=True) for x in order_ids])
+        await asyncio.gather(*[self.client_helper('cancel_margin_order', symbol=symbol.upper(), orderId=x, isIsolated='TRUE') for x in order_ids])
 
     async def cancel_open_orders(self, symbol: str):
-        self.client.cancel_margin_open_orders(symbol=symbol, isIsolated="TRUE")
+        await self.client_helper('cancel_margin_open_orders', symbol=symbol, isIsolated="TRUE")
 
     async def get_open_orders(self, symbol: str):
         return self.client.get_open_margin_orders(symbol=symbol, isIsolated="TRUE")
 
-    async def get_closed_orders(self, symbol: str):
-        orders = self.client.get_margin_trades(symbol=symbol, isIsolated='TRUE')
-        return orders
+    async def get_closed_orders(self, symbol: str, from_id: int = 0):
+        """Trades from `from_id` on. Without `fromId` the endpoint only returns the last
+        500, so the history is paged through by trade id."""
+        orders = []
+        while True:
+            page = await self.client_helper('get_margin_trades', symbol=symbol, isIsolated='TRUE', fromId=from_id, limit=1000)
+            orders.extend(page)
+            if len(page) < 1000:
+                return orders
+            from_id = page[-1]['id'] + 1
+
+    async def export_closed_orders(self, symbol: str, path: str) -> int:
+        # resumes after the last stored trade id rather than paging through the whole history again
+        store = self.history_store(path)
+        last = store.meta["last"]
+        records = await self.get_closed_orders(symbol, 0 if last is None else last + 1)
+        return await loop_helper(lambda: store.append(records))
 
     async def transfer_from_spot_to_margin(self, asset: str, amount: float, symbol: str):
         self.client.transfer_spot_to_isolated_margin(
@@ -297,48 +511,84 @@ class BinanceExchange(BaseExchange):
             asset=asset, symbol=symbol, amount=amount
         )
 
-    async def get_funding_account_balance(self, asset=None):
+    async def get_funding_account_balance(self, asset=None, **filters):
+        """One asset's balance, or all of them as a lazy `BalanceList` narrowed by `non_zero`,
+        `assets`, `min_value` and `prices`."""
         if asset:
             result = self.client.get_asset_balance(asset)
             return BinanceBalanceType(result)
-        result = self.client.get_account()
-        return [BinanceBalanceType(x) for x in result['balances']]
+        result = await self.client_helper('get_account')
+        return build_balances(result['balances'], **filters)
+
+    async def get_spot_account_balance(self, asset: str = None, **filters):
+        return await self.get_funding_account_balance(asset, **filters)
 
-    async def get_spot_account_balance(self, asset: str = None):
-        return await self.get_funding_account_balance(asset)
+    async def get_futures_account_balance(self, symbol: str):
+        """Balance of the asset `symbol` settles in, from the USDT or coin margined account."""
+        instrument = self.instrument(symbol, True)
+        account = await self.client_helper('futures_coin_account' if instrument.is_inverse else 'futures_account')
+        found = next((x for x in account['assets'] if x['asset'] == instrument.settle), None)
+        return BinanceFutureBalanceType(found or {'asset': instrument.settle, 'walletBalance': 0, 'availableBalance': 0, 'initialMargin': 0})
+
+    async def get_futures_account_balances(self, assets: typing.Set[str] = None):
+        usdt, coin = await asyncio.gather(self.client_helper('futures_account'), self.client_helper('futures_coin_account'))
+        return [
+            (x['asset'], future_type, BinanceFutureBalanceType(x))
+            for future_type, account in [('usdt', usdt), ('coin', coin)]
+            for x in account['assets'] if not assets or x['asset'] in assets
+        ]
 
     async def spot_market_order(self, symbol: str, amount: float, side: str):
         await self.update_price_and_decimal_places(symbol)
         if side == 'buy':
-            self.client.order_market_buy(symbol=symbol, quantity=float(self.decimal_places % amount))
-        else:
-            self.client.order_market_sell(symbol=symbol, quantity=float(self.decimal_places % amount))
+            return self.client.order_market_buy(symbol=symbol, quantity=float(self.decimal_places % amount))
+        return self.client.order_market_sell(symbol=symbol, quantity=float(self.decimal_places % amount))
+
+    def filled_amount(self, order, asset: str) -> typing.Optional[float]:
+        if not order or 'fills' not in order:
+            return None
+        key = 'executedQty' if order['side'] == 'BUY' else 'cummulativeQuoteQty'
+        fees = sum(float(x['commission']) for x in order['fills'] if x['commissionAsset'] == asset.upper())
+        return float(order[key]) - fees
 
     async def get_futures_position(self, symbol: str = None) -> BinanceFuturePosition:
-        coin_type = len(symbol.lower().split('usd_perp')) > 1
-        func = self.client.futures_coin_position_information if coin_type else self.client.futures_position_information
+        instrument = self.instrument(symbol, True) if symbol else None
+        coin_type = bool(instrument and instrument.is_inverse)
+        func = 'futures_coin_position_information' if coin_type else 'futures_position_information'
         if symbol:
             kwargs = {}
             if coin_type:
-                kwargs['marginAsset'] = symbol.lower().split("usd")[0]
+                kwargs['marginAsset'] = instrument.settle
             else:
                 kwargs['symbol'] = symbol
-            positions = func(**kwargs)
+            positions = await self.client_helper(func, **kwargs)
             positions = [x for x in positions if x['symbol'].lower() == symbol.lower()]
         else:
-            positions = func()
-        return [BinanceFuturePosition(x, coin_type) for x in positions]
+            positions = await self.client_helper(func)
+        return await self.parse_helper(build_future_positions, positions, coin_type)
+
+    async def kill_targets(self, symbols: typing.List[str] = None, close_positions=False):
+        if symbols:
+            return await super().kill_targets(symbols, close_positions)
+        accounts, usdt, coin, usdt_orders, coin_orders = await asyncio.gather(
+            self.get_margin_accounts(),
+            self.client_helper('futures_position_information'),
+            self.client_helper('futures_coin_position_information'),
+            self.client_helper('futures_get_open_orders'),
+            self.client_helper('futures_coin_get_open_orders'),
+        )
+        positions = build_future_positions(usdt, False) + build_future_positions(coin, True)
+        positions = [x for x in positions if x.size]
+        futures = {x['symbol'] for x in usdt_orders + coin_orders} | {x.symbol for x in positions}
+        return active_margin_symbols(accounts), futures, positions
 
     async def get_future_contracts(self):
         usdt, coin = await asyncio.gather(self.client_helper('futures_account'), self.client_helper('futures_coin_account'))
-        usdt = [x for x in usdt['positions']]
-        coin = [x for x in coin['positions']]
-        perpetual_usdt = [x for x in usdt if len(x['symbol'].lower().split("_")) == 1]
-        perpetual_coin = [x for x in coin if len(x['symbol'].lower().split('usd_perp')) > 1]
+        positions = [(x, self.instrument(x['symbol'], True)) for x in usdt['positions'] + coin['positions']]
+        self.settings.setdefault('leverage', {}).update({x['symbol'].upper(): float(x['leverage']) for x, _ in positions})
         result = [
-            {'symbol': x['symbol'], 'underlying':x['symbol'].split("_")[0], 'currency':'usdt', 'leverage':x['leverage']} for x in perpetual_usdt
-        ] + [
-            {'symbol': x['symbol'], 'underlying':x['symbol'].split("_")[0], 'leverage':x['leverage'], 'currency':x['symbol'].lower().split("usd_")[0]} for x in perpetual_coin
+            {'symbol': x['symbol'], 'underlying': y.base + y.quote, 'currency': y.settle.lower(), 'leverage': x['leverage']}
+            for x, y in positions if not y.expiry
         ]
         symbols = list(set([x['symbol'] for x in result]))
         r = []
@@ -347,13 +597,38 @@ class BinanceExchange(BaseExchange):
             r.append(uu)
         return r
 
-    async def set_futures_leverage(self, symbol: str, value: float):
-        coin_type = len(symbol.lower().split('usd_perp')) > 1
-        func = self.client.futures_coin_change_leverage if coin_type else self.client.futures_change_leverage
-        result = func(symbol=symbol, leverage=value)
+    async def fetch_leverage_settings(self, symbols: typing.List[str] = None) -> typing.Dict[str, float]:
+        # both account payloads carry every contract, so this is two requests whatever the symbols
+        usdt, coin = await asyncio.gather(self.client_helper('futures_account'), self.client_helper('futures_coin_account'))
+        positions = usdt['positions'] + coin['positions']
+        self.settings.setdefault('margin_type', {}).update({
+            x['symbol'].upper(): 'isolated' if x.get('isolated') else 'cross' for x in positions
+        })
+        return {x['symbol']: x['leverage'] for x in positions}
+
+    async def set_futures_leverage(self, symbol: str, value: float, force=False):
+        if self.leverage_unchanged(symbol, value, force):
+            return None
+        coin_type = self.instrument(symbol, True).is_inverse
+        func = 'futures_coin_change_leverage' if coin_type else 'futures_change_leverage'
+        result = await self.client_helper(func, symbol=symbol.upper(), leverage=value)
+        self.store_leverage(symbol, value)
+        return result
+
+    async def set_futures_margin_type(self, symbol: str, margin_type: str):
+        margin_types = self.settings.setdefault('margin_type', {})
+        if margin_types.get(symbol.upper()) == margin_type.lower():
+            return None
+        coin_type = self.instrument(symbol, True).is_inverse
+        func = 'futures_coin_change_margin_type' if coin_type else 'futures_change_margin_type'
+        result = await self.client_helper(func, symbol=symbol.upper(), marginType=margin_type.upper())
+        margin_types[symbol.upper()] = margin_type.lower()
+        return result
 
-    async def create_future_order(self, symbol: str, side: str, quantity: float, price: float, notional: float, raw=False, **kwargs):
-        coin_type = len(symbol.lower().split('usd_perp')) > 1
+    async def create_future_order(self, symbol: str, side: str, quantity: float, price: float, notional: float = None, raw=False, **kwargs):
+        price = self.limit_price(symbol, side, quantity, price, derivative=True)
+        client_id = kwargs.get("client_id") or self.client_order_id(symbol, side, quantity, price, kwargs.get('kind'), kwargs.get('stop'))
+        coin_type = self.instrument(symbol, True).is_inverse
         await self.update_price_and_decimal_places(symbol, raw=raw, _type="future", coin_type=coin_type)
         v = {
             "symbol": symbol.upper(),
@@ -363,6 +638,7 @@ class BinanceExchange(BaseExchange):
             "type": "LIMIT",
             "positionSide": kwargs.get('kind').upper(),
             "timeInForce": "GTC",
+            "newClientOrderId": client_id,
         }
         if kwargs.get("stop"):
             v["type"] = (kwargs.get("type") or "STOP").upper()
@@ -380,46 +656,49 @@ class BinanceExchange(BaseExchange):
             v["type"] = "MARKET"
         if raw:
             return v
-        func = (
-            self.client.futures_coin_create_order
-            if coin_type
-            else self.client.futures_create_order
+        return await self.submit_order(
+            lambda: self.send_order(
+                COIN_FUTURES_ORDER if coin_type else FUTURES_ORDER, 'futures_coin_create_order' if coin_type else 'futures_create_order', v
+            ),
+            lambda: self.get_future_order_by_client_id(v['symbol'], v['newClientOrderId'], coin_type)
         )
-        func(**v)
+
+    async def get_future_order_by_client_id(self, symbol: str, client_id: str, coin_type: bool):
+        func = 'futures_coin_get_order' if coin_type else 'futures_get_order'
+        return await self.client_helper(func, symbol=symbol, origClientOrderId=client_id)
 
     async def bulk_create_future_orders(self, symbol: str, orders: typing.List[typing.Any]):
-        coin_type = len(symbol.lower().split('usd_perp')) > 1
+        coin_type = self.instrument(symbol, True).is_inverse
         _orders = await asyncio.gather(*[self.create_future_order(**{'raw': True, 'symbol': symbol, **x}) for x in orders])
         batches = [x for x in utils.chunks(_orders, 5)]
-        result = await asyncio.gather(*[self.client_helper('bulk_future_create_orders', coin_type, batchOrders=x) for x in batches])
+        result = await asyncio.gather(*[
+            self.submit_orders(
+                x,
+                lambda batch: self.client_helper('bulk_future_create_orders', coin_type, batchOrders=batch),
+                lambda order: self.get_future_order_by_client_id(order['symbol'], order['newClientOrderId'], coin_type)
+            ) for x in batches
+        ])
         return result
 
     async def cancel_future_order(self, symbol: str, order_id):
-        coin_type = len(symbol.lower().split('usd_perp')) > 1
-        func = (
-            self.client.futures_coin_cancel_order
-            if coin_type else self.client.futures_cancel_order
-        )
-        func(symbol=symbol.upper(), orderId=order_id)
+        coin_type = self.instrument(symbol, True).is_inverse
+        func = 'futures_coin_cancel_order' if coin_type else 'futures_cancel_order'
+        await self.client_helper(func, symbol=symbol.upper(), orderId=order_id)
 
     async def bulk_cancel_future_orders(self, symbol: str, order_ids: typing.List[typing.Any]):
-        # coin_type = len(symbol.lower().split('usd_perp')) > 1
+        # coin_type = self.instrument(symbol, True).is_inverse
         await asyncio.gather(*[self.cancel_future_order(symbol, x) for x in order_ids])
         # batches = [x for x in utils.chunks(order_ids, 5)]
         # result = await asyncio.gather(*[self.client_helper('bulk_future_cancel_orders', coin_type, symbol=symbol.upper(), orderIdList=x) for x in batches])
         # return result
 
     async def cancel_future_open_orders(self, symbol: str):
-        coin_type = len(symbol.lower().split('usd_perp')) > 1
-        func = (
-            self.client.futures_coin_cancel_all_open_orders
-            if coin_type
-            else self.client.futures_cancel_all_open_orders
-        )
-        func(symbol=symbol.upper())
+        coin_type = self.instrument(symbol, True).is_inverse
+        func = 'futures_coin_cancel_all_open_orders' if coin_type else 'futures_cancel_all_open_orders'
+        await self.client_helper(func, symbol=symbol.upper())
 
     async def get_future_open_orders(self, symbol: str):
-        coin_type = len(symbol.lower().split('usd_perp')) > 1
+        coin_type = self.instrument(symbol, True).is_inverse
         func = (
             self.client.futures_coin_get_open_orders
             if coin_type else self.client.futures_get_open_orders
@@ -0,0 +1,229 @@
+"""Record the HTTP traffic of the exchange clients into a cassette and replay it offline.
+
+    with cassette.Recorder("contracts.jsonl.gz"):
+        await exchange.get_future_contracts()
+
+    with cassette.Replayer("contracts.jsonl.gz", realtime=False):
+        await exchange.get_future_contracts()
+
+Both patch `requests.adapters.HTTPAdapter.send`, which every SDK used here ends up in,
+whether it keeps a session (python-binance) or calls `requests.get` directly (OKEx).
+"""
+import collections
+import datetime
+import gzip
+import json
+import threading
+import time
+import typing
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+REDACTED = "***"
+SECRET_HEADERS = {"x-mbx-apikey", "ok-access-key", "ok-access-sign", "ok-access-passphrase", "authorization"}
+SECRET_PARAMS = {"signature", "apikey", "api_key", "secretkey"}
+# parameters that change on every call and must not take part in matching
+VOLATILE_PARAMS = {"timestamp", "signature", "recvwindow", "newclientorderid", "origclientorderid", "client_oid", "clordid"}
+# left out of the match key: volatile parameters, and secrets so that no key material is stored
+UNMATCHED_PARAMS = VOLATILE_PARAMS | SECRET_PARAMS
+RESPONSE_HEADERS = {"content-type", "ok-before", "ok-after", "x-mbx-used-weight", "x-mbx-used-weight-1m"}
+
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    pass
+
+
+def redact_params(pairs: typing.List[typing.Tuple[str, str]]) -> typing.List[typing.Tuple[str, str]]:
+    return [(x, REDACTED if x.lower() in SECRET_PARAMS else y) for x, y in pairs]
+
+
+def redact_url(url: str) -> str:
+    parts = urlsplit(url)
+    return urlunsplit(parts._replace(query=urlencode(redact_params(parse_qsl(parts.query, keep_blank_values=True)))))
+
+
+def body_text(body) -> str:
+    if body is None:
+        return ""
+    return body.decode() if isinstance(body, bytes) else str(body)
+
+
+def redact_json(value):
+    if isinstance(value, dict):
+        return {x: REDACTED if x.lower() in SECRET_PARAMS else redact_json(y) for x, y in value.items()}
+    if isinstance(value, list):
+        return [redact_json(x) for x in value]
+    return value
+
+
+def redact_body(body: str) -> str:
+    if not body:
+        return body
+    if body[:1] in "[{":
+        try:
+            return json.dumps(redact_json(json.loads(body)))
+        except ValueError:
+            return body
+    return urlencode(redact_params(parse_qsl(body, keep_blank_values=True)))
+
+
+def normalize(value):
+    if isinstance(value, dict):
+        return {x: normalize(y) for x, y in sorted(value.items()) if x.lower() not in UNMATCHED_PARAMS}
+    if isinstance(value, list):
+        return [normalize(x) for x in value]
+    return value
+
+
+def match_key(method: str, url: str, body: str) -> str:
+    """Method, path and the non-volatile, non-secret query and body parameters. The host
+    is left out so a replay doesn't depend on which equivalent API host was picked."""
+    parts = urlsplit(url)
+    query = sorted((x, y) for x, y in parse_qsl(parts.query, keep_blank_values=True) if x.lower() not in UNMATCHED_PARAMS)
+    if body[:1] in "[{":
+        try:
+            payload = normalize(json.loads(body))
+        except ValueError:
+            payload = body
+    else:
+        payload = sorted((x, y) for x, y in parse_qsl(body, keep_blank_values=True) if x.lower() not in UNMATCHED_PARAMS)
+    return json.dumps([method.upper(), parts.path, query, payload], sort_keys=True)
+
+
+def load(path: str) -> typing.List[dict]:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as f:
+        return [json.loads(x) for x in f if x.strip()]
+
+
+def save(path: str, entries: typing.List[dict]):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt") as f:
+        for x in entries:
+            f.write(json.dumps(x, separators=(",", ":")) + "\n")
+
+
+class Recorder:
+    """Captures every request/response pair while active and writes the cassette on exit.
+    Api keys, signatures and passphrases are redacted before anything is stored."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.entries = []
+        self.lock = threading.Lock()
+        self.original = None
+
+    def send(self, adapter, request, **kwargs):
+        started = time.perf_counter()
+        response = self.original(adapter, request, **kwargs)
+        elapsed = time.perf_counter() - started
+        body = body_text(request.body)
+        entry = {
+            "key": match_key(request.method, request.url, body),
+            "method": request.method,
+            "url": redact_url(request.url),
+            "headers": {x: REDACTED if x.lower() in SECRET_HEADERS else y for x, y in request.headers.items()},
+            "body": redact_body(body),
+            "status": response.status_code,
+            "response_headers": {x: y for x, y in response.headers.items() if x.lower() in RESPONSE_HEADERS},
+            "response": response.text,
+            "elapsed": round(elapsed, 6),
+        }
+        with self.lock:
+            self.entries.append(entry)
+        return response
+
+    def __enter__(self):
+        self.original = HTTPAdapter.send
+        recorder = self
+
+        def send(adapter, request, **kwargs):
+            return recorder.send(adapter, request, **kwargs)
+        HTTPAdapter.send = send
+        return self
+
+    def __exit__(self, *args):
+        HTTPAdapter.send = self.original
+        save(self.path, self.entries)
+
+
+class Replayer:
+    """Serves recorded responses instead of going to the network.
+
+    A request gets the next unused recording with the same method, path and parameters,
+    then the next unused one for the same method and path, and finally the last response
+    that matched exactly, so polling loops keep working. With `strict`, a request that
+    matches nothing raises `CassetteMiss`. `realtime` replays the recorded latency.
+    """
+
+    def __init__(self, path: str, realtime=False, strict=True) -> None:
+        self.entries = load(path)
+        self.realtime = realtime
+        self.strict = strict
+        self.by_key = collections.defaultdict(collections.deque)
+        self.by_path = collections.defaultdict(collections.deque)
+        self.last = {}
+        self.used = set()
+        self.lock = threading.Lock()
+        self.original = None
+        for index, x in enumerate(self.entries):
+            self.by_key[x["key"]].append(index)
+            self.by_path[self.path_key(x["method"], x["url"])].append(index)
+
+    @staticmethod
+    def path_key(method: str, url: str) -> typing.Tuple[str, str]:
+        return method.upper(), urlsplit(url).path
+
+    def next_unused(self, queue: collections.deque) -> typing.Optional[int]:
+        while queue:
+            index = queue.popleft()
+            if index not in self.used:
+                return index
+        return None
+
+    def find(self, request) -> typing.Optional[dict]:
+        key = match_key(request.method, request.url, body_text(request.body))
+        with self.lock:
+            index = self.next_unused(self.by_key[key])
+            if index is None:
+                index = self.next_unused(self.by_path[self.path_key(request.method, request.url)])
+            if index is None:
+                index = self.last.get(key)
+            if index is None:
+                return None
+            self.used.add(index)
+            self.last[key] = index
+            return self.entries[index]
+
+    def send(self, adapter, request, **kwargs):
+        entry = self.find(request)
+        if entry is None:
+            if self.strict:
+                raise CassetteMiss(f"no recording for {request.method} {redact_url(request.url)}", request=request)
+            return self.original(adapter, request, **kwargs)
+        if self.realtime:
+            time.sleep(entry["elapsed"])
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response._content = entry["response"].encode()
+        response.headers = CaseInsensitiveDict(entry["response_headers"])
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.elapsed = datetime.timedelta(seconds=entry["elapsed"])
+        return response
+
+    def __enter__(self):
+        self.original = HTTPAdapter.send
+        replayer = self
+
+        def send(adapter, request, **kwargs):
+            return replayer.send(adapter, request, **kwargs)
+        HTTPAdapter.send = send
+        return self
+
+    def __exit__(self, *args):
+        HTTPAdapter.send = self.original
@@ -0,0 +1,454 @@
+import asyncio
+import operator
+import typing
+
+import ccxt.async_support as ccxt
+
+from . import instruments, types, utils
+from .base import BaseExchange, logger
+
+# ccxt `defaultType` of the account each of our account types lives in
+ACCOUNT_NAMES = {'funding': 'spot', 'spot': 'spot', 'margin': 'margin', 'futures': 'future'}
+# derivative market types, in lookup order, for venues whose derivatives are split across clients
+DERIVATIVE_TYPES = {'binance': ('future', 'delivery'), 'okex': ('swap', 'futures')}
+
+# markets are the same for every account on a venue, so all instances share a single copy
+MARKETS = utils.TTLCache(24 * 60 * 60)
+
+
+def market_product_type(market: dict) -> str:
+    if market.get('type') == 'spot' or market.get('spot'):
+        return instruments.SPOT
+    if market.get('inverse'):
+        return instruments.INVERSE
+    return instruments.LINEAR
+
+
+def build_instrument(market: dict) -> instruments.Instrument:
+    product_type = market_product_type(market)
+    settle = market.get('settle') or (market['base'] if product_type == instruments.INVERSE else market['quote'])
+    return instruments.Instrument(
+        market['id'], product_type, market['base'], market['quote'],
+        settle if product_type != instruments.SPOT else None, market.get('contractSize'), market.get('expiry'), market
+    )
+
+
+def build_instruments(markets: typing.List[dict]) -> typing.List[instruments.Instrument]:
+    return [build_instrument(x) for x in markets]
+
+
+def balance_entries(balance: dict) -> typing.List[typing.Tuple[str, dict]]:
+    """Per asset entries of a unified balance, without its summary keys."""
+    return [(x, y) for x, y in balance.items() if isinstance(y, dict) and x not in ('info', 'free', 'used', 'total', 'debt')]
+
+
+class CcxtAssetBalance(types.AssetBalance):
+    def __init__(self, x: dict) -> None:
+        self.free = float(x.get('free') or 0)
+        self.borrowed = float(x.get('debt') or 0)
+        self.total = float(x.get('total') or 0)
+
+
+class CcxtMarginAccount(types.MarginAccount):
+    def __init__(self, symbol: str, market: dict, balance: dict) -> None:
+        self.symbol = symbol
+        self.base_asset = market['base']
+        self.quote_asset = market['quote']
+        self.base_asset_balance = CcxtAssetBalance(balance.get(self.base_asset) or {})
+        self.quote_asset_balance = CcxtAssetBalance(balance.get(self.quote_asset) or {})
+        self.liquidation_price = 0.0
+        self.margin_ratio = 0.0
+        self.balance = {self.quote_asset: self.quote_asset_balance, self.base_asset: self.base_asset_balance}
+
+
+class CcxtCrossMarginAccount(types.MarginAccount):
+    """The whole cross margin wallet as one account; it isn't tied to a pair, so the
+    pair balances are left empty."""
+
+    def __init__(self, balance: dict) -> None:
+        self.symbol = 'cross'
+        self.base_asset = self.quote_asset = None
+        self.base_asset_balance = self.quote_asset_balance = CcxtAssetBalance({})
+        self.liquidation_price = 0.0
+        self.margin_ratio = 0.0
+        self.balance = {x: CcxtAssetBalance(y) for x, y in balance_entries(balance) if y.get('total')}
+
+
+class CcxtLoanInfo(types.LoanInfo):
+    def __init__(self, asset: str, x: dict) -> None:
+        self.asset = asset
+        self.rate = float(x.get('rate') or 0)
+        self.available = float(x.get('amount') or 0)
+
+
+class CcxtBalanceType(types.BalanceType):
+    def __init__(self, asset: str, x: dict) -> None:
+        self.asset = asset
+        self.balance = float(x.get('total') or 0)
+        self.available = float(x.get('free') or 0)
+        self.locked = float(x.get('used') or 0)
+
+
+def build_balance(entry: typing.Tuple[str, dict]) -> CcxtBalanceType:
+    return CcxtBalanceType(*entry)
+
+
+def balance_amount(entry: typing.Tuple[str, dict]) -> float:
+    return float(entry[1].get('total') or 0)
+
+
+class CcxtFuturePosition(types.FuturePosition):
+    """Unified position structure, with the raw Binance fields as a fallback for ccxt
+    versions that return them unparsed."""
+
+    def __init__(self, x: dict, future_type: str) -> None:
+        info = x.get('info') or x
+        size = x.get('contracts')
+        if size is None:
+            size = info.get('positionAmt', 0)
+        self.symbol = info.get('symbol') or x.get('symbol')
+        self.future_type = future_type
+        self.size = abs(float(size))
+        self.entry = float(x.get('entryPrice') or info.get('entryPrice') or 0)
+        self.pnl = float(x.get('unrealizedPnl') or info.get('unRealizedProfit') or 0)
+        self.liquidation_price = float(x.get('liquidationPrice') or info.get('liquidationPrice') or 0)
+        self.leverage = float(x.get('leverage') or info.get('leverage') or 0)
+        self.margin_type = x.get('marginType') or x.get('marginMode') or info.get('marginType')
+        self.mark_price = float(x.get('markPrice') or info.get('markPrice') or 0)
+        side = x.get('side') or info.get('positionSide', '').lower()
+        if side not in ('long', 'short'):
+            side = 'long' if float(size) >= 0 else 'short'
+        self.kind = side
+
+
+class CcxtExchange(BaseExchange):
+    """`BaseExchange` over the ccxt async clients, for venues without a dedicated backend.
+
+    Calls are awaited natively instead of going through the thread pool scheduler; ccxt's own
+    rate limiter paces them. One client is kept per ccxt `defaultType` and markets are loaded
+    once per venue and type for every instance in the process.
+    """
+    account_aliases = {'spot': 'funding'}
+    transfer_routes = frozenset([
+        ('funding', 'margin'), ('margin', 'funding'), ('funding', 'futures'),
+    ])
+
+    def __init__(self, exchange_id='binance', password: str = None, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.exchange_id = exchange_id
+        self.config = {'apiKey': self.api_key, 'secret': self.api_secret, 'enableRateLimit': True}
+        if password:
+            self.config['password'] = password
+        self.options = kwargs.get('options', {})
+        self.derivative_types = kwargs.get('derivative_types') or DERIVATIVE_TYPES.get(exchange_id, ('future',))
+        self.clients = {}
+
+    def ccxt_client(self, market_type='spot'):
+        if market_type not in self.clients:
+            options = {**self.options, 'defaultType': market_type}
+            self.clients[market_type] = getattr(ccxt, self.exchange_id)({**self.config, 'options': options})
+        return self.clients[market_type]
+
+    async def get_client(self, market_type='spot'):
+        client = self.ccxt_client(market_type)
+        if not client.markets:
+            async def fetch():
+                await client.load_markets()
+                return client.markets, client.currencies
+            markets, currencies = await MARKETS.fetch((self.exchange_id, market_type), fetch)
+            if not client.markets:
+                client.set_markets(markets, currencies)
+        return client
+
+    async def client_helper(self, function_name, *args, market_type='spot'):
+        client = await self.get_client(market_type)
+        return await getattr(client, function_name)(*args)
+
+    async def client_call(self, callback, priority=None, market_type='spot'):
+        client = await self.get_client(market_type)
+        return await callback(client)
+
+    async def unified(self, market_type: str, capability: str, function_name: str, *args):
+        """Call a unified method the installed ccxt version may not have for this venue."""
+        client = await self.get_client(market_type)
+        if not client.has.get(capability) or not hasattr(client, function_name):
+            raise ccxt.NotSupported(f"{self.exchange_id} {market_type} has no {capability} in ccxt {ccxt.__version__}")
+        return await getattr(client, function_name)(*args)
+
+    async def close(self):
+        await asyncio.gather(*[x.close() for x in self.clients.values()])
+        self.clients = {}
+
+    def find_market(self, client, symbol: str) -> typing.Optional[dict]:
+        """Market for a unified symbol (`BTC/USDT`) or a venue id (`BTCUSDT`, `BTC-USDT`)."""
+        if symbol in client.markets:
+            return client.markets[symbol]
+        market = client.markets_by_id.get(symbol) or client.markets_by_id.get(symbol.upper())
+        # newer ccxt versions map an id to every market sharing it
+        return market[0] if isinstance(market, list) else market
+
+    async def market(self, symbol: str, derivative=False) -> typing.Tuple[str, dict]:
+        for market_type in (self.derivative_types if derivative else ('margin',)):
+            market = self.find_market(await self.get_client(market_type), symbol)
+            if market:
+                return market_type, market
+        raise ccxt.BadSymbol(f"{self.exchange_id} has no {'derivative' if derivative else 'spot'} market {symbol}")
+
+    def parse_instrument(self, symbol: str, derivative=False) -> instruments.Instrument:
+        if '-' in symbol:
+            return instruments.parse_okex(symbol, derivative)
+        return instruments.parse_binance(symbol, derivative)
+
+    async def load_instruments(self):
+        clients = await asyncio.gather(*[self.get_client(x) for x in ('spot',) + tuple(self.derivative_types)])
+        markets = [y for x in clients for y in x.markets.values()]
+        self.instruments.load(await self.parse_helper(build_instruments, markets))
+
+    # Orders
+    def order_params(self, client_order_id: str, kwargs: dict) -> dict:
+        params = {'clientOrderId': client_order_id}
+        params.update(kwargs.get('params') or {})
+        return params
+
+    async def find_order(self, market_type: str, symbol: str, client_order_id: str):
+        client = await self.get_client(market_type)
+        method = client.fetch_orders if client.has.get('fetchOrders') else client.fetch_open_orders
+        orders = await method(symbol)
+        return next((x for x in orders if x.get('clientOrderId') == client_order_id), None)
+
+    async def build_order(self, symbol: str, side: str, quantity: float = None, price: float = None, notional: float = None,
+                          derivative=False, **kwargs) -> dict:
+        market_type, market = await self.market(symbol, derivative)
+        is_market = kwargs.get('is_market') or kwargs.get('force_market')
+        limit = self.limit_price(symbol, side, quantity, price, derivative)
+        if quantity is None and notional:
+            quantity = notional / limit
+        price = None if is_market else limit
+        client = await self.get_client(market_type)
+        order = {
+            'market_type': market_type,
+            'symbol': market['symbol'],
+            'type': 'market' if is_market else 'limit',
+            'side': side.lower(),
+            'amount': float(client.amount_to_precision(market['symbol'], quantity)),
+            'price': None if is_market else float(client.price_to_precision(market['symbol'], price)),
+            'params': self.order_params(self.client_order_id(symbol, side, quantity, price), kwargs),
+        }
+        if kwargs.get('reduce_only'):
+            order['params']['reduceOnly'] = True
+        return order
+
+    async def send_order(self, order: dict):
+        client = await self.get_client(order['market_type'])
+        return await self.submit_order(
+            lambda: client.create_order(order['symbol'], order['type'], order['side'], order['amount'], order['price'], order['params']),
+            lambda: self.find_order(order['market_type'], order['symbol'], order['params']['clientOrderId']),
+        )
+
+    async def create_single_order(self, symbol: str, side: str, quantity: float = None, price: float = None, notional: float = None, **kwargs):
+        order = await self.build_order(symbol, side, quantity, price, notional, **kwargs)
+        if kwargs.get('raw'):
+            return order
+        return await self.send_order(order)
+
+    async def bulk_create_orders(self, symbol: str, orders: typing.List[typing.Any]):
+        built = await asyncio.gather(*[self.build_order(symbol, **x) for x in orders])
+        return await asyncio.gather(*[self.send_order(x) for x in built])
+
+    async def cancel_order(self, symbol: str, order_id, derivative=False):
+        market_type, market = await self.market(symbol, derivative)
+        client = await self.get_client(market_type)
+        return await client.cancel_order(order_id, market['symbol'])
+
+    async def cancel_orders(self, symbol: str, order_ids: typing.List[typing.Any], derivative=False):
+        market_type, market = await self.market(symbol, derivative)
+        client = await self.get_client(market_type)
+        if client.has.get('cancelOrders'):
+            return await client.cancel_orders(order_ids, market['symbol'])
+        return await asyncio.gather(*[client.cancel_order(x, market['symbol']) for x in order_ids])
+
+    async def cancel_all(self, symbol: str, derivative=False):
+        market_type, market = await self.market(symbol, derivative)
+        client = await self.get_client(market_type)
+        if client.has.get('cancelAllOrders'):
+            return await client.cancel_all_orders(market['symbol'])
+        orders = await client.fetch_open_orders(market['symbol'])
+        return await asyncio.gather(*[client.cancel_order(x['id'], market['symbol']) for x in orders])
+
+    async def fetch_orders_of(self, function_name: str, symbol: str, derivative=False):
+        market_type, market = await self.market(symbol, derivative)
+        client = await self.get_client(market_type)
+        return await getattr(client, function_name)(market['symbol'])
+
+    async def cancel_single_order(self, symbol: str, order_id):
+        return await self.cancel_order(symbol, order_id)
+
+    async def bulk_cancel_orders(self, symbol: str, order_ids: typing.List[typing.Any]):
+        return await self.cancel_orders(symbol, order_ids)
+
+    async def cancel_open_orders(self, symbol: str):
+        return await self.cancel_all(symbol)
+
+    async def get_open_orders(self, symbol: str):
+        return await self.fetch_orders_of('fetch_open_orders', symbol)
+
+    async def get_closed_orders(self, symbol: str):
+        return await self.fetch_orders_of('fetch_closed_orders', symbol)
+
+    async def spot_market_order(self, symbol: str, amount: float, side: str):
+        return await self.create_single_order(symbol, side, amount, is_market=True)
+
+    def filled_amount(self, order, asset: str) -> typing.Optional[float]:
+        if not order or order.get('filled') is None:
+            return None
+        base = order['symbol'].split('/')[0]
+        return float(order['filled'] if asset.upper() == base else order.get('cost') or 0)
+
+    # Balances and margin
+    async def fetch_balance(self, account_type: str) -> dict:
+        market_type = ACCOUNT_NAMES[account_type]
+        client = await self.get_client(market_type)
+        return await client.fetch_balance({'type': market_type})
+
+    def parse_balances(self, balance: dict, asset: str = None, **filters):
+        if asset:
+            return CcxtBalanceType(asset.upper(), balance.get(asset.upper()) or {})
+        entries = balance_entries(balance)
+        return types.BalanceList.filtered(entries, build_balance, operator.itemgetter(0), balance_amount, **filters)
+
+    async def get_funding_account_balance(self, asset=None, **filters):
+        return self.parse_balances(await self.fetch_balance('funding'), asset, **filters)
+
+    async def get_spot_account_balance(self, asset: str = None, **filters):
+        return self.parse_balances(await self.fetch_balance('spot'), asset, **filters)
+
+    async def get_margin_accounts(self, symbol=None) -> typing.List[types.MarginAccount]:
+        """The cross margin wallet as a single account, or its view for one pair when
+        `symbol` is given. Unified balances carry no per-pair risk figures, so
+        `liquidation_price` and `margin_ratio` are left at 0."""
+        balance = await self.fetch_balance('margin')
+        if symbol:
+            _, market = await self.market(symbol)
+            return CcxtMarginAccount(symbol, market, balance)
+        return [CcxtCrossMarginAccount(balance)]
+
+    async def kill_targets(self, symbols: typing.List[str] = None, close_positions=False):
+        if symbols:
+            return await super().kill_targets(symbols, close_positions)
+        # any pair made of held assets can have open orders against the cross wallet
+        (client, balance), positions = await asyncio.gather(
+            asyncio.gather(self.get_client('margin'), self.fetch_balance('margin')), self.get_futures_position()
+        )
+        held = {x for x, y in balance_entries(balance) if y.get('total')}
+        margin = {x['id'] for x in client.markets.values() if x['base'] in held and x['quote'] in held}
+        positions = [x for x in positions if x.size]
+        return margin, {x.symbol for x in positions}, positions
+
+    async def get_margin_account_balance(self, asset: str = None, symbol: str = None):
+        return self.parse_balances(await self.fetch_balance('margin'), asset)
+
+    async def get_loanable_amount(self, symbol: str) -> typing.List[types.LoanInfo]:
+        _, market = await self.market(symbol)
+        rates = await asyncio.gather(*[
+            self.loan_cache.fetch(('borrow_rate', x), lambda x=x: self.unified('margin', 'fetchBorrowRate', 'fetch_borrow_rate', x))
+            for x in (market['base'], market['quote'])
+        ])
+        return [CcxtLoanInfo(x, y) for x, y in zip((market['base'], market['quote']), rates)]
+
+    async def borrow_loan(self, asset: str, symbol: str, amount: float) -> bool:
+        _, market = await self.market(symbol)
+        await self.unified('margin', 'borrowMargin', 'borrow_margin', asset.upper(), amount, market['symbol'])
+        return True
+
+    async def repay_loan(self, asset: str, symbol: str, amount: float) -> bool:
+        _, market = await self.market(symbol)
+        await self.unified('margin', 'repayMargin', 'repay_margin', asset.upper(), amount, market['symbol'])
+        return True
+
+    # Transfers
+    async def transfer(self, asset: str, amount: float, source: str, target: str):
+        return await self.unified(
+            'spot', 'transfer', 'transfer', asset.upper(), amount, ACCOUNT_NAMES[source], ACCOUNT_NAMES[target]
+        )
+
+    async def transfer_from_spot_to_margin(self, asset: str, amount: float, symbol: str):
+        return await self.transfer(asset, amount, 'spot', 'margin')
+
+    async def transfer_from_margin_to_spot(self, asset: str, amount: float, symbol: str):
+        return await self.transfer(asset, amount, 'margin', 'spot')
+
+    async def transfer_from_spot_to_future(self, asset: str, amount: float, symbol: str):
+        return await self.transfer(asset, amount, 'spot', 'futures')
+
+    async def transfer_funds_to_future_account(self, asset: str, amount: float, symbol: str):
+        return await self.transfer_from_spot_to_future(asset, amount, symbol)
+
+    # Futures
+    async def get_futures_account_balance(self, symbol: str = None):
+        market_type, market = await self.market(symbol, True)
+        client = await self.get_client(market_type)
+        balance = await client.fetch_balance({'type': market_type})
+        settle = market.get('settle') or (market['base'] if market.get('inverse') else market['quote'])
+        return self.parse_balances(balance, settle)
+
+    async def get_futures_account_balances(self, assets: typing.Set[str] = None) -> typing.List[typing.Tuple[str, str, types.BalanceType]]:
+        clients = await asyncio.gather(*[self.get_client(x) for x in self.derivative_types])
+        balances = await asyncio.gather(*[x.fetch_balance({'type': y}) for x, y in zip(clients, self.derivative_types)])
+        return [(x.asset, y, x) for y, balance in zip(self.derivative_types, balances) for x in self.parse_balances(balance)]
+
+    async def get_futures_position(self, symbol: str = None) -> typing.List[types.FuturePosition]:
+        async def fetch(market_type):
+            try:
+                positions = await self.unified(market_type, 'fetchPositions', 'fetch_positions')
+            except ccxt.NotSupported as e:
+                logger.info(str(e))
+                return []
+            future_type = 'coin' if market_type in ('delivery', 'futures') else 'usdt'
+            return [CcxtFuturePosition(x, future_type) for x in positions]
+        results = await asyncio.gather(*[fetch(x) for x in self.derivative_types])
+        positions = [y for x in results for y in x]
+        if symbol:
+            return [x for x in positions if x.symbol.lower() == symbol.lower()]
+        return positions
+
+    async def get_future_contracts(self):
+        clients = await asyncio.gather(*[self.get_client(x) for x in self.derivative_types])
+        return [x for client in clients for x in client.markets.values() if market_product_type(x) != instruments.SPOT]
+
+    async def fetch_leverage_settings(self, symbols: typing.List[str] = None) -> typing.Dict[str, float]:
+        positions = await self.get_futures_position()
+        wanted = set(x.upper() for x in symbols) if symbols else None
+        return {x.symbol: x.leverage for x in positions if x.leverage and (not wanted or x.symbol.upper() in wanted)}
+
+    async def get_futures_leverage(self, symbol: str):
+        return await self.cached_futures_leverage(symbol)
+
+    async def set_futures_leverage(self, symbol: str, value: float, force=False):
+        if self.leverage_unchanged(symbol, value, force):
+            return None
+        market_type, market = await self.market(symbol, True)
+        result = await self.unified(market_type, 'setLeverage', 'set_leverage', value, market['symbol'])
+        self.store_leverage(symbol, value)
+        return result
+
+    async def create_future_order(self, symbol: str, side: str, quantity: float = None, price: float = None, notional: float = None, **kwargs):
+        order = await self.build_order(symbol, side, quantity, price, notional, derivative=True, **kwargs)
+        if kwargs.get('raw'):
+            return order
+        return await self.send_order(order)
+
+    async def bulk_create_future_orders(self, symbol: str, orders: typing.List[typing.Any]):
+        built = await asyncio.gather(*[self.build_order(symbol, derivative=True, **x) for x in orders])
+        return await asyncio.gather(*[self.send_order(x) for x in built])
+
+    async def cancel_future_order(self, symbol: str, order_id):
+        return await self.cancel_order(symbol, order_id, True)
+
+    async def bulk_cancel_future_orders(self, symbol: str, order_ids: typing.List[typing.Any]):
+        return await self.cancel_orders(symbol, order_ids, True)
+
+    async def cancel_future_open_orders(self, symbol: str):
+        return await self.cancel_all(symbol, True)
+
+    async def get_future_open_orders(self, symbol: str):
+        return await self.fetch_orders_of('fetch_open_orders', symbol, True)
@@ -0,0 +1,144 @@
+import datetime
+import json
+import os
+import shutil
+import typing
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+DTYPES = {"int64": np.int64, "float64": np.float64, "bool": np.bool_, "timestamp": np.int64}
+CONVERTERS = {
+    # ids go straight to int, 18 digit ids don't survive a float
+    "int64": lambda x: int(x) if x not in (None, "") else 0,
+    "float64": lambda x: float(x or 0),
+    "bool": bool,
+    "str": lambda x: "" if x is None else str(x),
+    "timestamp": lambda x: to_milliseconds(x),
+}
+
+
+def to_milliseconds(value) -> int:
+    if not value:
+        return 0
+    if isinstance(value, str) and not value.isdigit():
+        parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return int(parsed.timestamp() * 1000)
+    return int(value)
+
+
+class ColumnStore:
+    """Append-only typed columnar store for order and trade history.
+
+    Every append becomes a new part: an uncompressed Arrow IPC (Feather v2) file when
+    pyarrow is installed, otherwise a directory of `.npy` columns. Both are read back
+    memory-mapped. `schema` is a list of `(column, dtype, source_key)` and the first
+    column is the monotonically increasing record id used to skip records that were
+    already exported.
+    """
+
+    max_parts = 32
+
+    def __init__(self, path: str, schema: typing.List[typing.Tuple[str, str, str]], backend: str = None) -> None:
+        self.path = path
+        self.schema = schema
+        self.meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {"backend": backend or ("arrow" if pa else "numpy"), "parts": [], "next": 0, "last": None}
+        if self.meta["backend"] == "arrow" and pa is None:
+            raise ImportError("pyarrow is required to read this history store")
+
+    def save_meta(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.meta_path + ".tmp", "w") as f:
+            json.dump(self.meta, f)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+
+    def next_part(self) -> str:
+        self.meta["next"] += 1
+        return f"part-{self.meta['next'] - 1:05d}"
+
+    def columns(self, records: typing.List[dict]) -> typing.Dict[str, np.ndarray]:
+        result = {}
+        for column, dtype, key in self.schema:
+            values = [CONVERTERS[dtype](x.get(key)) for x in records]
+            result[column] = np.array(values, dtype=DTYPES.get(dtype, str))
+        return result
+
+    def append(self, records: typing.List[dict]) -> int:
+        key_column, key_type, key = self.schema[0]
+        last = self.meta["last"]
+        records = sorted(records, key=lambda x: CONVERTERS[key_type](x.get(key)))
+        if last is not None:
+            records = [x for x in records if CONVERTERS[key_type](x.get(key)) > last]
+        if not records:
+            return 0
+        columns = self.columns(records)
+        name = self.next_part()
+        os.makedirs(self.path, exist_ok=True)
+        if self.meta["backend"] == "arrow":
+            name += ".arrow"
+            table = pa.table({x: pa.array(y) for x, y in columns.items()})
+            with pa.OSFile(os.path.join(self.path, name), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        else:
+            os.makedirs(os.path.join(self.path, name))
+            for column, values in columns.items():
+                np.save(os.path.join(self.path, name, column + ".npy"), values)
+        self.meta["parts"].append(name)
+        self.meta["last"] = columns[key_column][-1].item()
+        self.save_meta()
+        if len(self.meta["parts"]) > self.max_parts:
+            self.compact()
+        return len(records)
+
+    def read_part(self, name: str):
+        if self.meta["backend"] == "arrow":
+            return pa.ipc.open_file(pa.memory_map(os.path.join(self.path, name), "r")).read_all()
+        return {
+            x[0]: np.load(os.path.join(self.path, name, x[0] + ".npy"), mmap_mode="r")
+            for x in self.schema
+        }
+
+    def read(self):
+        """A `pyarrow.Table` (zero-copy over the mapped parts) or a dict of memory-mapped arrays."""
+        parts = [self.read_part(x) for x in self.meta["parts"]]
+        if self.meta["backend"] == "arrow":
+            return pa.concat_tables(parts) if parts else pa.table({x[0]: pa.array([]) for x in self.schema})
+        if len(parts) == 1:
+            return parts[0]
+        return {
+            x[0]: np.concatenate([y[x[0]] for y in parts]) if parts else np.array([], dtype=DTYPES.get(x[1], str))
+            for x in self.schema
+        }
+
+    def compact(self):
+        """Merge all parts into one so reads stay a single mapping."""
+        data = self.read()
+        old = self.meta["parts"]
+        name = self.next_part()
+        if self.meta["backend"] == "arrow":
+            name += ".arrow"
+            with pa.OSFile(os.path.join(self.path, name), "wb") as sink:
+                with pa.ipc.new_file(sink, data.schema) as writer:
+                    writer.write_table(data.combine_chunks())
+        else:
+            os.makedirs(os.path.join(self.path, name))
+            for column, values in data.items():
+                np.save(os.path.join(self.path, name, column + ".npy"), np.asarray(values))
+        self.meta["parts"] = [name]
+        self.save_meta()
+        for x in old:
+            target = os.path.join(self.path, x)
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            else:
+                os.remove(target)
@@ -0,0 +1,107 @@
+import functools
+import typing
+
+SPOT = "spot"
+MARGIN = "margin"
+LINEAR = "linear"
+INVERSE = "inverse"
+
+QUOTE_ASSETS = sorted(
+    ["USDT", "BUSD", "USDC", "TUSD", "USDP", "USD", "BTC", "ETH", "BNB", "EUR", "GBP", "TRY", "DAI", "PAX"],
+    key=len, reverse=True,
+)
+
+
+class Instrument:
+    def __init__(self, native: str, product_type: str, base: str, quote: str, settle: str = None,
+                 contract_size: float = None, expiry: str = None, info: dict = None) -> None:
+        self.native = native
+        self.product_type = product_type
+        self.base = base.upper()
+        self.quote = quote.upper()
+        self.settle = settle.upper() if settle else None
+        self.contract_size = float(contract_size) if contract_size else None
+        self.expiry = expiry
+        self.info = info
+        self.is_derivative = product_type in (LINEAR, INVERSE)
+        self.is_inverse = product_type == INVERSE
+        self.symbol = f"{self.base}/{self.quote}"
+        if self.is_derivative:
+            self.symbol += f":{self.settle}"
+        if expiry:
+            self.symbol += f"-{expiry}"
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.symbol} {self.native} {self.product_type}>"
+
+
+def split_pair(pair: str) -> typing.Tuple[str, str]:
+    pair = pair.upper()
+    for quote in QUOTE_ASSETS:
+        if pair.endswith(quote) and len(pair) > len(quote):
+            return pair[: -len(quote)], quote
+    return pair, ""
+
+
+@functools.lru_cache(maxsize=None)
+def parse_binance(native: str, derivative=False) -> Instrument:
+    """Fallback for symbols missing from the exchange metadata: `BTCUSDT`,
+    `BTCUSD_PERP`, `BTCUSD_210625`, `BTCUSDT_210625`."""
+    pair, _, suffix = native.upper().partition("_")
+    base, quote = split_pair(pair)
+    expiry = suffix if suffix and suffix != "PERP" else None
+    if not derivative and not suffix:
+        return Instrument(native.upper(), SPOT, base, quote)
+    if quote == "USD":
+        return Instrument(native.upper(), INVERSE, base, quote, base, 100 if base == "BTC" else 10, expiry)
+    return Instrument(native.upper(), LINEAR, base, quote, quote, 1, expiry)
+
+
+@functools.lru_cache(maxsize=None)
+def parse_okex(native: str, derivative=False) -> Instrument:
+    """Fallback for OKEx instrument ids: `BTC-USDT`, `BTC-USD-SWAP`, `BTC-USDT-SWAP`, `BTC-USD-210625`."""
+    parts = native.upper().split("-")
+    base, quote = parts[0], parts[1]
+    if len(parts) == 2:
+        return Instrument(native.upper(), MARGIN, base, quote)
+    expiry = parts[2] if parts[2] != "SWAP" else None
+    if quote == "USD":
+        return Instrument(native.upper(), INVERSE, base, quote, base, None, expiry)
+    return Instrument(native.upper(), LINEAR, base, quote, quote, None, expiry)
+
+
+class InstrumentRegistry:
+    """Canonical symbol <-> venue id mapping. Both directions are plain dict lookups;
+    ids that aren't in the loaded metadata are parsed once and memoized."""
+
+    def __init__(self, parser: typing.Callable[[str, bool], Instrument]) -> None:
+        self.parser = parser
+        self.by_native = {}
+        self.by_symbol = {}
+        self.loaded = False
+
+    def add(self, instrument: Instrument):
+        self.by_native[(instrument.native.upper(), instrument.is_derivative)] = instrument
+        self.by_symbol[instrument.symbol] = instrument
+
+    def load(self, instruments: typing.Iterable[Instrument]):
+        for x in instruments:
+            self.add(x)
+        self.loaded = True
+
+    def get(self, native: str, derivative=False) -> Instrument:
+        key = (native.upper(), derivative)
+        instrument = self.by_native.get(key)
+        if instrument is None:
+            instrument = self.parser(native, derivative)
+            self.by_native[key] = instrument
+        return instrument
+
+    def lookup(self, symbol: str) -> Instrument:
+        return self.by_symbol[symbol]
+
+    def native(self, symbol: str) -> str:
+        return self.by_symbol[symbol].native
+
+    def __len__(self) -> int:
+        return len(self.by_symbol)
@@ -0,0 +1,500 @@
+"""Local stand-in for the Binance and OKEx REST endpoints used by this package, and a
+load-test runner that drives the real exchange classes against it.
+
+    python -m u_exchanges.loadtest binance --concurrency 32 --duration 10 --latency 0.02
+"""
+import argparse
+import asyncio
+import collections
+import importlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import typing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .scheduler import TokenBucket
+
+BASES = ["BTC", "ETH", "LTC", "XRP", "ADA", "DOT", "LINK", "BNB"]
+OKEX_CONSTS = ["okex.consts", "okcoin.consts", "okex.v5.consts"]
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def binance_symbol(base: str, quote="USDT", kind="spot") -> dict:
+    symbol = f"{base}{quote}" + ("_PERP" if kind == "coin" else "")
+    result = {
+        "symbol": symbol, "baseAsset": base, "quoteAsset": quote, "isMarginTradingAllowed": True,
+        "filters": [
+            {"filterType": "PRICE_FILTER", "tickSize": "0.01"},
+            {"filterType": "LOT_SIZE", "stepSize": "0.001", "minQty": "0.001"},
+            {"filterType": "MIN_NOTIONAL", "minNotional": "10"},
+        ],
+    }
+    if kind != "spot":
+        result.update({"marginAsset": base if kind == "coin" else quote, "contractType": "PERPETUAL", "contractSize": 100 if kind == "coin" else 1})
+    return result
+
+
+def okex_v3_instrument(base: str, swap=False, quote="USDT") -> dict:
+    result = {
+        "instrument_id": f"{base}-{quote}" + ("-SWAP" if swap else ""), "base_currency": base, "quote_currency": quote,
+        "tick_size": "0.01", "size_increment": "1" if swap else "0.001", "min_size": "1" if swap else "0.001",
+    }
+    if swap:
+        result.update({"settlement_currency": quote, "contract_val": "0.01", "is_inverse": "false", "underlying": f"{base}-{quote}"})
+    return result
+
+
+def okex_v5_instrument(base: str, inst_type="MARGIN", quote="USDT") -> dict:
+    inst_id = f"{base}-{quote}" + ("-SWAP" if inst_type == "SWAP" else "")
+    return {
+        "instId": inst_id, "instType": inst_type, "baseCcy": base if inst_type == "MARGIN" else "",
+        "quoteCcy": quote if inst_type == "MARGIN" else "", "settleCcy": quote, "uly": f"{base}-{quote}",
+        "ctVal": "0.01" if inst_type != "MARGIN" else "", "ctType": "linear", "tickSz": "0.01", "lotSz": "1" if inst_type != "MARGIN" else "0.001",
+        "minSz": "1" if inst_type != "MARGIN" else "0.001",
+    }
+
+
+class MockExchangeServer:
+    """Threaded HTTP server answering the Binance margin/futures and OKEx v3/v5 REST subset.
+
+    Every request is delayed by `latency` (plus up to `jitter`) seconds, fails with the
+    venue's internal-error response with probability `error_rate` and gets the venue's
+    rate-limit response once more than `rate_limit` requests per second arrive.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit: float = None) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.bucket = TokenBucket(rate_limit) if rate_limit else None
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.orders = {}
+        self.stats = collections.defaultdict(lambda: {"count": 0, "errors": 0, "limited": 0, "time": 0.0})
+        self.routes = self.build_routes()
+        self.server = ThreadingHTTPServer((host, port), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockExchangeServer":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def handle_request(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                status, payload = mock.dispatch(self.command, self.path, body, self.headers.get("Content-Type") or "")
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_DELETE = do_PUT = handle_request
+
+        return Handler
+
+    def venue(self, path: str) -> str:
+        if path.startswith("/api/v5/"):
+            return "okex5"
+        if re.match(r"/api/\w+/v3/", path):
+            return "okex3"
+        return "binance"
+
+    def failure(self, venue: str, limited: bool):
+        if venue == "binance":
+            return (429, {"code": -1003, "msg": "Too many requests."}) if limited else (503, {"code": -1001, "msg": "Internal error."})
+        if venue == "okex5":
+            return (429, {"code": "50011", "msg": "Requests too frequent.", "data": []}) if limited else (503, {"code": "50001", "msg": "Service temporarily unavailable", "data": []})
+        return (429, {"error_code": "30014", "error_message": "request too frequent"}) if limited else (503, {"error_code": "30030", "error_message": "endpoint request failed"})
+
+    def dispatch(self, method: str, path: str, body: bytes, content_type: str):
+        started = time.perf_counter()
+        url = urlparse(path)
+        params = {x: y[-1] for x, y in parse_qs(url.query).items()}
+        if body:
+            if "json" in content_type or body[:1] in (b"{", b"["):
+                params["body"] = json.loads(body)
+            else:
+                params.update({x: y[-1] for x, y in parse_qs(body.decode()).items()})
+        venue = self.venue(url.path)
+        delay = self.latency + random.random() * self.jitter
+        if delay:
+            time.sleep(delay)
+        with self.lock:
+            limited = bool(self.bucket and self.bucket.wait_time() > 0)
+            if self.bucket and not limited:
+                self.bucket.take()
+        key = f"{method} {url.path}"
+        if limited or random.random() < self.error_rate:
+            status, payload = self.failure(venue, limited)
+            with self.lock:
+                self.stats[key]["limited" if limited else "errors"] += 1
+        else:
+            status, payload = self.route(method, url.path, params)
+        with self.lock:
+            stats = self.stats[key]
+            stats["count"] += 1
+            stats["time"] += time.perf_counter() - started - delay
+        return status, payload
+
+    def route(self, method: str, path: str, params: dict):
+        for route_method, pattern, handler in self.routes:
+            if route_method == method:
+                match = re.fullmatch(pattern, path)
+                if match:
+                    return handler(params, *match.groups())
+        return 404, {"code": -1, "msg": f"no mock for {method} {path}"}
+
+    def new_order(self, **kwargs) -> dict:
+        order_id = next(self.ids)
+        order = {"id": order_id, **kwargs}
+        with self.lock:
+            self.orders[order_id] = order
+            if kwargs.get("client_id"):
+                self.orders[kwargs["client_id"]] = order
+        return order
+
+    def find_order(self, key) -> typing.Optional[dict]:
+        if key is None:
+            return None
+        return self.orders.get(int(key) if str(key).isdigit() else key)
+
+    # Binance
+
+    def binance_order(self, params: dict) -> dict:
+        order = self.new_order(client_id=params.get("newClientOrderId"), symbol=params.get("symbol"))
+        return {
+            "symbol": params.get("symbol"), "orderId": order["id"], "clientOrderId": params.get("newClientOrderId") or str(order["id"]),
+            "price": params.get("price", "0"), "origQty": params.get("quantity", "0"), "executedQty": "0", "status": "NEW",
+            "side": params.get("side"), "type": params.get("type"), "positionSide": params.get("positionSide", "BOTH"),
+            "transactTime": now_ms(), "updateTime": now_ms(), "fills": [],
+        }
+
+    def binance_lookup(self, params: dict):
+        order = self.find_order(params.get("origClientOrderId") or params.get("orderId"))
+        if not order:
+            return 400, {"code": -2013, "msg": "Order does not exist."}
+        return 200, {"symbol": order["symbol"], "orderId": order["id"], "clientOrderId": order.get("client_id"), "status": "NEW", "executedQty": "0"}
+
+    def binance_batch(self, params: dict):
+        try:
+            batch = json.loads(params.get("batchOrders") or "[]")
+        except (TypeError, ValueError):
+            batch = [params]
+        return 200, [self.binance_order(x) for x in batch]
+
+    def binance_exchange_info(self, kind):
+        quote = "USD" if kind == "coin" else "USDT"
+        return lambda params: (200, {"serverTime": now_ms(), "symbols": [binance_symbol(x, quote, kind) for x in BASES]})
+
+    # OKEx v3
+
+    def okex3_order(self, params: dict) -> dict:
+        body = params.get("body") or {}
+        order = self.new_order(client_id=body.get("client_oid"), symbol=body.get("instrument_id"))
+        return {"order_id": str(order["id"]), "client_oid": body.get("client_oid", ""), "result": True, "error_code": "0", "error_message": ""}
+
+    def okex3_batch(self, params: dict):
+        result = {}
+        for x in params.get("body") or []:
+            result[x["instrument_id"].lower()] = [
+                {**self.okex3_order({"body": {**y, "instrument_id": x["instrument_id"]}}), "instrument_id": x["instrument_id"]}
+                for y in x.get("order_data", [])
+            ]
+        return 200, result
+
+    def okex3_cancel_batch(self, params: dict):
+        return 200, {
+            x["instrument_id"].lower(): [{"order_id": str(y), "result": True, "error_code": "0"} for y in x.get("order_ids", [])]
+            for x in params.get("body") or []
+        }
+
+    def okex3_lookup(self, params: dict, key: str, instrument_id: str = None):
+        order = self.find_order(key)
+        if not order:
+            return 400, {"error_code": "33014", "error_message": "Order does not exist"}
+        return 200, {"order_id": str(order["id"]), "client_oid": order.get("client_id") or "", "instrument_id": order["symbol"], "state": "0", "filled_size": "0"}
+
+    def okex3_swap_batch(self, params: dict, instrument_id: str = None):
+        body = params.get("body") or {}
+        instrument_id = instrument_id or body.get("instrument_id")
+        return 200, {
+            "result": "true",
+            "order_info": [{**self.okex3_order({"body": {**x, "instrument_id": instrument_id}}), "error_code": "0"} for x in body.get("order_data", [])],
+        }
+
+    def okex3_swap_cancel_batch(self, params: dict, instrument_id: str):
+        ids = (params.get("body") or {}).get("ids", [])
+        return 200, {"result": "true", "instrument_id": instrument_id, "ids": ids, "client_oids": []}
+
+    # OKEx v5
+
+    def okex5_result(self, orders: typing.List[dict]):
+        return 200, {"code": "0", "msg": "", "data": orders}
+
+    def okex5_order(self, x: dict) -> dict:
+        order = self.new_order(client_id=x.get("clOrdId"), symbol=x.get("instId"))
+        return {"ordId": str(order["id"]), "clOrdId": x.get("clOrdId", ""), "sCode": "0", "sMsg": ""}
+
+    def okex5_body(self, params: dict) -> typing.List[dict]:
+        body = params.get("body") or {}
+        return body if isinstance(body, list) else [body]
+
+    def okex5_lookup(self, params: dict):
+        order = self.find_order(params.get("clOrdId") or params.get("ordId"))
+        if not order:
+            return 200, {"code": "51603", "msg": "Order does not exist", "data": []}
+        return self.okex5_result([{"ordId": str(order["id"]), "clOrdId": order.get("client_id") or "", "instId": order["symbol"], "state": "live", "accFillSz": "0"}])
+
+    def build_routes(self):
+        def ok(payload):
+            return lambda params, *args: (200, payload)
+
+        def binance_time(params):
+            return 200, {"serverTime": now_ms()}
+
+        routes = [
+            ("GET", r"/(?:api/v3|fapi/v1|dapi/v1)/ping", ok({})),
+            ("GET", r"/(?:api/v3|fapi/v1|dapi/v1)/time", binance_time),
+            ("GET", r"/api/v3/exchangeInfo", self.binance_exchange_info("spot")),
+            ("GET", r"/fapi/v1/exchangeInfo", self.binance_exchange_info("usdt")),
+            ("GET", r"/dapi/v1/exchangeInfo", self.binance_exchange_info("coin")),
+            ("GET", r"/api/v3/ticker/price", lambda params: (200, [{"symbol": f"{x}USDT", "price": "100.00"} for x in BASES])),
+            ("POST", r"/sapi/v1/margin/order", lambda params: (200, self.binance_order(params))),
+            ("GET", r"/sapi/v1/margin/order", self.binance_lookup),
+            ("DELETE", r"/sapi/v1/margin/order", lambda params: (200, {"symbol": params.get("symbol"), "orderId": params.get("orderId"), "status": "CANCELED"})),
+            ("GET", r"/sapi/v1/margin/openOrders", ok([])),
+            ("DELETE", r"/sapi/v1/margin/openOrders", ok([])),
+            ("POST", r"/(?:fapi|dapi)/v1/order", lambda params: (200, self.binance_order(params))),
+            ("GET", r"/(?:fapi|dapi)/v1/order", self.binance_lookup),
+            ("DELETE", r"/(?:fapi|dapi)/v1/order", lambda params: (200, {"symbol": params.get("symbol"), "orderId": params.get("orderId"), "status": "CANCELED"})),
+            ("POST", r"/(?:fapi|dapi)/v1/batchOrders", self.binance_batch),
+            ("DELETE", r"/(?:fapi|dapi)/v1/batchOrders", ok([])),
+            ("GET", r"/(?:fapi|dapi)/v1/openOrders", ok([])),
+            ("DELETE", r"/(?:fapi|dapi)/v1/allOpenOrders", ok({"code": 200, "msg": "The operation of cancel all open order is done."})),
+            ("GET", r"/api/general/v3/time", lambda params: (200, {"iso": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()), "epoch": f"{time.time():.3f}"})),
+            ("GET", r"/api/spot/v3/instruments", lambda params: (200, [okex_v3_instrument(x) for x in BASES])),
+            ("GET", r"/api/swap/v3/instruments", lambda params: (200, [okex_v3_instrument(x, True) for x in BASES])),
+            ("POST", r"/api/margin/v3/orders", lambda params: (200, self.okex3_order(params))),
+            ("POST", r"/api/margin/v3/batch_orders", self.okex3_batch),
+            ("POST", r"/api/margin/v3/cancel_batch_orders", self.okex3_cancel_batch),
+            ("POST", r"/api/margin/v3/cancel_orders/([^/]+)", lambda params, key: (200, {"order_id": key, "result": True, "error_code": "0"})),
+            ("GET", r"/api/margin/v3/orders/([^/]+)", self.okex3_lookup),
+            ("GET", r"/api/margin/v3/orders_pending", ok([])),
+            ("POST", r"/api/swap/v3/order", lambda params: (200, self.okex3_order(params))),
+            ("POST", r"/api/swap/v3/orders", self.okex3_swap_batch),
+            ("POST", r"/api/swap/v3/cancel_order/([^/]+)/([^/]+)", lambda params, instrument_id, key: (200, {"order_id": key, "result": "true", "error_code": "0"})),
+            ("POST", r"/api/swap/v3/cancel_batch_orders/([^/]+)", self.okex3_swap_cancel_batch),
+            ("GET", r"/api/swap/v3/orders/([^/]+)/([^/]+)", lambda params, instrument_id, key: self.okex3_lookup(params, key, instrument_id)),
+            ("GET", r"/api/swap/v3/orders/([^/]+)", ok({"order_info": []})),
+            ("GET", r"/api/v5/public/time", lambda params: self.okex5_result([{"ts": str(now_ms())}])),
+            ("GET", r"/api/v5/public/instruments", lambda params: self.okex5_result([okex_v5_instrument(x, params.get("instType", "MARGIN")) for x in BASES])),
+            ("POST", r"/api/v5/trade/(?:order|batch-orders)", lambda params: self.okex5_result([self.okex5_order(x) for x in self.okex5_body(params)])),
+            ("POST", r"/api/v5/trade/(?:cancel-order|cancel-batch-orders|amend-order|amend-batch-orders)",
+             lambda params: self.okex5_result([{"ordId": x.get("ordId", ""), "clOrdId": x.get("clOrdId", ""), "sCode": "0", "sMsg": ""} for x in self.okex5_body(params)])),
+            ("GET", r"/api/v5/trade/order", self.okex5_lookup),
+            ("GET", r"/api/v5/trade/orders-(?:pending|history)", lambda params: self.okex5_result([])),
+        ]
+        return routes
+
+    def report(self) -> str:
+        lines = [f"{'endpoint':48} {'count':>8} {'errors':>7} {'limited':>8} {'server ms':>10}"]
+        for key, x in sorted(self.stats.items()):
+            lines.append(f"{key:48} {x['count']:>8} {x['errors']:>7} {x['limited']:>8} {1000 * x['time'] / max(x['count'], 1):>10.3f}")
+        return "\n".join(lines)
+
+
+def percentile(samples: typing.List[float], q: float) -> float:
+    if not samples:
+        return float("nan")
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def summarize(samples: typing.List[float]) -> dict:
+    return {"p50": percentile(samples, 0.5), "p99": percentile(samples, 0.99), "p999": percentile(samples, 0.999)}
+
+
+class LoadTest:
+    """Runs one coroutine factory per method from `concurrency` workers for `duration`
+    seconds and records latency per call. The exchange's scheduler is wrapped to split
+    each SDK call into time spent queued for a worker thread and time spent in the thread
+    (SDK, signing, HTTP and decoding), which together with the server's own handling time
+    shows where the bottleneck is."""
+
+    def __init__(self, exchange, concurrency=16, duration=10.0) -> None:
+        self.exchange = exchange
+        self.concurrency = concurrency
+        self.duration = duration
+        self.queued = []
+        self.calls = []
+        self.instrument_scheduler()
+
+    def instrument_scheduler(self):
+        scheduler = self.exchange.scheduler
+        run = scheduler.run
+
+        def timed(priority, callback):
+            submitted = time.perf_counter()
+
+            def call():
+                started = time.perf_counter()
+                self.queued.append(started - submitted)
+                try:
+                    return callback()
+                finally:
+                    self.calls.append(time.perf_counter() - started)
+            return run(priority, call)
+        scheduler.run = timed
+
+    async def run(self, name: str, factory: typing.Callable[[], typing.Awaitable[typing.Any]]) -> dict:
+        latencies, errors = [], collections.Counter()
+        self.queued, self.calls = [], []
+        deadline = time.perf_counter() + self.duration
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    await factory()
+                    latencies.append(time.perf_counter() - started)
+                except Exception as e:
+                    errors[e.__class__.__name__] += 1
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(self.concurrency)])
+        elapsed = time.perf_counter() - started
+        return {
+            "method": name, "calls": len(latencies), "errors": dict(errors), "throughput": len(latencies) / elapsed,
+            "latency": summarize(latencies), "queued": summarize(self.queued), "sdk": summarize(self.calls),
+        }
+
+    @staticmethod
+    def report(results: typing.List[dict]) -> str:
+        lines = [f"{'method':28} {'calls/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'p999 ms':>8} {'queue p99':>10} {'sdk p99':>9}  errors"]
+        for x in results:
+            lines.append(
+                f"{x['method']:28} {x['throughput']:>9.1f} {1000 * x['latency']['p50']:>8.2f} {1000 * x['latency']['p99']:>8.2f} "
+                f"{1000 * x['latency']['p999']:>8.2f} {1000 * x['queued']['p99']:>10.2f} {1000 * x['sdk']['p99']:>9.2f}  {x['errors'] or ''}"
+            )
+        return "\n".join(lines)
+
+
+def point_okex_at(url: str):
+    """The OKEx SDKs read their base url from a module constant at request time."""
+    for name in OKEX_CONSTS:
+        try:
+            module = importlib.import_module(name)
+        except ImportError:
+            continue
+        module.API_URL = url
+
+
+def create_exchange(name: str, url: str, **kwargs):
+    credentials = {"api_key": "key", "api_secret": "secret", "passphrase": "passphrase", **kwargs}
+    if name == "binance":
+        from .binance_exchange import BINANCE_HOSTS, BinanceExchange
+        credentials.pop("passphrase")
+        return BinanceExchange(hosts={x: [url] for x in BINANCE_HOSTS}, **credentials)
+    point_okex_at(url)
+    if name == "okcoin":
+        from .okcoin_exchange import OKCoinExchange
+        return OKCoinExchange(**credentials)
+    if name == "okex":
+        from .okcoin_exchange import OkexExchange
+        return OkexExchange(**credentials)
+    from .okex_exchange import OkexV5Exchange
+    return OkexV5Exchange(**credentials)
+
+
+def scenarios(name: str, batch=5) -> typing.Dict[str, typing.Callable]:
+    symbol, future_symbol = {
+        "binance": ("BTCUSDT", "BTCUSDT"),
+        "okcoin": ("BTC-USDT", None),
+        "okex": ("BTC-USDT", "BTC-USDT-SWAP"),
+        "okex5": ("BTC-USDT", "BTC-USDT-SWAP"),
+    }[name]
+    counter = itertools.count()
+
+    def orders(**kwargs):
+        n = next(counter)
+        return [{"side": "buy", "quantity": 1, "price": 100 + (n * batch + i) % 1000 * 0.01, **kwargs} for i in range(batch)]
+
+    result = {
+        "bulk_create_orders": lambda exchange: exchange.bulk_create_orders(symbol, orders()),
+        "bulk_create_future_orders": lambda exchange: exchange.bulk_create_future_orders(future_symbol, orders(kind="long")),
+        "bulk_cancel_orders": lambda exchange: exchange.bulk_cancel_orders(symbol, [next(counter) for _ in range(batch)]),
+    }
+    # OKCoin has no futures
+    if future_symbol is None:
+        del result["bulk_create_future_orders"]
+    return result
+
+
+async def run_load_test(name: str, url: str, methods: typing.List[str] = None, concurrency=16, duration=10.0, batch=5) -> typing.List[dict]:
+    exchange = create_exchange(name, url)
+    await exchange.load_instruments()
+    test = LoadTest(exchange, concurrency, duration)
+    results = []
+    for method, factory in scenarios(name, batch).items():
+        if methods and method not in methods:
+            continue
+        results.append(await test.run(method, lambda: factory(exchange)))
+    return results
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("exchange", choices=["binance", "okcoin", "okex", "okex5"])
+    parser.add_argument("--methods", nargs="*")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--batch", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float)
+    options = parser.parse_args(args)
+    with MockExchangeServer(latency=options.latency, jitter=options.jitter, error_rate=options.error_rate, rate_limit=options.rate_limit) as server:
+        results = asyncio.run(run_load_test(options.exchange, server.url, options.methods, options.concurrency, options.duration, options.batch))
+        print(LoadTest.report(results))
+        print()
+        print(server.report())
+
+
+if __name__ == "__main__":
+    main()
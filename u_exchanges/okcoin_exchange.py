@@ -1,14 +1,19 @@
 import asyncio
+import operator
 import typing
 
 from okcoin import account_api as account
+from okcoin import consts as okcoin_consts
+from okcoin import utils as okcoin_utils
 from okcoin import lever_api as lever
 from okcoin import spot_api as spot
 from okex import (account_api, futures_api, index_api, information_api,
                   lever_api, option_api, spot_api, swap_api, system_api)
+from okex import consts as okex_consts
+from okex import utils as okex_utils
 
-from . import types, utils
-from .base import BaseExchange
+from . import instruments, orderbook, scheduler, signing, timesync, types, utils
+from .base import BaseExchange, active_margin_symbols
 
 
 class OkCoinClient:
@@ -111,7 +116,7 @@ class OkexFutureBalanceType(types.BalanceType):
 class OkexFuturePosition(types.FuturePosition):
     def __init__(self, x) -> None:
         self.symbol = x['instrument_id']
-        coin_type = len(self.symbol.lower().split("_usd_")) > 1
+        coin_type = instruments.parse_okex(self.symbol).is_inverse
         self.future_type = 'coin' if coin_type else 'usdt'
         self.size = float(x['avail_position'])
         self.entry = float(x['avg_cost'])
@@ -122,19 +127,51 @@ class OkexFuturePosition(types.FuturePosition):
         self.kind = x['side']
         self.mark_price = float(x['last'])
 
-class OkexV5Exchange(BaseException):
-    def __init__(self, **kwargs) -> None:
-        self.passphrase = kwargs.get("passphrase", None)
-        super().__init__(**kwargs)
 
-    @property
-    def client(self):
-        pass
+def okex_balance_amount(x) -> float:
+    return float(x['balance'])
+
+
+def build_balances(balances, **filters) -> types.BalanceList:
+    return types.BalanceList.filtered(balances, OkexBalanceType, operator.itemgetter('currency'), okex_balance_amount, **filters)
+
+
+def build_margin_accounts(accounts):
+    return [OkexMarginAccount(**x) for x in accounts]
+
 
 class OKCoinExchange(BaseExchange):
+    transfer_routes = frozenset([
+        ('funding', 'margin'), ('margin', 'funding'), ('funding', 'spot'),
+        ('spot', 'margin'), ('margin', 'spot'),
+    ])
+    history_schema = [
+        ('id', 'int64', 'order_id'), ('client_id', 'str', 'client_oid'), ('symbol', 'str', 'instrument_id'),
+        ('side', 'str', 'side'), ('type', 'str', 'type'), ('price', 'float64', 'price'), ('size', 'float64', 'size'),
+        ('filled_size', 'float64', 'filled_size'), ('filled_notional', 'float64', 'filled_notional'),
+        ('price_avg', 'float64', 'price_avg'), ('state', 'str', 'state'), ('time', 'timestamp', 'timestamp'),
+    ]
+
+    consts = okcoin_consts
+    sdk_utils = okcoin_utils
+
     def __init__(self, **kwargs) -> None:
         self.passphrase = kwargs.get("passphrase", None)
         super().__init__(**kwargs)
+        self.clock = timesync.shared_clock(
+            self.consts.__name__, lambda: timesync.okex_v3_time(self.consts.API_URL + '/api/general/v3/time')
+        )
+        timesync.patch_sdk_timestamp(self.sdk_utils, self.clock)
+        self.order_sender = None
+        if kwargs.get("fast_orders", True):
+            self.order_sender = signing.OkexOrderSender(
+                self.api_key, self.api_secret, self.passphrase, lambda: self.consts.API_URL, clock=self.clock
+            )
+
+    async def send_order(self, path: str, order: dict, callback):
+        if self.order_sender:
+            return await self.scheduler.run(scheduler.ORDER, lambda: self.order_sender.post(path, order))
+        return await self.client_call(callback, scheduler.ORDER)
 
     @property
     def client(self) -> OkCoinClient:
@@ -142,9 +179,23 @@ class OKCoinExchange(BaseExchange):
             api_key=self.api_key, api_secret=self.api_secret, passphrase=self.passphrase
         )
 
+    def parse_instrument(self, symbol: str, derivative=False) -> instruments.Instrument:
+        return instruments.parse_okex(symbol, derivative)
+
+    def create_order_book(self, symbol: str, derivative=False, depth: int = None) -> orderbook.OrderBook:
+        return orderbook.OkexOrderBook(symbol.upper(), depth)
+
+    async def load_instruments(self):
+        result = await self.client_call(lambda client: client.spot_api.get_coin_info(), scheduler.METADATA)
+        self.instruments.load([
+            instruments.Instrument(x['instrument_id'], instruments.MARGIN, x['base_currency'], x['quote_currency'], info=x)
+            for x in result
+        ])
+
     async def update_price_and_decimal_places(self, symbol: str, raw=False):
         if not raw:
-            exchange_info = self.client.spot_api.get_coin_info()
+            instrument = self.instrument(symbol)
+            exchange_info = [instrument.info] if instrument.info else self.client.spot_api.get_coin_info()
             result = process_places(exchange_info, symbol)
             if result:
                 self.price_places = result["price_places"]
@@ -159,8 +210,8 @@ class OKCoinExchange(BaseExchange):
             _account = self.client.margin_api.get_specific_account(symbol)
             return OkexMarginAccount(**{**_account, 'instrument_id': symbol})
         else:
-            account = self.client.margin_api.get_account_info()
-            return [OkexMarginAccount(**x) for x in account]
+            account = await self.client_call(lambda client: client.margin_api.get_account_info())
+            return await self.parse_helper(build_margin_accounts, account)
 
     async def get_loanable_amount(self, symbol: str) -> typing.List[types.LoanInfo]:
         result = self.client.margin_api.get_specific_config_info(symbol)
@@ -169,18 +220,36 @@ class OKCoinExchange(BaseExchange):
             return [OkexLoanInfo(x['base'], x['base_data']), OkexLoanInfo(x['quote'], x['quote_data'])]
         return []
 
+    async def get_loanable_amounts(self, symbols: typing.List[str]) -> typing.Dict[str, typing.List[types.LoanInfo]]:
+        # a single availability request covers every pair
+        result = await self.loan_cache.fetch('config_info', lambda: self.client_call(lambda client: client.margin_api.get_config_info()))
+        configs = {x['instrument_id'].upper(): x for x in result}
+        loans = {}
+        for symbol in symbols:
+            config = configs.get(symbol.upper())
+            if config:
+                currencies = {k: v for k, v in config.items() if k.startswith('currency:')}
+                x = get_base_and_quote_info(currencies)
+                loans[symbol] = [OkexLoanInfo(x['base'], x['base_data']), OkexLoanInfo(x['quote'], x['quote_data'])]
+            else:
+                loans[symbol] = []
+        return loans
+
     async def borrow_loan(self, asset: str, symbol: str, amount: float) -> bool:
         result = self.client.margin_api.borrow_coin(symbol, "", asset, amount)
-        return result['result']
+        return bool(result.get('result'))
 
     async def repay_loan(self, asset: str, symbol: str, amount: float) -> bool:
         result = self.client.margin_api.repayment_coin(symbol, asset, amount)
-        return result['result']
+        return bool(result.get('result'))
 
     async def create_single_order(self, symbol: str, side: str, quantity: float, price: float, notional: float = None, raw=False, **kwargs):
+        price = self.limit_price(symbol, side, quantity, price)
+        client_id = kwargs.get("client_id") or self.client_order_id(symbol, side, quantity, price, notional)
         await self.update_price_and_decimal_places(symbol, raw=raw)
         v = {
             'instrument_id': symbol,
+            'client_oid': client_id,
             'price': float(self.price_places % price),
             'size': float(self.decimal_places % quantity) if quantity else '',
             'margin_trading': '2',
@@ -195,19 +264,37 @@ class OKCoinExchange(BaseExchange):
                 v['notional'] = notional
         if raw:
             return v
-        result = self.client.margin_api.take_order(**v)
-        if result['result']:
-            return result['order_id']
+        result = await self.submit_order(
+            lambda: self.send_order('/api/margin/v3/orders', v, lambda client: client.margin_api.take_order(**v)),
+            lambda: self.get_order_by_client_id(symbol, client_id)
+        )
+        # an order found by client id after an ambiguous failure has no 'result' key
+        if result.get('result', True):
+            return result.get('order_id')
+
+    async def get_order_by_client_id(self, symbol: str, client_id: str):
+        return await self.client_call(lambda client: client.margin_api.get_order_info(symbol, client_oid=client_id))
 
     async def bulk_create_orders(self, symbol: str, orders: typing.List[typing.Any]):
+        """One list per batch of 10 orders, holding each order's result (`order_id`,
+        `client_oid`, `result`, `error_code`) instead of the SDK response keyed by
+        instrument. Orders found by client id after an ambiguous failure are their order info."""
         await self.update_price_and_decimal_places(symbol)
         _orders = await asyncio.gather(*[self.create_single_order(**{'raw': True, 'symbol': symbol, **x}) for x in orders])
         batches = [x for x in utils.chunks(_orders, 10)]
-        result = await asyncio.gather(*[self.client_helper('bulk_take_orders', x) for x in batches])
+
+        async def take_orders(batch):
+            result = await self.client_helper('bulk_take_orders', batch)
+            # the per-instrument lists, without top level flags such as "result"
+            return [x for y in result.values() if isinstance(y, list) for x in y]
+        result = await asyncio.gather(*[
+            self.submit_orders(x, take_orders, lambda order: self.get_order_by_client_id(symbol, order['client_oid']))
+            for x in batches
+        ])
         return result
 
     async def cancel_single_order(self, symbol: str, order_id):
-        self.client.margin_api.revoke_order(symbol, order_id=order_id)
+        await self.client_call(lambda client: client.margin_api.revoke_order(symbol, order_id=order_id), scheduler.CANCEL)
 
     async def bulk_cancel_orders(self, symbol: str, order_ids: typing.List[typing.Any]):
         batches = [x for x in utils.chunks(order_ids, 10)]
@@ -215,9 +302,14 @@ class OKCoinExchange(BaseExchange):
         return result
 
     async def cancel_open_orders(self, symbol: str):
-        orders = await self.get_open_orders(symbol)
-        orders = [x['order_id'] for x in orders]
-        await self.bulk_cancel_orders(symbol, orders)
+        # cancel each page of open orders while the next one is being fetched
+        cancels = []
+        cursor = {}
+        while cursor is not None:
+            orders, cursor = await self.client_call(lambda client: client.margin_api.get_order_pending(symbol, **cursor), scheduler.CANCEL)
+            cancels.append(asyncio.ensure_future(self.bulk_cancel_orders(symbol, [x['order_id'] for x in orders])))
+            cursor = cursor or None
+        await asyncio.gather(*cancels)
 
     async def get_open_orders(self, symbol: str):
         result, cursor = self.client.margin_api.get_order_pending(symbol)
@@ -247,19 +339,19 @@ class OKCoinExchange(BaseExchange):
             _amount = account.balance[asset.upper()].free
         return self.client.account_api.coin_transfer(asset, _amount, '5', '6', instrument_id=symbol)
 
-    async def get_funding_account_balance(self, asset: str = None):
+    async def get_funding_account_balance(self, asset: str = None, **filters):
         if asset:
             result = self.client.account_api.get_currency(asset)
             return OkexBalanceType(result[0])
-        result = self.client.account_api.get_wallet()
-        return [OkexBalanceType(x) for x in result]
+        result = await self.client_call(lambda client: client.account_api.get_wallet())
+        return build_balances(result, **filters)
 
-    async def get_spot_account_balance(self, asset: str = None):
+    async def get_spot_account_balance(self, asset: str = None, **filters):
         if asset:
             result = self.client.spot_api.get_coin_account_info(asset)
             return OkexBalanceType(result)
-        result = self.client.spot_api.get_account_info()
-        return [OkexBalanceType(x) for x in result]
+        result = await self.client_call(lambda client: client.spot_api.get_account_info())
+        return build_balances(result, **filters)
 
     async def transfer_funds_to_spot_account(self, asset: str, amount: float, symbol: str):
         return self.client.account_api.coin_transfer(asset, amount, '6', '1', instrument_id=symbol)
@@ -271,7 +363,7 @@ class OKCoinExchange(BaseExchange):
         return self.client.account_api.coin_transfer(asset, amount, '5', '1', instrument_id=symbol)
 
     async def spot_market_order(self, symbol: str, amount: float, side: str):
-        self.client.spot_api.take_order(symbol, side, type='market', size=amount, notional=amount)
+        return self.client.spot_api.take_order(symbol, side, type='market', size=amount, notional=amount)
 
     async def get_margin_account_balance(self, symbol: str):
         result = await self.get_margin_accounts(symbol)
@@ -296,10 +388,34 @@ def process_places(exchange_info, symbol: str):
 
 
 class OkexExchange(OKCoinExchange):
+    consts = okex_consts
+    sdk_utils = okex_utils
+    transfer_routes = OKCoinExchange.transfer_routes | frozenset([
+        ('spot', 'futures'), ('funding', 'futures'), ('margin', 'futures'),
+        ('futures', 'margin'), ('futures', 'funding'),
+    ])
+
     @property
     def client(self) -> OkexClient:
         return OkexClient(api_key=self.api_key, api_secret=self.api_secret, passphrase=self.passphrase)
 
+    async def load_instruments(self):
+        spot, swap = await asyncio.gather(
+            self.client_call(lambda client: client.spot_api.get_coin_info(), scheduler.METADATA),
+            self.client_call(lambda client: client.swap_api.get_instruments(), scheduler.METADATA),
+        )
+        self.instruments.load(
+            [
+                instruments.Instrument(x['instrument_id'], instruments.MARGIN, x['base_currency'], x['quote_currency'], info=x)
+                for x in spot
+            ] + [
+                instruments.Instrument(
+                    x['instrument_id'], instruments.INVERSE if x['is_inverse'] == 'true' else instruments.LINEAR,
+                    x['base_currency'], x['quote_currency'], x['settlement_currency'], x['contract_val'], info=x
+                ) for x in swap
+            ]
+        )
+
     async def get_futures_position(self, symbol: str = None) -> OkexFuturePosition:
         # if symbol:
         #     positions = self.client.futures_api.get_specific_position(symbol)
@@ -312,6 +428,18 @@ class OkexExchange(OKCoinExchange):
             positions = [x for y in position for x in y['holding']]
         return [OkexFuturePosition(x) for x in positions]
 
+    async def kill_targets(self, symbols: typing.List[str] = None, close_positions=False):
+        if symbols:
+            return await super().kill_targets(symbols, close_positions)
+        # v3 only lists orders per instrument; swaps holding margin for pending orders have them
+        swap_accounts, accounts, positions = await asyncio.gather(
+            self.client_call(lambda client: client.swap_api.get_accounts(), scheduler.CANCEL),
+            self.get_margin_accounts(),
+            self.open_positions(),
+        )
+        pending = {x['instrument_id'] for x in swap_accounts['info'] if float(x.get('margin_frozen') or 0)}
+        return active_margin_symbols(accounts), pending | {x.symbol for x in positions}, positions
+
     async def get_future_contracts(self):
         accounts = self.client.swap_api.get_accounts()
         return [{'symbol': x['instrument_id'], 'underlying':x['underlying'], 'currency':x['currency']} for x in accounts['info']]
@@ -320,32 +448,64 @@ class OkexExchange(OKCoinExchange):
         result = self.client.swap_api.get_settings(symbol)
         return result
 
-    async def set_futures_leverage(self, symbol: str, value: float):
-        result = self.client.swap_api.set_leverage(symbol, value, '3')
+    async def fetch_leverage_settings(self, symbols: typing.List[str] = None) -> typing.Dict[str, float]:
+        symbols = symbols or [x['symbol'] for x in await self.future_contracts()]
+        results = await asyncio.gather(*[self.client_call(lambda client, x=x: client.swap_api.get_settings(x)) for x in symbols])
+        return {x: y['long_leverage'] for x, y in zip(symbols, results)}
+
+    async def set_futures_leverage(self, symbol: str, value: float, force=False):
+        if self.leverage_unchanged(symbol, value, force):
+            return None
+        result = await self.client_call(lambda client: client.swap_api.set_leverage(symbol, value, '3'), scheduler.ORDER)
+        self.store_leverage(symbol, value)
         return result
 
     async def create_future_order(self, symbol: str, side: str, quantity: float, price: float, raw=False, **kwargs):
+        price = self.limit_price(symbol, side, quantity, price, derivative=True)
+        client_id = kwargs.get("client_id") or self.client_order_id(symbol, side, quantity, price, kwargs['kind'])
         if kwargs['kind'].lower() == 'long':
             type = "1" if side.lower() == 'buy' else '3'
         else:
             type = '2' if side.lower() == 'sell' else '4'
+        # order_type 4 is a market order, the price is then only used as a reference
+        order_type = '4' if kwargs.get('force_market') or kwargs.get('is_market') else '0'
         v = {
             "price": price,
             "size": quantity,
             "type": type,
+            "client_oid": client_id,
         }
+        if order_type != '0':
+            v['order_type'] = order_type
         if raw:
             return v
-        self.client.swap_api.take_order(symbol, type, price, quantity)
+        return await self.submit_order(
+            lambda: self.send_order(
+                '/api/swap/v3/order',
+                {'instrument_id': symbol, 'type': type, 'price': price, 'size': quantity, 'client_oid': client_id, 'order_type': order_type, 'match_price': '0'},
+                lambda client: client.swap_api.take_order(symbol, type, price, quantity, client_oid=client_id, order_type=order_type)
+            ),
+            lambda: self.get_future_order_by_client_id(symbol, client_id)
+        )
+
+    async def get_future_order_by_client_id(self, symbol: str, client_id: str):
+        return await self.client_call(lambda client: client.swap_api.get_order_info(symbol, client_oid=client_id))
 
     async def bulk_create_future_orders(self, symbol: str, orders: typing.List[typing.Any]):
         _orders = await asyncio.gather(*[self.create_future_order(**{'raw': True, 'symbol': symbol, **x}) for x in orders])
         batches = [x for x in utils.chunks(_orders, 10)]
-        result = await asyncio.gather(*[self.client_helper('bulk_future_take_orders', symbol, x) for x in batches])
+
+        async def take_orders(batch):
+            result = await self.client_helper('bulk_future_take_orders', symbol, batch)
+            return result['order_info']
+        result = await asyncio.gather(*[
+            self.submit_orders(x, take_orders, lambda order: self.get_future_order_by_client_id(symbol, order['client_oid']))
+            for x in batches
+        ])
         return result
 
     async def cancel_future_order(self, symbol: str, order_id):
-        self.client.swap_api.revoke_order(symbol, order_id=order_id)
+        await self.client_call(lambda client: client.swap_api.revoke_order(symbol, order_id=order_id), scheduler.CANCEL)
 
     async def bulk_cancel_future_orders(self, symbol: str, order_ids: typing.List[typing.Any]):
         batches = [x for x in utils.chunks(order_ids, 10)]
@@ -353,9 +513,13 @@ class OkexExchange(OKCoinExchange):
         return result
 
     async def cancel_future_open_orders(self, symbol: str):
-        orders = await self.get_future_open_orders(symbol)
-        orders = [x['order_id'] for x in orders]
-        await self.bulk_cancel_future_orders(symbol, orders)
+        cancels = []
+        cursor = {}
+        while cursor is not None:
+            orders, cursor = await self.client_call(lambda client: client.swap_api.get_order_list(symbol, '0', **cursor), scheduler.CANCEL)
+            cancels.append(asyncio.ensure_future(self.bulk_cancel_future_orders(symbol, [x['order_id'] for x in orders['order_info']])))
+            cursor = cursor or None
+        await asyncio.gather(*cancels)
 
     async def get_future_open_orders(self, symbol: str):
         result, cursor = self.client.swap_api.get_order_list(symbol, '0')
@@ -369,6 +533,10 @@ class OkexExchange(OKCoinExchange):
         result = self.client.swap_api.get_coin_account(symbol)
         return OkexFutureBalanceType(result['info'])
 
+    async def get_futures_account_balances(self, assets: typing.Set[str] = None):
+        result = await self.client_call(lambda client: client.swap_api.get_accounts())
+        return [(x['currency'], x['instrument_id'], OkexFutureBalanceType(x)) for x in result['info']]
+
     async def transfer_from_spot_to_future(self, asset: str, amount: float, symbol: str):
         return self.client.account_api.coin_transfer(asset, amount, '1', '9', instrument_id=symbol)
 
@@ -383,3 +551,12 @@ class OkexExchange(OKCoinExchange):
 
     async def transfer_from_future_to_funding(self, asset: str, amount: float):
         return self.client.account_api.coin_transfer(asset, amount, '9', '6')
+
+    async def transfer_between(self, asset: str, amount: float, source: str, target: str, source_symbol: str = None, target_symbol: str = None):
+        if (source, target) == ('margin', 'futures'):
+            return await self.transfer_from_margin_to_future(asset, amount, source_symbol, target_symbol)
+        if (source, target) == ('futures', 'margin'):
+            return await self.transfer_from_future_to_margin(asset, amount, target_symbol, source_symbol)
+        if (source, target) == ('futures', 'funding'):
+            return await self.transfer_from_future_to_funding(asset, amount)
+        return await super().transfer_between(asset, amount, source, target, source_symbol, target_symbol)
@@ -1,7 +1,10 @@
 import asyncio
+import operator
 import typing
 
 from okex.v5 import Account_api as account
+from okex.v5 import consts
+from okex.v5 import utils as sdk_utils
 from okex.v5 import Funding_api as funding
 from okex.v5 import Market_api as market
 from okex.v5 import Public_api as public
@@ -9,8 +12,12 @@ from okex.v5 import Trade_api as trade
 from okex.v5 import subAccount_api as sub_account
 from okex.v5 import status_api as status
 
-from . import types, utils
-from .base import BaseExchange
+from . import instruments, orderbook, scheduler, signing, timesync, types, utils
+from .base import BaseExchange, active_margin_symbols
+
+BATCH_SIZE = 20
+FUNDING_ACCOUNT = "6"
+TRADING_ACCOUNT = "18"
 
 
 class OKEXClient:
@@ -19,10 +26,10 @@ class OKEXClient:
         self.api_secret = api_secret
         self.passphrase = passphrase
         self.is_debug = is_debug
+        flag = '1' if self.is_debug else '0'
         self.account_api = account.AccountAPI(
-            self.api_key, self.api_secret, self.passphrase, False
+            self.api_key, self.api_secret, self.passphrase, False, flag
         )
-        flag = '1' if self.is_debug else '0'
         self.funding_api = funding.FundingAPI(
             self.api_key, self.api_secret, self.passphrase, False, flag
         )
@@ -42,12 +49,109 @@ class OKEXClient:
             self.api_key, self.api_secret, self.passphrase, False, flag
         )
 
+    def bulk_take_orders(self, orders):
+        return self.trading_api.place_multiple_orders(orders)["data"]
+
+    def bulk_revoke_orders(self, orders):
+        return self.trading_api.cancel_multiple_orders(orders)["data"]
+
+    def bulk_amend_orders(self, orders):
+        return self.trading_api.amend_multiple_orders(orders)["data"]
+
+
+def to_float(x) -> float:
+    return float(x or 0)
+
+
+class OkexV5AssetBalance(types.AssetBalance):
+    def __init__(self, asset, positions) -> None:
+        held = [x for x in positions if x["posCcy"] == asset]
+        owed = [x for x in positions if x["liabCcy"] == asset]
+        self.free = sum(to_float(x["availPos"]) for x in held)
+        self.total = sum(to_float(x["pos"]) for x in held)
+        self.borrowed = sum(abs(to_float(x["liab"])) + to_float(x["interest"]) for x in owed)
+
+
+class OkexV5MarginAccount(types.MarginAccount):
+    def __init__(self, symbol, positions) -> None:
+        self.symbol = symbol
+        instrument = instruments.parse_okex(symbol)
+        self.base_asset, self.quote_asset = instrument.base, instrument.quote
+        self.base_asset_balance = OkexV5AssetBalance(self.base_asset, positions)
+        self.quote_asset_balance = OkexV5AssetBalance(self.quote_asset, positions)
+        self.liquidation_price = max([to_float(x["liqPx"]) for x in positions] or [0])
+        self.margin_ratio = max([to_float(x["mgnRatio"]) for x in positions] or [0])
+        self.balance = {self.quote_asset: self.quote_asset_balance, self.base_asset: self.base_asset_balance}
+
+
+class OkexV5LoanInfo(types.LoanInfo):
+    def __init__(self, asset, max_loan_info, interest_info) -> None:
+        self.asset = asset
+        self.rate = to_float(interest_info.get("interestRate"))
+        self.available = to_float(max_loan_info.get("maxLoan"))
+
+
+class OkexV5BalanceType(types.BalanceType):
+    def __init__(self, x) -> None:
+        self.asset = x["ccy"]
+        self.balance = to_float(x.get("cashBal") or x.get("bal"))
+        self.available = to_float(x["availBal"])
+        self.locked = to_float(x["frozenBal"])
+
+
+def empty_balance(asset: str) -> dict:
+    # v5 leaves assets without a balance out of the response
+    return {"ccy": asset.upper(), "cashBal": "0", "availBal": "0", "frozenBal": "0"}
+
+
+def okex_v5_balance_amount(x) -> float:
+    return to_float(x.get("cashBal") or x.get("bal"))
+
+
+def build_balances(balances, **filters) -> types.BalanceList:
+    return types.BalanceList.filtered(balances, OkexV5BalanceType, operator.itemgetter("ccy"), okex_v5_balance_amount, **filters)
+
+
+class OkexV5FuturePosition(types.FuturePosition):
+    def __init__(self, x) -> None:
+        self.symbol = x["instId"]
+        self.future_type = "coin" if instruments.parse_okex(self.symbol).is_inverse else "usdt"
+        self.size = abs(to_float(x["pos"]))
+        self.entry = to_float(x["avgPx"])
+        self.pnl = to_float(x["upl"])
+        self.liquidation_price = to_float(x["liqPx"])
+        self.leverage = to_float(x["lever"])
+        self.margin_type = x["mgnMode"]
+        self.kind = x["posSide"] if x["posSide"] != "net" else ("long" if to_float(x["pos"]) > 0 else "short")
+        self.mark_price = to_float(x["markPx"])
+
 
 class OkexV5Exchange(BaseExchange):
+    transfer_routes = frozenset([
+        ('funding', 'margin'), ('margin', 'funding'), ('funding', 'spot'),
+        ('funding', 'futures'), ('futures', 'funding'),
+    ])
+    account_aliases = {'futures': 'spot'}
+    history_schema = [
+        ("id", "int64", "ordId"), ("client_id", "str", "clOrdId"), ("symbol", "str", "instId"),
+        ("side", "str", "side"), ("type", "str", "ordType"), ("price", "float64", "px"), ("size", "float64", "sz"),
+        ("filled_size", "float64", "accFillSz"), ("price_avg", "float64", "avgPx"), ("fee", "float64", "fee"),
+        ("state", "str", "state"), ("time", "timestamp", "cTime"),
+    ]
+
     def __init__(self, **kwargs) -> None:
         self.passphrase = kwargs.get("passphrase", None)
         self.is_debug = kwargs.get("is_debug", None)
+        self.margin_mode = kwargs.get("margin_mode", "cross")
         super().__init__(**kwargs)
+        self.clock = timesync.shared_clock("okex.v5", lambda: timesync.okex_v5_time(consts.API_URL + "/api/v5/public/time"))
+        timesync.patch_sdk_timestamp(sdk_utils, self.clock)
+        self.order_sender = None
+        if kwargs.get("fast_orders", True):
+            self.order_sender = signing.OkexOrderSender(
+                self.api_key, self.api_secret, self.passphrase, lambda: consts.API_URL,
+                headers={"x-simulated-trading": "1" if self.is_debug else "0"}, clock=self.clock
+            )
 
     @property
     def client(self) -> OKEXClient:
@@ -58,22 +162,407 @@ class OkexV5Exchange(BaseExchange):
             is_debug=self.is_debug,
         )
 
+    def parse_instrument(self, symbol: str, derivative=False) -> instruments.Instrument:
+        return instruments.parse_okex(symbol, derivative)
+
+    def create_order_book(self, symbol: str, derivative=False, depth: int = None) -> orderbook.OrderBook:
+        return orderbook.OkexOrderBook(symbol.upper(), depth)
+
+    def instrument(self, symbol: str, derivative: bool = None) -> instruments.Instrument:
+        # the registry keys derivatives apart; OKEx ids tell which they are (BTC-USDT-SWAP, BTC-USD-210625)
+        if derivative is None:
+            derivative = symbol.count("-") > 1
+        return super().instrument(symbol, derivative)
+
+    def instrument_type(self, symbol: str) -> str:
+        instrument = self.instrument(symbol)
+        if not instrument.is_derivative:
+            return "MARGIN"
+        return "FUTURES" if instrument.expiry else "SWAP"
+
+    async def load_instruments(self):
+        results = await asyncio.gather(*[
+            self.client_call(lambda client, x=x: client.public_api.get_instruments(x), scheduler.METADATA) for x in ["MARGIN", "SWAP", "FUTURES"]
+        ])
+
+        def build(x):
+            if x["instType"] == "MARGIN":
+                return instruments.Instrument(x["instId"], instruments.MARGIN, x["baseCcy"], x["quoteCcy"], info=x)
+            base, quote = x["uly"].split("-")
+            product_type = instruments.INVERSE if x["ctType"] == "inverse" else instruments.LINEAR
+            expiry = None if x["instType"] == "SWAP" else x["instId"].split("-")[-1]
+            return instruments.Instrument(x["instId"], product_type, base, quote, x["settleCcy"], x["ctVal"], expiry, x)
+        self.instruments.load([build(x) for y in results for x in y["data"]])
+
+    async def update_price_and_decimal_places(self, symbol: str, raw=False):
+        if not raw:
+            instrument = self.instrument(symbol)
+            if instrument.info:
+                result = process_places([instrument.info], symbol)
+            else:
+                result = await self.client_call(lambda client: client.public_api.get_instruments(self.instrument_type(symbol), instId=symbol.upper()), scheduler.METADATA)
+                result = process_places(result["data"], symbol)
+            if result:
+                self.price_places = result["price_places"]
+                self.decimal_places = result["places"]
+                self.difference = result["difference"]
+                self.step_size = result["stepSize"]
+                self.minimum = result["minimum"]
+                self.contract_size = result.get("contractSize")
+                self.updated = True
+
+    async def get_margin_accounts(self, symbol: str = None) -> typing.Union[typing.List[types.MarginAccount], types.MarginAccount]:
+        result = await self.client_call(lambda client: client.account_api.get_positions("MARGIN", symbol.upper() if symbol else ""))
+        positions = [x for x in result["data"] if x["mgnMode"] == "isolated"]
+        if symbol:
+            return OkexV5MarginAccount(symbol.upper(), positions)
+        symbols = sorted(set(x["instId"] for x in positions))
+        return [OkexV5MarginAccount(x, [y for y in positions if y["instId"] == x]) for x in symbols]
+
+    async def get_loanable_amount(self, symbol: str) -> typing.List[types.LoanInfo]:
+        result = await self.get_loanable_amounts([symbol])
+        return result[symbol]
+
+    async def get_loanable_amounts(self, symbols: typing.List[str]) -> typing.Dict[str, typing.List[types.LoanInfo]]:
+        def max_loan_helper(symbol):
+            quote = self.instrument(symbol).quote
+            return self.loan_cache.fetch(
+                ("max_loan", symbol.upper()),
+                lambda: self.client_call(lambda client: client.account_api.get_max_load(symbol.upper(), "isolated", quote))
+            )
+        # one request returns the rate of every currency
+        rates, max_loans = await asyncio.gather(
+            self.daily_cache.fetch(
+                "interest_rates",
+                lambda: self.client_call(lambda client: client.account_api.get_interest_rate()),
+                utils.next_utc_midnight()
+            ),
+            asyncio.gather(*[max_loan_helper(x) for x in symbols]),
+        )
+        rates = {x["ccy"]: x for x in rates["data"]}
+        result = {}
+        for symbol, loans in zip(symbols, max_loans):
+            instrument = self.instrument(symbol)
+            loans = {x["ccy"]: x for x in loans["data"]}
+            result[symbol] = [OkexV5LoanInfo(x, loans.get(x, {}), rates.get(x, {})) for x in [instrument.base, instrument.quote]]
+        return result
+
+    async def borrow_loan(self, asset: str, symbol: str, amount: float) -> bool:
+        result = await self.client_call(lambda client: client.account_api.borrow_repay(ccy=asset.upper(), side="borrow", amt=str(amount)), scheduler.ORDER)
+        return result["code"] == "0"
+
+    async def repay_loan(self, asset: str, symbol: str, amount: float) -> bool:
+        result = await self.client_call(lambda client: client.account_api.borrow_repay(ccy=asset.upper(), side="repay", amt=str(amount)), scheduler.ORDER)
+        return result["code"] == "0"
+
+    async def create_single_order(self, symbol: str, side: str, quantity: float, price: float, notional: float = None, raw=False, **kwargs):
+        price = self.limit_price(symbol, side, quantity, price)
+        client_id = kwargs.get("client_id") or self.client_order_id(symbol, side, quantity, price, notional)
+        await self.update_price_and_decimal_places(symbol, raw=raw)
+        v = {
+            "instId": symbol.upper(),
+            "tdMode": "isolated",
+            "side": side.lower(),
+            "ordType": "limit",
+            "px": self.price_places % price if price else "",
+            "sz": self.decimal_places % quantity if quantity else "",
+            "clOrdId": client_id,
+        }
+        if kwargs.get("is_market"):
+            v["ordType"] = "market"
+            del v["px"]
+            if side.lower() == "buy" and notional:
+                v["sz"] = str(notional)
+                v["tgtCcy"] = "quote_ccy"
+        if raw:
+            return v
+        result = await self.place_order(v)
+        return result["ordId"]
+
+    async def send_order(self, order):
+        if self.order_sender:
+            result = await self.scheduler.run(scheduler.ORDER, lambda: self.order_sender.post("/api/v5/trade/order", order))
+            return result["data"][0]
+        return await self.client_call(lambda client: client.trading_api.place_order(**order)["data"][0], scheduler.ORDER)
+
+    async def place_order(self, order):
+        return await self.submit_order(
+            lambda: self.send_order(order),
+            lambda: self.get_order_by_client_id(order["instId"], order["clOrdId"])
+        )
+
+    async def get_order_by_client_id(self, symbol: str, client_id: str):
+        result = await self.client_call(lambda client: client.trading_api.get_orders(symbol.upper(), clOrdId=client_id))
+        return result["data"][0] if result["data"] else None
+
+    async def place_orders(self, symbol: str, orders: typing.List[dict]):
+        results = await asyncio.gather(*[
+            self.submit_orders(
+                x,
+                lambda batch: self.client_helper("bulk_take_orders", batch),
+                lambda order: self.get_order_by_client_id(symbol, order["clOrdId"])
+            ) for x in utils.chunks(orders, BATCH_SIZE)
+        ])
+        return [x for y in results for x in y]
+
+    async def cancel_orders(self, symbol: str, order_ids: typing.List[typing.Any]):
+        orders = [{"instId": symbol.upper(), "ordId": str(x)} for x in order_ids]
+        results = await asyncio.gather(*[self.client_helper("bulk_revoke_orders", x) for x in utils.chunks(orders, BATCH_SIZE)])
+        return [x for y in results for x in y]
+
+    async def amend_orders(self, symbol: str, orders: typing.List[typing.Any]):
+        await self.update_price_and_decimal_places(symbol)
+        _orders = []
+        for x in orders:
+            v = {"instId": symbol.upper()}
+            if x.get("order_id"):
+                v["ordId"] = str(x["order_id"])
+            else:
+                v["clOrdId"] = x["client_id"]
+            if x.get("price"):
+                v["newPx"] = self.price_places % x["price"]
+            if x.get("quantity"):
+                v["newSz"] = self.decimal_places % x["quantity"]
+            _orders.append(v)
+        results = await asyncio.gather(*[self.client_helper("bulk_amend_orders", x) for x in utils.chunks(_orders, BATCH_SIZE)])
+        return [x for y in results for x in y]
+
+    async def get_orders(self, func_name: str, symbol: str, **kwargs):
+        result = []
+        after = ""
+        while True:
+            response = await self.client_call(
+                lambda client: getattr(client.trading_api, func_name)(instType=self.instrument_type(symbol), instId=symbol.upper(), after=after, **kwargs),
+                scheduler.classify(func_name)
+            )
+            result.extend(response["data"])
+            if len(response["data"]) < 100:
+                return result
+            after = response["data"][-1]["ordId"]
+
+    async def bulk_create_orders(self, symbol: str, orders: typing.List[typing.Any]):
+        await self.update_price_and_decimal_places(symbol)
+        _orders = await asyncio.gather(*[self.create_single_order(**{"raw": True, "symbol": symbol, **x}) for x in orders])
+        return await self.place_orders(symbol, _orders)
+
+    async def bulk_amend_orders(self, symbol: str, orders: typing.List[typing.Any]):
+        return await self.amend_orders(symbol, orders)
+
+    async def cancel_single_order(self, symbol: str, order_id):
+        return await self.client_call(lambda client: client.trading_api.cancel_order(symbol.upper(), ordId=str(order_id)), scheduler.CANCEL)
+
+    async def bulk_cancel_orders(self, symbol: str, order_ids: typing.List[typing.Any]):
+        return await self.cancel_orders(symbol, order_ids)
+
+    async def cancel_open_orders(self, symbol: str):
+        orders = await self.get_open_orders(symbol)
+        return await self.bulk_cancel_orders(symbol, [x["ordId"] for x in orders])
+
+    async def get_open_orders(self, symbol: str):
+        return await self.get_orders("get_order_list", symbol)
+
+    async def get_closed_orders(self, symbol: str):
+        return await self.get_orders("get_orders_history", symbol, state="filled")
+
+    async def transfer(self, asset: str, amount: float, source: str, destination: str):
+        return await self.client_call(
+            lambda client: client.funding_api.funds_transfer(asset.upper(), str(amount), source, destination),
+            scheduler.ORDER
+        )
+
+    async def transfer_funds_to_trading_account(self, asset: str, amount: float = None, symbol: str = None):
+        _amount = amount
+        if not _amount:
+            account = await self.get_funding_account_balance(asset)
+            _amount = account.available
+        return await self.transfer(asset, _amount, FUNDING_ACCOUNT, TRADING_ACCOUNT)
+
+    async def transfer_funds_to_funding_account(self, asset: str, amount: float = None, symbol: str = None):
+        _amount = amount
+        if not _amount:
+            account = await self.get_spot_account_balance(asset)
+            _amount = account.available
+        return await self.transfer(asset, _amount, TRADING_ACCOUNT, FUNDING_ACCOUNT)
+
+    async def transfer_funds_to_spot_account(self, asset: str, amount: float, symbol: str = None):
+        return await self.transfer(asset, amount, FUNDING_ACCOUNT, TRADING_ACCOUNT)
+
+    async def transfer_funds_to_future_account(self, asset: str, amount: float, symbol: str = None):
+        return await self.transfer(asset, amount, FUNDING_ACCOUNT, TRADING_ACCOUNT)
+
+    async def transfer_from_future_to_funding(self, asset: str, amount: float):
+        return await self.transfer(asset, amount, TRADING_ACCOUNT, FUNDING_ACCOUNT)
+
+    def shared_trading_account(self, source: str, target: str):
+        """Spot, margin and derivatives share the v5 trading account in cross mode, so moving
+        funds between them is a no-op. Isolated positions hold their own margin."""
+        if self.margin_mode != "cross":
+            raise NotImplementedError(
+                f"{source} to {target} transfers aren't supported with {self.margin_mode} margin on v5: "
+                "isolated positions take their margin from the trading account when opened"
+            )
+
+    async def transfer_from_spot_to_margin(self, asset: str, amount: float, symbol: str):
+        self.shared_trading_account("spot", "margin")
+
+    async def transfer_from_margin_to_spot(self, asset: str, amount: float, symbol: str):
+        self.shared_trading_account("margin", "spot")
+
+    async def transfer_from_spot_to_future(self, asset: str, amount: float, symbol: str):
+        self.shared_trading_account("spot", "futures")
+
+    async def transfer_between(self, asset: str, amount: float, source: str, target: str, source_symbol: str = None, target_symbol: str = None):
+        if (source, target) == ('futures', 'funding'):
+            return await self.transfer_from_future_to_funding(asset, amount)
+        return await super().transfer_between(asset, amount, source, target, source_symbol, target_symbol)
+
+    async def get_funding_account_balance(self, asset: str = None, **filters):
+        result = await self.client_call(lambda client: client.funding_api.get_balances(asset.upper() if asset else ""))
+        if asset:
+            return OkexV5BalanceType(result["data"][0] if result["data"] else empty_balance(asset))
+        return build_balances(result["data"], **filters)
+
+    async def get_spot_account_balance(self, asset: str = None, **filters):
+        result = await self.client_call(lambda client: client.account_api.get_account(asset.upper() if asset else ""))
+        details = result["data"][0]["details"] if result["data"] else []
+        if asset:
+            return OkexV5BalanceType(details[0] if details else empty_balance(asset))
+        return build_balances(details, **filters)
+
+    async def list_balances(self, account_type: str, assets: typing.Set[str] = None):
+        ccy = ",".join(sorted(assets)) if assets else ""
+        if account_type == "funding":
+            result = await self.client_call(lambda client: client.funding_api.get_balances(ccy))
+            return [(x["ccy"], None, OkexV5BalanceType(x)) for x in result["data"]]
+        if account_type == "spot":
+            result = await self.client_call(lambda client: client.account_api.get_account(ccy))
+            return [(x["ccy"], None, OkexV5BalanceType(x)) for y in result["data"] for x in y["details"]]
+        return await super().list_balances(account_type, assets)
+
+    async def get_margin_account_balance(self, symbol: str):
+        result = await self.get_margin_accounts(symbol)
+        return result.balance
+
+    async def get_futures_account_balance(self, symbol: str):
+        return await self.get_spot_account_balance(self.instrument(symbol).settle)
+
+    async def spot_market_order(self, symbol: str, amount: float, side: str):
+        return await self.client_call(
+            lambda client: client.trading_api.place_order(symbol.upper(), "cash", side.lower(), "market", str(amount)),
+            scheduler.ORDER
+        )
+
+    async def get_futures_position(self, symbol: str = None) -> typing.List[OkexV5FuturePosition]:
+        result = await self.client_call(lambda client: client.account_api.get_positions("SWAP", symbol.upper() if symbol else ""))
+        return [OkexV5FuturePosition(x) for x in result["data"]]
+
+    async def get_pending_orders(self) -> typing.List[dict]:
+        """Open orders on every instrument, paged 100 at a time until a page comes back empty."""
+        result = []
+        after = ""
+        while True:
+            response = await self.client_call(lambda client: client.trading_api.get_order_list(after=after), scheduler.CANCEL)
+            if not response["data"]:
+                return result
+            result.extend(response["data"])
+            after = response["data"][-1]["ordId"]
+
+    async def kill_targets(self, symbols: typing.List[str] = None, close_positions=False):
+        if symbols:
+            return await super().kill_targets(symbols, close_positions)
+        orders, accounts, positions = await asyncio.gather(
+            self.get_pending_orders(),
+            self.get_margin_accounts(),
+            self.get_futures_position(),
+        )
+        pending = {x["instId"] for x in orders}
+        positions = [x for x in positions if x.size]
+        margin = {x for x in pending if not self.instrument(x).is_derivative} | active_margin_symbols(accounts)
+        futures = {x for x in pending if self.instrument(x).is_derivative} | {x.symbol for x in positions}
+        return margin, futures, positions
+
+    async def get_future_contracts(self):
+        result = await self.client_call(lambda client: client.public_api.get_instruments("SWAP"), scheduler.METADATA)
+        return [{"symbol": x["instId"], "underlying": x["uly"], "currency": x["settleCcy"]} for x in result["data"]]
+
+    async def get_futures_leverage(self, symbol: str):
+        result = await self.client_call(lambda client: client.account_api.get_leverage(symbol.upper(), self.margin_mode))
+        return result["data"]
+
+    async def fetch_leverage_settings(self, symbols: typing.List[str] = None) -> typing.Dict[str, float]:
+        symbols = [x.upper() for x in symbols or [y["symbol"] for y in await self.future_contracts()]]
+        results = await asyncio.gather(*[
+            self.client_call(lambda client, x=x: client.account_api.get_leverage(",".join(x), self.margin_mode))
+            for x in utils.chunks(symbols, BATCH_SIZE)
+        ])
+        return {x["instId"]: x["lever"] for y in results for x in y["data"]}
+
+    async def set_futures_leverage(self, symbol: str, value: float, force=False):
+        if self.leverage_unchanged(symbol, value, force):
+            return None
+        result = await self.client_call(lambda client: client.account_api.set_leverage(str(value), self.margin_mode, instId=symbol.upper()), scheduler.ORDER)
+        if result.get("code") == "0":
+            self.store_leverage(symbol, value)
+        return result["data"]
+
+    async def create_future_order(self, symbol: str, side: str, quantity: float, price: float, notional: float = None, raw=False, **kwargs):
+        price = self.limit_price(symbol, side, quantity, price, derivative=True)
+        client_id = kwargs.get("client_id") or self.client_order_id(symbol, side, quantity, price, kwargs.get("kind"))
+        await self.update_price_and_decimal_places(symbol, raw=raw)
+        v = {
+            "instId": symbol.upper(),
+            "tdMode": self.margin_mode,
+            "side": side.lower(),
+            "posSide": kwargs["kind"].lower(),
+            "ordType": "limit",
+            "px": self.price_places % price if price else "",
+            "sz": self.decimal_places % quantity,
+            "clOrdId": client_id,
+        }
+        if kwargs.get("force_market") or kwargs.get("is_market"):
+            v["ordType"] = "market"
+            del v["px"]
+        if raw:
+            return v
+        result = await self.place_order(v)
+        return result["ordId"]
+
+    async def bulk_create_future_orders(self, symbol: str, orders: typing.List[typing.Any]):
+        await self.update_price_and_decimal_places(symbol)
+        _orders = await asyncio.gather(*[self.create_future_order(**{"raw": True, "symbol": symbol, **x}) for x in orders])
+        return await self.place_orders(symbol, _orders)
+
+    async def bulk_amend_future_orders(self, symbol: str, orders: typing.List[typing.Any]):
+        return await self.amend_orders(symbol, orders)
+
+    async def cancel_future_order(self, symbol: str, order_id):
+        return await self.cancel_single_order(symbol, order_id)
+
+    async def bulk_cancel_future_orders(self, symbol: str, order_ids: typing.List[typing.Any]):
+        return await self.cancel_orders(symbol, order_ids)
+
+    async def cancel_future_open_orders(self, symbol: str):
+        return await self.cancel_open_orders(symbol)
+
+    async def get_future_open_orders(self, symbol: str):
+        return await self.get_open_orders(symbol)
+
 
-def process_places(exchange_info, symbol: str):
-    result = [x for x in exchange_info if x["instrument_id"].lower() == symbol.lower()]
+def process_places(instruments, symbol: str):
+    result = [x for x in instruments if x["instId"].lower() == symbol.lower()]
     if result:
         result = result[0]
 
         def get_place(x):
             return abs(int(format(float(x), ".8e").split("e")[1]))
 
-        price_places = get_place(result["tick_size"])
-        quantity_places = get_place(result["size_increment"])
+        price_places = get_place(result["tickSz"])
+        quantity_places = get_place(result["lotSz"])
         return {
             "price_places": f"%.{price_places}f",
             "places": f"%.{quantity_places}f",
             "difference": 1 * 10 ** -price_places,
-            "stepSize": float(result["size_increment"]),
-            "minimum": float(result["min_size"]),
-            "contractSize": result.get("contractSize"),
+            "stepSize": float(result["lotSz"]),
+            "minimum": float(result["minSz"]),
+            "contractSize": result.get("ctVal") or None,
         }
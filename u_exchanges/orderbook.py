@@ -0,0 +1,240 @@
+import bisect
+import typing
+import zlib
+
+BIDS = "bids"
+ASKS = "asks"
+
+
+class OutOfSync(Exception):
+    pass
+
+
+class BookSide:
+    """Price levels kept in two parallel sorted lists. Bids are stored under negated
+    prices so both sides are ascending and index 0 is always the best level."""
+
+    def __init__(self, descending=False, depth: int = None) -> None:
+        self.sign = -1.0 if descending else 1.0
+        self.depth = depth
+        self.keys = []
+        self.sizes = []
+        self.raw = {}
+
+    def clear(self):
+        self.keys = []
+        self.sizes = []
+        self.raw = {}
+
+    def update(self, price, size):
+        key = float(price) * self.sign
+        index = bisect.bisect_left(self.keys, key)
+        exists = index < len(self.keys) and self.keys[index] == key
+        if float(size) == 0:
+            if exists:
+                del self.keys[index]
+                del self.sizes[index]
+                self.raw.pop(key, None)
+            return
+        if exists:
+            self.sizes[index] = float(size)
+        else:
+            if self.depth and index >= self.depth:
+                return
+            self.keys.insert(index, key)
+            self.sizes.insert(index, float(size))
+            if self.depth and len(self.keys) > self.depth:
+                self.raw.pop(self.keys.pop(), None)
+                self.sizes.pop()
+        if isinstance(price, str):
+            self.raw[key] = (price, size)
+
+    def best(self) -> typing.Optional[typing.Tuple[float, float]]:
+        if not self.keys:
+            return None
+        return self.keys[0] * self.sign, self.sizes[0]
+
+    def size_at(self, price: float) -> float:
+        key = float(price) * self.sign
+        index = bisect.bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            return self.sizes[index]
+        return 0.0
+
+    def depth_to(self, price: float) -> float:
+        """Total size of the levels at `price` or better."""
+        index = bisect.bisect_right(self.keys, float(price) * self.sign)
+        return sum(self.sizes[:index])
+
+    def vwap(self, size: float) -> typing.Optional[float]:
+        remaining, cost = size, 0.0
+        for key, level in zip(self.keys, self.sizes):
+            filled = min(remaining, level)
+            cost += filled * key * self.sign
+            remaining -= filled
+            if remaining <= 0:
+                return cost / size
+        return None
+
+    def price_for(self, size: float) -> typing.Optional[float]:
+        """Worst price reached when taking `size` from this side."""
+        remaining = size
+        for key, level in zip(self.keys, self.sizes):
+            remaining -= level
+            if remaining <= 0:
+                return key * self.sign
+        return None
+
+    def levels(self, count: int = None) -> typing.List[typing.Tuple[float, float]]:
+        return [(x * self.sign, y) for x, y in zip(self.keys[:count], self.sizes[:count])]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+class OrderBook:
+    """L2 book for one symbol. `depth` keeps only the top N levels per side."""
+
+    needs_snapshot = False
+
+    def __init__(self, symbol: str, depth: int = None) -> None:
+        self.symbol = symbol
+        self.bids = BookSide(descending=True, depth=depth)
+        self.asks = BookSide(depth=depth)
+        self.update_id = None
+        self.synced = False
+
+    def side(self, side: str) -> BookSide:
+        """The side an order with `side` trades against: buys take asks, sells take bids."""
+        return self.asks if side.lower() in ("buy", ASKS) else self.bids
+
+    def apply_snapshot(self, bids, asks, update_id=None):
+        self.bids.clear()
+        self.asks.clear()
+        self.apply(bids, asks)
+        self.update_id = update_id
+        self.synced = True
+
+    def apply(self, bids, asks):
+        for x in bids:
+            self.bids.update(x[0], x[1])
+        for x in asks:
+            self.asks.update(x[0], x[1])
+
+    def reset(self):
+        self.bids.clear()
+        self.asks.clear()
+        self.update_id = None
+        self.synced = False
+
+    def best_bid(self) -> typing.Optional[float]:
+        best = self.bids.best()
+        return best and best[0]
+
+    def best_ask(self) -> typing.Optional[float]:
+        best = self.asks.best()
+        return best and best[0]
+
+    def mid_price(self) -> typing.Optional[float]:
+        bid, ask = self.best_bid(), self.best_ask()
+        if bid is None or ask is None:
+            return None
+        return (bid + ask) / 2
+
+    def vwap(self, side: str, size: float) -> typing.Optional[float]:
+        return self.side(side).vwap(size)
+
+    def price_for(self, side: str, size: float) -> typing.Optional[float]:
+        return self.side(side).price_for(size)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.symbol} {self.best_bid()}/{self.best_ask()}>"
+
+
+class BinanceOrderBook(OrderBook):
+    """Maintained from `<symbol>@depth` diff events plus a REST snapshot.
+
+    Events are buffered until `apply_snapshot` is called with the snapshot's
+    `lastUpdateId`, then replayed. Spot events have to chain through `U`, futures
+    events through `pu`; a gap raises `OutOfSync` and the book has to be re-snapshotted.
+    """
+
+    needs_snapshot = True
+
+    def __init__(self, symbol: str, depth: int = None, derivative=False) -> None:
+        super().__init__(symbol, depth)
+        self.derivative = derivative
+        self.buffer = []
+
+    def apply_snapshot(self, bids, asks, update_id=None):
+        super().apply_snapshot(bids, asks, update_id)
+        buffer, self.buffer = self.buffer, []
+        for event in buffer:
+            self.feed(event)
+
+    def reset(self):
+        super().reset()
+        self.buffer = []
+
+    def feed(self, event: dict) -> bool:
+        if not self.synced:
+            self.buffer.append(event)
+            return False
+        first, last = event["U"], event["u"]
+        if last <= self.update_id:
+            return False
+        if self.derivative:
+            in_sequence = event.get("pu") == self.update_id or first <= self.update_id <= last
+        else:
+            in_sequence = first <= self.update_id + 1 <= last
+        if not in_sequence:
+            message = f"{self.symbol} missed depth updates after {self.update_id}"
+            self.reset()
+            raise OutOfSync(message)
+        self.apply(event["b"], event["a"])
+        self.update_id = last
+        return True
+
+
+class OkexOrderBook(OrderBook):
+    """Maintained from the OKEx `books` channel (v3 `depth` action `partial`, v5
+    `snapshot`). Every update is validated against the CRC32 checksum of the top 25
+    levels using the levels' original string representation."""
+
+    checksum_levels = 25
+
+    def __init__(self, symbol: str, depth: int = None) -> None:
+        # levels dropped below `depth` can't come back, a book shallower than the checksum never validates
+        if depth is not None and depth < self.checksum_levels:
+            raise ValueError(f"OKEx books need a depth of at least {self.checksum_levels}, got {depth}")
+        super().__init__(symbol, depth)
+
+    def checksum(self) -> int:
+        bids = [self.bids.raw[x] for x in self.bids.keys[:self.checksum_levels]]
+        asks = [self.asks.raw[x] for x in self.asks.keys[:self.checksum_levels]]
+        values = []
+        for i in range(self.checksum_levels):
+            if i < len(bids):
+                values.extend(bids[i])
+            if i < len(asks):
+                values.extend(asks[i])
+        crc = zlib.crc32(":".join(values).encode())
+        return crc - (1 << 32) if crc >= (1 << 31) else crc
+
+    def feed(self, message: dict) -> bool:
+        data = message["data"][0]
+        if message.get("action") in ("snapshot", "partial"):
+            self.apply_snapshot(data["bids"], data["asks"], data.get("seqId"))
+        elif not self.synced:
+            return False
+        else:
+            if data.get("prevSeqId") is not None and self.update_id is not None and data["prevSeqId"] != self.update_id:
+                message = f"{self.symbol} missed book updates after {self.update_id}"
+                self.reset()
+                raise OutOfSync(message)
+            self.apply(data["bids"], data["asks"])
+            self.update_id = data.get("seqId")
+        if data.get("checksum") is not None and self.checksum() != int(data["checksum"]):
+            self.reset()
+            raise OutOfSync(f"{self.symbol} checksum mismatch")
+        return True
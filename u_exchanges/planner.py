@@ -0,0 +1,140 @@
+import asyncio
+import typing
+
+from .utils import logger
+
+TRANSFER_ROUTES = {
+    ('funding', 'margin'): 'transfer_funds_to_trading_account',
+    ('margin', 'funding'): 'transfer_funds_to_funding_account',
+    ('funding', 'spot'): 'transfer_funds_to_spot_account',
+    ('spot', 'margin'): 'transfer_from_spot_to_margin',
+    ('margin', 'spot'): 'transfer_from_margin_to_spot',
+    ('spot', 'futures'): 'transfer_from_spot_to_future',
+    ('funding', 'futures'): 'transfer_funds_to_future_account',
+}
+
+
+HUB = ('funding', None)
+
+
+class TransferPlanner:
+    """Plans the smallest set of transfers that brings a batch of accounts to
+    their target allocations, using a single concurrent balance sweep. Accounts
+    without a direct route between them are relayed through the funding account."""
+
+    def __init__(self, exchange) -> None:
+        self.exchange = exchange
+
+    def normalize(self, allocation: dict) -> dict:
+        account = allocation['account'].lower()
+        account = self.exchange.account_aliases.get(account, account)
+        return {
+            'asset': allocation['asset'].upper(),
+            'account': account,
+            'symbol': allocation.get('symbol') if account in ('margin', 'futures') else None,
+            'amount': float(allocation['amount']),
+        }
+
+    async def fetch_balances(self, keys: typing.Iterable[typing.Tuple[str, str, str]]) -> typing.Dict[tuple, float]:
+        keys = list(set(keys))
+        assets = list(set(x[0] for x in keys))
+        account_types = list(set(x[1] for x in keys if x[1] != 'futures'))
+
+        async def futures_helper(key):
+            instance = await self.exchange.get_futures_account_balance(key[2])
+            return key, instance.available
+
+        listed, futures = await asyncio.gather(
+            self.exchange.get_balances(assets, account_types),
+            asyncio.gather(*[futures_helper(x) for x in keys if x[1] == 'futures']),
+        )
+        balances = dict(futures)
+        for key in keys:
+            asset, account, symbol = key
+            if account == 'futures':
+                continue
+            balance = listed.get(asset, {}).get(account)
+            if account == 'margin':
+                balance = (balance or {}).get(symbol)
+                balances[key] = balance.free if balance else 0.0
+            else:
+                balances[key] = balance.available if balance else 0.0
+        return balances
+
+    async def plan(self, allocations: typing.List[dict]) -> typing.List[dict]:
+        legs = [self.normalize(x) for x in allocations]
+        assets = set(x['asset'] for x in legs)
+        keys = [(x['asset'], x['account'], x['symbol']) for x in legs]
+        keys += [(x, 'funding', None) for x in assets]
+        balances = await self.fetch_balances(keys)
+        routes = self.exchange.transfer_routes
+        transfers = []
+        for asset in assets:
+            targets = {(x['account'], x['symbol']): x['amount'] for x in legs if x['asset'] == asset}
+            surplus = {}
+            deficit = {}
+            for leg, target in targets.items():
+                delta = balances[(asset, *leg)] - target
+                if delta > 0:
+                    surplus[leg] = delta
+                elif delta < 0:
+                    deficit[leg] = -delta
+            hub = HUB
+            if hub not in targets:
+                surplus[hub] = balances[(asset, *hub)]
+
+            moves = {}
+
+            def move(source, target, amount):
+                # a relay out of funding tops up a direct transfer on the same route
+                if (source, target) in moves:
+                    moves[(source, target)]['amount'] += amount
+                else:
+                    moves[(source, target)] = {
+                        'asset': asset, 'amount': amount,
+                        'source': source[0], 'source_symbol': source[1],
+                        'target': target[0], 'target_symbol': target[1],
+                    }
+                    transfers.append(moves[(source, target)])
+                surplus[source] -= amount
+                if target == hub:
+                    surplus[hub] = surplus.get(hub, 0.0) + amount
+
+            for leg, needed in sorted(deficit.items(), key=lambda x: -x[1]):
+                sources = [x for x in surplus if surplus[x] > 0 and (x[0], leg[0]) in routes and x != leg]
+                # a single source that covers the whole deficit keeps the transfer count minimal
+                sources.sort(key=lambda x: (surplus[x] < needed, x == hub, -surplus[x]))
+                for source in sources:
+                    if needed <= 0:
+                        break
+                    amount = min(needed, surplus[source])
+                    move(source, leg, amount)
+                    needed -= amount
+                if needed > 0 and (hub[0], leg[0]) in routes:
+                    relays = [x for x in surplus if surplus[x] > 0 and (x[0], hub[0]) in routes and x not in (hub, leg)]
+                    for source in sorted(relays, key=lambda x: -surplus[x]):
+                        if needed <= 0:
+                            break
+                        amount = min(needed, surplus[source])
+                        move(source, hub, amount)
+                        move(hub, leg, amount)
+                        needed -= amount
+                if needed > 0:
+                    logger.info(f"Unable to cover {needed} {asset} for {leg[0]} {leg[1] or ''}".strip())
+            for leg, amount in list(surplus.items()):
+                if leg == hub or amount <= 0 or leg not in targets:
+                    continue
+                if (leg[0], hub[0]) in routes:
+                    move(leg, hub, amount)
+        return transfers
+
+    async def execute(self, transfers: typing.List[dict]):
+        """Transfers into funding run first, since relays draw on them; within each
+        stage every transfer draws from a balance already in surplus, so they run
+        concurrently. Results are in the order of `transfers`."""
+        results = {}
+        for stage in (True, False):
+            batch = [(i, x) for i, x in enumerate(transfers) if (x['target'] == HUB[0]) == stage]
+            done = await asyncio.gather(*[self.exchange.transfer_between(**x) for _, x in batch])
+            results.update(zip([i for i, _ in batch], done))
+        return [results[i] for i in range(len(transfers))]
@@ -0,0 +1,107 @@
+import asyncio
+import typing
+
+import numpy as np
+
+from .types import FuturePosition, MarginAccount
+
+SIDES = {"long": 1.0, "short": -1.0}
+
+
+class RiskMonitor:
+    """Liquidation-distance and margin-ratio checks across many margin pairs and futures
+    positions, packed into arrays so one evaluation is a handful of vectorized operations.
+
+    `threshold` is the fractional distance between price and liquidation price below which
+    a position is reported, `margin_ratio_threshold` the margin level below which an
+    isolated margin pair is reported. Callbacks registered with `on_breach` are awaited with
+    the list of newly breached entries (or every breached entry when `repeat` is set).
+    """
+
+    def __init__(self, threshold=0.05, margin_ratio_threshold=None, history=32, repeat=False) -> None:
+        self.threshold = threshold
+        self.margin_ratio_threshold = margin_ratio_threshold
+        self.history = history
+        self.repeat = repeat
+        self.callbacks = []
+        self.load()
+
+    def on_breach(self, callback: typing.Callable[[typing.List[dict]], typing.Awaitable[typing.Any]]):
+        self.callbacks.append(callback)
+        return callback
+
+    def load(self, margin_accounts: typing.Iterable[MarginAccount] = (), positions: typing.Iterable[FuturePosition] = ()):
+        margin_accounts = list(margin_accounts)
+        positions = [x for x in positions if x.size]
+        self.keys = [("margin", x.symbol, None) for x in margin_accounts] + [("futures", x.symbol, x.kind) for x in positions]
+        self.symbols = [x[1] for x in self.keys]
+        self.is_margin = np.array([x[0] == "margin" for x in self.keys], dtype=bool)
+        self.side = np.array([0.0] * len(margin_accounts) + [SIDES.get(x.kind, 0.0) for x in positions])
+        self.liquidation = np.array([x.liquidation_price for x in margin_accounts] + [x.liquidation_price for x in positions], dtype=np.float64)
+        self.mark = np.array([np.nan] * len(margin_accounts) + [x.mark_price for x in positions], dtype=np.float64)
+        self.ratios = np.full((len(self.keys), self.history), np.nan)
+        self.cursor = 0
+        self.breached = np.zeros(len(self.keys), dtype=bool)
+        self.update_margin_ratios(np.array([x.margin_ratio for x in margin_accounts] + [np.nan] * len(positions)))
+
+    async def refresh(self, exchange):
+        accounts, positions = await asyncio.gather(exchange.get_margin_accounts(), exchange.get_futures_position())
+        self.load(accounts, positions)
+
+    def update_margin_ratios(self, ratios: np.ndarray):
+        self.ratios[:, self.cursor % self.history] = ratios
+        self.cursor += 1
+
+    def price_vector(self, prices: typing.Union[np.ndarray, typing.Dict[str, float]]) -> np.ndarray:
+        if isinstance(prices, np.ndarray):
+            return prices
+        return np.fromiter((prices.get(x, np.nan) for x in self.symbols), dtype=np.float64, count=len(self.symbols))
+
+    def trend(self) -> np.ndarray:
+        """Least-squares slope of each margin ratio over the samples in the ring buffer."""
+        count = min(self.cursor, self.history)
+        if count < 2:
+            return np.zeros(len(self.keys))
+        order = (np.arange(count) + self.cursor - count) % self.history
+        samples = self.ratios[:, order]
+        valid = ~np.isnan(samples)
+        counts = np.maximum(valid.sum(axis=1, keepdims=True), 1)
+        x = np.where(valid, np.arange(count, dtype=np.float64), 0.0)
+        y = np.where(valid, samples, 0.0)
+        dx = np.where(valid, x - x.sum(axis=1, keepdims=True) / counts, 0.0)
+        dy = np.where(valid, y - y.sum(axis=1, keepdims=True) / counts, 0.0)
+        denominator = (dx * dx).sum(axis=1)
+        return np.where(denominator > 0, (dx * dy).sum(axis=1) / np.where(denominator > 0, denominator, 1), 0.0)
+
+    def evaluate(self, prices: typing.Union[np.ndarray, typing.Dict[str, float]]) -> typing.Dict[str, np.ndarray]:
+        price = self.price_vector(prices)
+        price = np.where(np.isnan(price), self.mark, price)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            gap = np.where(self.side == 0, np.abs(price - self.liquidation), self.side * (price - self.liquidation))
+            distance = np.where(self.liquidation > 0, np.clip(gap / price, 0, None), np.inf)
+        breach = distance < self.threshold
+        ratio = self.ratios[:, (self.cursor - 1) % self.history]
+        if self.margin_ratio_threshold is not None:
+            breach |= self.is_margin & (ratio > 0) & (ratio < self.margin_ratio_threshold)
+        return {"distance": distance, "margin_ratio": ratio, "breach": breach}
+
+    async def check(self, prices: typing.Union[np.ndarray, typing.Dict[str, float]], margin_ratios: np.ndarray = None) -> typing.List[dict]:
+        if margin_ratios is not None:
+            self.update_margin_ratios(margin_ratios)
+        result = self.evaluate(prices)
+        breach = result["breach"]
+        fire = breach if self.repeat else breach & ~self.breached
+        self.breached = breach
+        indexes = np.flatnonzero(fire)
+        if not len(indexes):
+            return []
+        trend = self.trend()
+        breaches = [
+            {
+                "account": self.keys[i][0], "symbol": self.keys[i][1], "kind": self.keys[i][2],
+                "distance": float(result["distance"][i]), "margin_ratio": float(result["margin_ratio"][i]),
+                "trend": float(trend[i]),
+            } for i in indexes
+        ]
+        await asyncio.gather(*[x(breaches) for x in self.callbacks])
+        return breaches
@@ -0,0 +1,120 @@
+import asyncio
+import collections
+import concurrent.futures
+import time
+import typing
+
+CANCEL = 0
+ORDER = 1
+ACCOUNT = 2
+METADATA = 3
+PRIORITIES = (CANCEL, ORDER, ACCOUNT, METADATA)
+
+METADATA_NAMES = ("exchange_info", "instrument", "coin_info", "history", "trades", "closed", "symbol", "config", "interest_rate")
+ACCOUNT_PREFIXES = ("get", "list", "futures_account", "futures_coin_account", "futures_position", "ping")
+ACCOUNT_NAMES = ("_get_", "order_book", "ticker", "price")
+
+
+def classify(function_name: str) -> int:
+    """Priority class of an SDK method from its name."""
+    name = function_name.lower()
+    if "cancel" in name or "revoke" in name:
+        return CANCEL
+    if any(x in name for x in METADATA_NAMES):
+        return METADATA
+    if name.startswith(ACCOUNT_PREFIXES) or any(x in name for x in ACCOUNT_NAMES) or name.endswith(("_info", "_pending", "_list")):
+        return ACCOUNT
+    return ORDER
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float = None) -> None:
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        self.refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class RequestScheduler:
+    """Runs blocking SDK calls on a bounded thread pool, highest priority class first.
+
+    At most `concurrency` calls are in flight; everything else waits in one FIFO queue per
+    priority class. `budgets` maps a class to `(requests_per_second, burst)`; a class that
+    ran out of budget is skipped until it refills, so its backlog never holds back the others.
+    """
+
+    def __init__(self, concurrency=8, budgets: typing.Dict[int, typing.Tuple[float, float]] = None) -> None:
+        self.concurrency = concurrency
+        self.executor = concurrent.futures.ThreadPoolExecutor(concurrency)
+        self.queues = {x: collections.deque() for x in PRIORITIES}
+        self.budgets = {x: TokenBucket(*y) for x, y in (budgets or {}).items()}
+        self.running = 0
+        self.timer = None
+
+    def pending(self) -> int:
+        return sum(len(x) for x in self.queues.values())
+
+    def run(self, priority: int, callback: typing.Callable[[], typing.Any]) -> asyncio.Future:
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self.queues[priority].append((callback, future))
+        self.dispatch()
+        return future
+
+    def next_request(self):
+        """The next runnable request, or the delay until a rate-limited class refills."""
+        delay = None
+        for priority in PRIORITIES:
+            queue = self.queues[priority]
+            while queue and queue[0][1].cancelled():
+                queue.popleft()
+            if not queue:
+                continue
+            bucket = self.budgets.get(priority)
+            wait = bucket.wait_time() if bucket else 0.0
+            if wait == 0:
+                if bucket:
+                    bucket.take()
+                return queue.popleft(), None
+            delay = wait if delay is None else min(delay, wait)
+        return None, delay
+
+    def dispatch(self):
+        loop = asyncio.get_event_loop()
+        while self.running < self.concurrency:
+            request, delay = self.next_request()
+            if request is None:
+                if delay is not None and self.timer is None:
+                    self.timer = loop.call_later(delay, self.on_timer)
+                return
+            callback, future = request
+            self.running += 1
+            task = loop.run_in_executor(self.executor, callback)
+            task.add_done_callback(lambda x, future=future: self.on_done(x, future))
+
+    def on_timer(self):
+        self.timer = None
+        self.dispatch()
+
+    def on_done(self, task: asyncio.Future, future: asyncio.Future):
+        self.running -= 1
+        if not future.cancelled():
+            if task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+        self.dispatch()
@@ -0,0 +1,202 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import pickle
+import threading
+import typing
+import zlib
+
+from .utils import logger
+
+# methods whose first argument is the symbol, routed to the shard that owns it
+SYMBOL_METHODS = (
+    "create_single_order", "bulk_create_orders", "bulk_amend_orders", "cancel_single_order",
+    "bulk_cancel_orders", "cancel_open_orders", "get_open_orders", "get_closed_orders",
+    "create_future_order", "bulk_create_future_orders", "bulk_amend_future_orders", "cancel_future_order",
+    "bulk_cancel_future_orders", "cancel_future_open_orders", "get_future_open_orders",
+    "get_futures_leverage", "set_futures_leverage",
+)
+
+
+class ShardError(Exception):
+    """An exception raised in a worker that could not be sent back as is. Keeps the
+    attributes the retry logic looks at."""
+
+    def __init__(self, message: str, code=None, status_code=None) -> None:
+        super().__init__(message)
+        self.code = code
+        self.status_code = status_code
+
+
+def portable_error(e: Exception) -> Exception:
+    try:
+        pickle.loads(pickle.dumps(e))
+        return e
+    except Exception:
+        return ShardError(repr(e), getattr(e, "code", None), getattr(e, "status_code", None))
+
+
+def shard_of(symbol: str, shards: int) -> int:
+    # crc32 rather than hash(), which is salted per process
+    return zlib.crc32(symbol.upper().encode()) % shards
+
+
+async def serve(connection, exchange):
+    loop = asyncio.get_event_loop()
+    tasks = set()
+
+    async def handle(request_id, method, args, kwargs):
+        try:
+            result = (request_id, await getattr(exchange, method)(*args, **kwargs), None)
+        except Exception as e:
+            result = (request_id, None, portable_error(e))
+        try:
+            connection.send(result)
+        except Exception as e:
+            connection.send((request_id, None, ShardError(f"unpicklable result from {method}: {e!r}")))
+
+    while True:
+        request = await loop.run_in_executor(None, connection.recv)
+        if request is None:
+            break
+        task = asyncio.ensure_future(handle(*request))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+
+def worker_main(connection, factory: typing.Callable[[], typing.Any], start: bool):
+    async def main():
+        exchange = factory()
+        if start:
+            await exchange.start()
+        await serve(connection, exchange)
+    asyncio.run(main())
+
+
+class Shard:
+    def __init__(self, process, connection) -> None:
+        self.process = process
+        self.connection = connection
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.reader = None
+
+
+class ShardedExchange:
+    """Spreads order management over worker processes, each owning a slice of the symbols.
+
+    Every worker builds its own exchange from `factory` (a picklable callable such as
+    `functools.partial(BinanceExchange, api_key=..., api_secret=...)`), so clients, order
+    books, instrument metadata and order state are per process and order building and
+    response parsing run on as many cores as there are shards. Symbol calls are routed
+    by a stable hash of the symbol; other calls go to `primary` or to every shard with
+    `broadcast`. Rate budgets given to the factory apply per worker.
+    """
+
+    def __init__(self, factory: typing.Callable[[], typing.Any], workers: int = None, context="spawn", start=False) -> None:
+        self.factory = factory
+        self.workers = workers or os.cpu_count() or 1
+        self.context = multiprocessing.get_context(context)
+        self.start_exchanges = start
+        self.shards = []
+        self.ids = itertools.count()
+        self.loop = None
+
+    async def start(self):
+        self.loop = asyncio.get_event_loop()
+        for index in range(self.workers):
+            parent, child = self.context.Pipe()
+            process = self.context.Process(
+                target=worker_main, args=(child, self.factory, self.start_exchanges), name=f"shard-{index}", daemon=True
+            )
+            process.start()
+            child.close()
+            shard = Shard(process, parent)
+            shard.reader = threading.Thread(target=self.read, args=(shard,), daemon=True)
+            shard.reader.start()
+            self.shards.append(shard)
+
+    def read(self, shard: Shard):
+        while True:
+            try:
+                request_id, result, error = shard.connection.recv()
+            except (EOFError, OSError):
+                break
+            with shard.lock:
+                future = shard.pending.pop(request_id, None)
+            if future:
+                self.loop.call_soon_threadsafe(self.resolve, future, result, error)
+        with shard.lock:
+            pending, shard.pending = shard.pending, {}
+        for future in pending.values():
+            self.loop.call_soon_threadsafe(self.resolve, future, None, ShardError(f"{shard.process.name} exited"))
+
+    @staticmethod
+    def resolve(future: asyncio.Future, result, error):
+        if future.cancelled():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def shard(self, symbol: str) -> Shard:
+        return self.shards[shard_of(symbol, len(self.shards))]
+
+    async def send(self, shard: Shard, method: str, *args, **kwargs):
+        request_id = next(self.ids)
+        future = self.loop.create_future()
+        with shard.lock:
+            shard.pending[request_id] = future
+        shard.connection.send((request_id, method, args, kwargs))
+        return await future
+
+    async def call(self, symbol: str, method: str, *args, **kwargs):
+        return await self.send(self.shard(symbol), method, symbol, *args, **kwargs)
+
+    async def primary(self, method: str, *args, **kwargs):
+        """Calls that aren't tied to a symbol, such as balances, all go to the first shard."""
+        return await self.send(self.shards[0], method, *args, **kwargs)
+
+    async def broadcast(self, method: str, *args, **kwargs) -> list:
+        return await asyncio.gather(*[self.send(x, method, *args, **kwargs) for x in self.shards])
+
+    def group(self, symbols: typing.Iterable[str]) -> typing.Dict[int, typing.List[str]]:
+        groups = {}
+        for symbol in symbols:
+            groups.setdefault(shard_of(symbol, len(self.shards)), []).append(symbol)
+        return groups
+
+    async def kill_all(self, symbols: typing.List[str] = None, close_positions=False):
+        if not symbols:
+            return await self.primary("kill_all", None, close_positions)
+        results = await asyncio.gather(*[
+            self.send(self.shards[x], "kill_all", y, close_positions) for x, y in self.group(symbols).items()
+        ])
+        return {x: y for result in results for x, y in result.items()}
+
+    async def close(self):
+        for shard in self.shards:
+            try:
+                shard.connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        await asyncio.gather(*[self.loop.run_in_executor(None, x.process.join, 5) for x in self.shards])
+        for shard in self.shards:
+            if shard.process.is_alive():
+                logger.warning(f"terminating {shard.process.name}")
+                shard.process.terminate()
+            shard.connection.close()
+        self.shards = []
+
+
+def routed(name: str):
+    async def method(self, symbol: str, *args, **kwargs):
+        return await self.call(symbol, name, *args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+for method_name in SYMBOL_METHODS:
+    setattr(ShardedExchange, method_name, routed(method_name))
@@ -0,0 +1,280 @@
+import asyncio
+import sys
+import threading
+import time
+import typing
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from . import types
+from .base import BaseExchange
+from .utils import logger
+
+PRICE_DTYPE = np.dtype([("symbol", "S32"), ("price", "<f8")])
+POSITION_DTYPE = np.dtype([
+    ("symbol", "S32"), ("kind", "S8"), ("future_type", "S8"), ("margin_type", "S16"),
+    ("size", "<f8"), ("entry", "<f8"), ("pnl", "<f8"), ("liquidation_price", "<f8"), ("leverage", "<f8"), ("mark_price", "<f8"),
+])
+MARGIN_DTYPE = np.dtype([
+    ("symbol", "S32"), ("base_asset", "S16"), ("quote_asset", "S16"),
+    ("base", "<f8", (3,)), ("quote", "<f8", (3,)), ("liquidation_price", "<f8"), ("margin_ratio", "<f8"),
+])
+BALANCE_DTYPE = np.dtype([("asset", "S16"), ("account", "S16"), ("balance", "<f8"), ("available", "<f8")])
+SECTIONS = ("prices", "positions", "margin_accounts", "balances")
+ATTACH_LOCK = threading.Lock()
+
+
+def layout(capacity: int) -> np.dtype:
+    return np.dtype([
+        ("capacity", "<i8"), ("seq", "<i8"), ("updated", "<f8"), ("counts", "<i8", (len(SECTIONS),)),
+        ("prices", PRICE_DTYPE, (capacity,)),
+        ("positions", POSITION_DTYPE, (capacity,)),
+        ("margin_accounts", MARGIN_DTYPE, (capacity,)),
+        ("balances", BALANCE_DTYPE, (capacity,)),
+    ])
+
+
+def text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+class SharedAssetBalance(types.AssetBalance):
+    def __init__(self, values) -> None:
+        self.borrowed, self.free, self.total = (float(x) for x in values)
+
+
+class SharedMarginAccount(types.MarginAccount):
+    def __init__(self, x) -> None:
+        self.symbol = text(x["symbol"])
+        self.base_asset = text(x["base_asset"])
+        self.quote_asset = text(x["quote_asset"])
+        self.base_asset_balance = SharedAssetBalance(x["base"])
+        self.quote_asset_balance = SharedAssetBalance(x["quote"])
+        self.liquidation_price = float(x["liquidation_price"])
+        self.margin_ratio = float(x["margin_ratio"])
+        self.balance = {self.base_asset: self.base_asset_balance, self.quote_asset: self.quote_asset_balance}
+
+
+class SharedFuturePosition(types.FuturePosition):
+    def __init__(self, x) -> None:
+        for key in ("symbol", "kind", "future_type", "margin_type"):
+            setattr(self, key, text(x[key]))
+        for key in ("size", "entry", "pnl", "liquidation_price", "leverage", "mark_price"):
+            setattr(self, key, float(x[key]))
+
+
+class SharedBalance(types.BalanceType):
+    def __init__(self, x) -> None:
+        self.asset = text(x["asset"])
+        self.account = text(x["account"])
+        self.balance = float(x["balance"])
+        self.available = float(x["available"])
+
+
+class UntrackedSegment:
+    """Stands in for `resource_tracker` while a reader opens segment `name`: registering it
+    is skipped, every other call goes through."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name.lstrip("/")
+
+    def register(self, name: str, rtype: str):
+        if rtype != "shared_memory" or name.lstrip("/") != self.name:
+            resource_tracker.register(name, rtype)
+
+    def __getattr__(self, attr):
+        return getattr(resource_tracker, attr)
+
+
+class SharedState:
+    """Fixed-layout account and market state in a shared memory segment.
+
+    One writer updates it under a seqlock: the sequence number is odd while a write is in
+    progress, and readers retry until they copied a section between two equal, even
+    sequence numbers. Readers never block the writer.
+    """
+
+    def __init__(self, memory: shared_memory.SharedMemory, owner=False) -> None:
+        self.memory = memory
+        self.owner = owner
+        capacity = int(np.ndarray((), "<i8", buffer=memory.buf))
+        self.capacity = capacity
+        self.data = np.ndarray((), layout(capacity), buffer=memory.buf)
+
+    @classmethod
+    def create(cls, name: str = None, capacity=256) -> "SharedState":
+        dtype = layout(capacity)
+        memory = shared_memory.SharedMemory(name=name, create=True, size=dtype.itemsize)
+        np.ndarray((), "<i8", buffer=memory.buf)[()] = capacity
+        return cls(memory, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedState":
+        # readers must not unlink the segment when they exit. Registering and then
+        # unregistering it would also drop the owner's entry when both share a resource
+        # tracker (a forked or spawned child), so the reader never registers it.
+        if sys.version_info >= (3, 13):
+            return cls(shared_memory.SharedMemory(name=name, track=False))
+        # only the tracker reference inside `shared_memory` is swapped, and only while the
+        # segment is opened; everything else still goes to the real tracker
+        with ATTACH_LOCK:
+            shared_memory.resource_tracker = UntrackedSegment(name)
+            try:
+                memory = shared_memory.SharedMemory(name=name)
+            finally:
+                shared_memory.resource_tracker = resource_tracker
+        return cls(memory)
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def write(self, **sections):
+        """Replace the given sections (`prices`, `positions`, `margin_accounts`, `balances`)
+        with lists of records."""
+        for key, records in sections.items():
+            if len(records) > self.capacity:
+                logger.warning(f"shared state {key} truncated to {self.capacity} entries")
+        self.data["seq"] += 1
+        try:
+            for key, records in sections.items():
+                records = records[:self.capacity]
+                self.data[key][:len(records)] = records
+                self.data["counts"][SECTIONS.index(key)] = len(records)
+            self.data["updated"] = time.time()
+        finally:
+            self.data["seq"] += 1
+
+    def read(self, key: str, retries=1000) -> np.ndarray:
+        index = SECTIONS.index(key)
+        for _ in range(retries):
+            seq = int(self.data["seq"])
+            if not seq % 2:
+                result = self.data[key][:self.data["counts"][index]].copy()
+                if int(self.data["seq"]) == seq:
+                    return result
+            # let the writer finish
+            time.sleep(0)
+        raise RuntimeError(f"could not get a consistent read of {key}")
+
+    def updated(self) -> float:
+        return float(self.data["updated"])
+
+    def close(self):
+        self.data = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+class StatePublisher:
+    """Owns the exchange connection and keeps a `SharedState` segment up to date.
+
+    `run` polls positions, margin accounts and balances every `interval` seconds; prices are
+    taken from the exchange's local order books and can also be pushed with `publish` from
+    a stream handler.
+    """
+
+    def __init__(self, exchange: BaseExchange, name: str = None, capacity=256, interval=1.0, assets: typing.List[str] = None) -> None:
+        self.exchange = exchange
+        self.state = SharedState.create(name, capacity)
+        self.interval = interval
+        self.assets = assets
+
+    @property
+    def name(self) -> str:
+        return self.state.name
+
+    def publish(self, prices: typing.Dict[str, float] = None, positions: typing.List[types.FuturePosition] = None,
+                margin_accounts: typing.List[types.MarginAccount] = None, balances: typing.Dict[str, dict] = None):
+        sections = {}
+        if prices is not None:
+            sections["prices"] = [(x.upper(), y) for x, y in prices.items()]
+        if positions is not None:
+            sections["positions"] = [
+                (x.symbol, x.kind, x.future_type, x.margin_type, x.size, x.entry, x.pnl, x.liquidation_price, x.leverage, x.mark_price)
+                for x in positions
+            ]
+        if margin_accounts is not None:
+            sections["margin_accounts"] = [
+                (x.symbol, x.base_asset, x.quote_asset,
+                 (x.base_asset_balance.borrowed, x.base_asset_balance.free, x.base_asset_balance.total),
+                 (x.quote_asset_balance.borrowed, x.quote_asset_balance.free, x.quote_asset_balance.total),
+                 x.liquidation_price, x.margin_ratio)
+                for x in margin_accounts
+            ]
+        if balances is not None:
+            sections["balances"] = [
+                (asset, account, x.balance, x.available)
+                for asset, accounts in balances.items() for account, x in accounts.items() if isinstance(x, types.BalanceType)
+            ]
+        self.state.write(**sections)
+
+    def book_prices(self) -> typing.Dict[str, float]:
+        prices = {}
+        for (symbol, _), book in self.exchange.order_books.items():
+            if book.synced and book.mid_price():
+                prices[symbol] = book.mid_price()
+        return prices
+
+    async def refresh(self):
+        positions, margin_accounts, balances = await asyncio.gather(
+            self.exchange.get_futures_position(),
+            self.exchange.get_margin_accounts(),
+            self.exchange.get_balances(self.assets, ("funding", "spot")),
+        )
+        self.publish(self.book_prices(), positions, margin_accounts, balances)
+
+    async def run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.exception(e)
+            await asyncio.sleep(self.interval)
+
+    def close(self):
+        self.state.close()
+
+
+class SharedStateExchange(BaseExchange):
+    """Read-only view over a segment written by a `StatePublisher` in another process."""
+
+    def __init__(self, name: str, **kwargs) -> None:
+        super().__init__(None, None, **kwargs)
+        self.state = SharedState.attach(name)
+
+    async def get_price(self, symbol: str) -> typing.Optional[float]:
+        prices = self.state.read("prices")
+        match = prices["price"][prices["symbol"] == symbol.upper().encode()]
+        return float(match[0]) if len(match) else None
+
+    async def get_prices(self) -> typing.Dict[str, float]:
+        return {text(x["symbol"]): float(x["price"]) for x in self.state.read("prices")}
+
+    async def get_futures_position(self, symbol: str = None) -> typing.List[types.FuturePosition]:
+        positions = [SharedFuturePosition(x) for x in self.state.read("positions")]
+        if symbol:
+            return [x for x in positions if x.symbol.lower() == symbol.lower()]
+        return positions
+
+    async def get_margin_accounts(self, symbol: str = None):
+        accounts = [SharedMarginAccount(x) for x in self.state.read("margin_accounts")]
+        if symbol:
+            return next((x for x in accounts if x.symbol.lower() == symbol.lower()), None)
+        return accounts
+
+    async def get_balances(self, assets: typing.List[str] = None, account_types=None) -> typing.Dict[str, dict]:
+        result = {}
+        for x in self.state.read("balances"):
+            balance = SharedBalance(x)
+            if assets and balance.asset not in assets:
+                continue
+            if account_types and balance.account not in account_types:
+                continue
+            result.setdefault(balance.asset, {})[balance.account] = balance
+        return result
+
+    def close(self):
+        self.state.close()
@@ -0,0 +1,44 @@
+import hashlib
+import os
+import pickle
+import time
+import typing
+
+from .utils import logger
+
+SNAPSHOT_VERSION = 1
+# settings that can be changed outside the process; a stale copy would make the setters skip needed requests
+UNSAVED_SETTINGS = ("leverage", "margin_type")
+
+
+def snapshot_key(exchange) -> str:
+    """Snapshots hold account settings, so they are tied to the exchange class and the api key."""
+    digest = hashlib.sha1(str(exchange.api_key).encode()).hexdigest()[:16]
+    return f"{exchange.__class__.__name__}:{digest}"
+
+
+def save(path: str, key: str, data: dict):
+    payload = {"version": SNAPSHOT_VERSION, "key": key, "created": time.time(), "data": data}
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + ".tmp", path)
+
+
+def load(path: str, key: str, max_age: float = None) -> typing.Optional[dict]:
+    """The snapshot's data, or None when it is missing, unreadable, written by another
+    version or exchange, or older than `max_age` seconds."""
+    try:
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"ignoring unreadable snapshot {path}: {e}")
+        return None
+    if payload.get("version") != SNAPSHOT_VERSION or payload.get("key") != key:
+        return None
+    if max_age is not None and time.time() - payload["created"] > max_age:
+        return None
+    return payload["data"]
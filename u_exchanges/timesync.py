@@ -0,0 +1,99 @@
+import asyncio
+import collections
+import threading
+import time
+import typing
+
+import requests
+
+from . import utils
+from .utils import logger
+
+# clocks are per venue, shared by every exchange instance and client in the process
+CLOCKS = {}
+
+
+class ClockSync:
+    """Estimates the offset of a venue's clock from ours.
+
+    Each sample brackets one server time request with the local send and receive times;
+    assuming a symmetric path, the offset is the server time minus the midpoint. Of the last
+    `window` samples, the one with the lowest round trip has the least queueing noise, so
+    its offset is used. `fetch` returns the server time in seconds.
+    """
+
+    def __init__(self, fetch: typing.Callable[[], float], window=8, interval=60.0, burst=4) -> None:
+        self.fetch = fetch
+        self.samples = collections.deque(maxlen=window)
+        self.interval = interval
+        self.burst = burst
+        self.offset = 0.0
+        self.rtt = None
+        self.task = None
+        self.lock = threading.Lock()
+
+    def time(self) -> float:
+        """Current server time estimate, in seconds."""
+        return time.time() + self.offset
+
+    def time_ms(self) -> int:
+        return int((time.time() + self.offset) * 1000)
+
+    def sample(self):
+        sent = time.time()
+        server = self.fetch()
+        received = time.time()
+        with self.lock:
+            self.samples.append((received - sent, server - (sent + received) / 2))
+            self.rtt, self.offset = min(self.samples)
+
+    async def sync(self, samples: int = None):
+        loop = asyncio.get_event_loop()
+        for _ in range(samples or self.burst):
+            await loop.run_in_executor(None, self.sample)
+        logger.info(f"clock offset {1000 * self.offset:.1f}ms rtt {1000 * self.rtt:.1f}ms")
+
+    async def run(self):
+        while True:
+            try:
+                await self.sync(1)
+            except Exception as e:
+                logger.exception(e)
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        """Take a burst of samples the first time, then keep sampling in the background."""
+        if self.task is None or self.task.done():
+            await self.sync()
+            self.task = asyncio.ensure_future(self.run())
+
+    async def resync(self):
+        self.samples.clear()
+        await self.sync()
+
+
+def shared_clock(key, fetch: typing.Callable[[], float], **kwargs) -> ClockSync:
+    if key not in CLOCKS:
+        CLOCKS[key] = ClockSync(fetch, **kwargs)
+    return CLOCKS[key]
+
+
+def iso_timestamp(value: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(value)) + f".{int(value * 1000) % 1000:03d}Z"
+
+
+def patch_sdk_timestamp(module, clock: ClockSync):
+    """The OKEx SDKs stamp requests with `utils.get_timestamp()` from the local clock."""
+    module.get_timestamp = lambda: iso_timestamp(clock.time())
+
+
+def binance_time(url: str, timeout=5.0) -> float:
+    return utils.json_loads(requests.get(url, timeout=timeout).content)["serverTime"] / 1000
+
+
+def okex_v3_time(url: str, timeout=5.0) -> float:
+    return float(utils.json_loads(requests.get(url, timeout=timeout).content)["epoch"])
+
+
+def okex_v5_time(url: str, timeout=5.0) -> float:
+    return int(utils.json_loads(requests.get(url, timeout=timeout).content)["data"][0]["ts"]) / 1000
@@ -0,0 +1,98 @@
+import collections
+import threading
+import time
+import typing
+
+import requests
+
+
+class HostStats:
+    def __init__(self) -> None:
+        self.latency = None
+        self.last_used = 0.0
+        self.failures = 0
+        self.opened_until = 0.0
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.latency} failures: {self.failures}>"
+
+
+class HostSelector:
+    """Routes requests to the fastest healthy host out of a set of equivalent API hosts.
+
+    Latency is tracked as an EWMA per host and as a window of samples per endpoint,
+    which is used to derive the request timeout. A host is taken out of rotation for
+    `cooldown` seconds after `failure_threshold` consecutive failures.
+    """
+
+    def __init__(self, hosts: typing.List[str], window=200, alpha=0.2, failure_threshold=3, cooldown=30.0,
+                 default_timeout=10.0, min_timeout=0.5, timeout_factor=3.0, explore_every=100) -> None:
+        self.hosts = [x.rstrip("/") for x in hosts]
+        self.stats = {x: HostStats() for x in self.hosts}
+        self.samples = collections.defaultdict(lambda: collections.deque(maxlen=window))
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.timeout_factor = timeout_factor
+        self.explore_every = explore_every
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def healthy(self) -> typing.List[str]:
+        now = time.monotonic()
+        return [x for x in self.hosts if self.stats[x].opened_until <= now]
+
+    def best(self) -> str:
+        with self.lock:
+            self.counter += 1
+            hosts = self.healthy()
+            if not hosts:
+                return min(self.hosts, key=lambda x: self.stats[x].opened_until)
+            unmeasured = [x for x in hosts if self.stats[x].latency is None]
+            if unmeasured:
+                return unmeasured[0]
+            if self.counter % self.explore_every == 0:
+                # keep the latency of the hosts we aren't using up to date
+                return min(hosts, key=lambda x: self.stats[x].last_used)
+            return min(hosts, key=lambda x: self.stats[x].latency)
+
+    def record(self, host: str, endpoint: str, elapsed: float, ok=True):
+        with self.lock:
+            stats = self.stats[host]
+            stats.last_used = time.monotonic()
+            if not ok:
+                stats.failures += 1
+                if stats.failures >= self.failure_threshold:
+                    stats.opened_until = stats.last_used + self.cooldown
+                return
+            stats.failures = 0
+            stats.opened_until = 0.0
+            if stats.latency is None:
+                stats.latency = elapsed
+            else:
+                stats.latency += self.alpha * (elapsed - stats.latency)
+            self.samples[endpoint].append(elapsed)
+
+    def percentile(self, endpoint: str, q: float) -> typing.Optional[float]:
+        samples = sorted(self.samples.get(endpoint) or [])
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def timeout(self, endpoint: str, q=0.99, min_samples=20) -> float:
+        if len(self.samples.get(endpoint) or []) < min_samples:
+            return self.default_timeout
+        value = self.percentile(endpoint, q) * self.timeout_factor
+        return min(self.default_timeout, max(self.min_timeout, value))
+
+    def probe(self, path: str):
+        for host in self.hosts:
+            start = time.monotonic()
+            try:
+                response = requests.get(host + path, timeout=self.timeout(path))
+                ok = response.status_code < 500
+            except requests.exceptions.RequestException:
+                ok = False
+            self.record(host, path, time.monotonic() - start, ok=ok)
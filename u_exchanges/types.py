@@ -1,3 +1,6 @@
+import collections.abc
+import typing
+
 
 class AssetBalance(object):
     borrowed: float
@@ -51,3 +54,62 @@ class FuturePosition:
     kind: str
     mark_price: float
     future_type: str
+
+
+def accepts_balance(asset: str, amount: float, non_zero=False, assets: typing.Set[str] = None,
+                    min_value: float = None, prices: typing.Dict[str, float] = None) -> bool:
+    """`min_value` is in the unit of `prices` when given, otherwise in the asset itself;
+    assets without a price never reach a minimum value."""
+    if assets and asset.upper() not in assets:
+        return False
+    if non_zero and not amount:
+        return False
+    if min_value is not None:
+        price = prices.get(asset.upper()) if prices else 1.0
+        return price is not None and amount * price >= min_value
+    return True
+
+
+class BalanceList(collections.abc.Sequence):
+    """Read-only list of balances over the raw payload entries. Filters run on the raw
+    entries and each model is only built when it is accessed."""
+
+    def __init__(self, entries: list, factory: typing.Callable[[typing.Any], BalanceType], asset_of: typing.Callable[[typing.Any], str]) -> None:
+        self.entries = entries
+        self.factory = factory
+        self.asset_of = asset_of
+        self.built = {}
+        self.positions = None
+
+    @classmethod
+    def filtered(cls, entries: list, factory, asset_of, amount_of: typing.Callable[[typing.Any], float], **filters) -> "BalanceList":
+        if filters.get("assets"):
+            filters["assets"] = {x.upper() for x in filters["assets"]}
+        if any(x is not None and x is not False for x in filters.values()):
+            entries = [x for x in entries if accepts_balance(asset_of(x), amount_of(x), **filters)]
+        return cls(entries, factory, asset_of)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[x] for x in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self.entries)
+        item = self.built.get(index)
+        if item is None:
+            item = self.built[index] = self.factory(self.entries[index])
+        return item
+
+    def assets(self) -> typing.List[str]:
+        return [self.asset_of(x) for x in self.entries]
+
+    def get(self, asset: str) -> typing.Optional[BalanceType]:
+        if self.positions is None:
+            self.positions = {x.upper(): i for i, x in enumerate(self.assets())}
+        index = self.positions.get(asset.upper())
+        return None if index is None else self[index]
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {len(self)} entries, {len(self.built)} built>"
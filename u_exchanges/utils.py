@@ -1,4 +1,20 @@
+import asyncio
+import datetime
+import hashlib
+import json
 import logging
+import sys
+import time
+
+import requests
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    try:
+        from ujson import loads as json_loads
+    except ImportError:
+        json_loads = json.loads
 
 logger = logging.getLogger(__name__)
 logger.setLevel(level=logging.INFO)
@@ -17,3 +33,72 @@ def chunks(array, n):
     while counter < len(array):
         yield array[counter:counter + n]
         counter += n
+
+
+def client_order_id(*parts, prefix="u"):
+    """Client order id hashed from `parts`, valid for both Binance and OKEx (alphanumeric, 32 chars)."""
+    digest = hashlib.sha1("|".join(str(x) for x in parts).encode()).hexdigest()
+    return (prefix + digest)[:32]
+
+
+def is_ambiguous_error(e: Exception) -> bool:
+    """The request may have reached the exchange, so the order status is unknown."""
+    if isinstance(e, requests.exceptions.ConnectTimeout):
+        return False
+    errors = sys.modules.get("ccxt.base.errors")
+    if errors and isinstance(e, errors.NetworkError):
+        return isinstance(e, errors.RequestTimeout)
+    if isinstance(e, requests.exceptions.Timeout):
+        return True
+    status_code = getattr(e, "status_code", None) or 0
+    return getattr(e, "code", None) in (-1006, -1007) or status_code >= 500
+
+
+def is_timestamp_error(e: Exception) -> bool:
+    """Rejected for a timestamp outside the venue's receive window: Binance -1021, OKEx v3
+    30008, OKEx v5 50102."""
+    return str(getattr(e, "code", None)) in ("-1021", "30008", "50102")
+
+
+def is_transient_error(e: Exception) -> bool:
+    if is_ambiguous_error(e) or is_timestamp_error(e) or isinstance(e, requests.exceptions.ConnectionError):
+        return True
+    # only checked when ccxt is in use, importing it is slow
+    errors = sys.modules.get("ccxt.base.errors")
+    if errors and isinstance(e, errors.NetworkError):
+        return True
+    return getattr(e, "code", None) in (-1001, -1003) or getattr(e, "status_code", None) == 429
+
+
+def next_utc_midnight() -> float:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time(), datetime.timezone.utc)
+    return midnight.timestamp()
+
+
+class TTLCache:
+    def __init__(self, ttl=60.0) -> None:
+        self.ttl = ttl
+        self.data = {}
+
+    def get(self, key):
+        value = self.data.get(key)
+        if value and value[1] > time.time():
+            return value[0]
+        return None
+
+    def set(self, key, value, expires: float = None):
+        self.data[key] = (value, expires or time.time() + self.ttl)
+
+    async def fetch(self, key, callback, expires: float = None):
+        """Cached value for `key`, or the result of awaiting `callback()`. Concurrent misses
+        for the same key share a single request."""
+        task = self.get(key)
+        if task is None:
+            task = asyncio.ensure_future(callback())
+            self.set(key, task, expires)
+        try:
+            return await task
+        except Exception:
+            self.data.pop(key, None)
+            raise